@@ -0,0 +1,145 @@
+import csv
+import gzip
+import heapq
+import itertools
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from utils.recorder import DEPTH_ASK, DEPTH_BID, KIND_DEPTH, KIND_TICKER, KIND_TRADE, read_records
+
+# 回放事件：(交易所时间戳秒, WebSocket 原始格式消息)
+MarketEvent = Tuple[float, Dict[str, Any]]
+
+# CSV 列名别名（兼容 data.binance.vision 的 bookTicker 归档格式）
+_CSV_COLUMNS = {
+    "ts": ("timestamp", "ts", "event_time", "transaction_time", "time", "E", "T"),
+    "bid": ("bid", "best_bid_price", "bid_price", "b"),
+    "bid_qty": ("bid_qty", "best_bid_qty", "bid_size", "B"),
+    "ask": ("ask", "best_ask_price", "ask_price", "a"),
+    "ask_qty": ("ask_qty", "best_ask_qty", "ask_size", "A"),
+    "symbol": ("symbol", "s"),
+    "update_id": ("update_id", "u"),
+}
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def _event_time(msg: Dict[str, Any]) -> Optional[float]:
+    ts = msg.get("T") or msg.get("E")
+    return ts / 1000 if ts else None
+
+def load_jsonl(path: str, symbol: Optional[str] = None) -> Iterator[MarketEvent]:
+    """
+    读取 JSONL 行情：每行一条 WebSocket 原始消息（bookTicker / depthUpdate / trade / aggTrade），
+    也兼容组合流格式 {"stream": ..., "data": {...}}；按 T/E 字段取交易所时间
+    """
+    symbol = symbol.upper() if symbol else None
+    with _open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            msg = json.loads(line)
+            if "data" in msg and "stream" in msg:
+                msg = msg["data"]
+            if symbol and msg.get("s", symbol) != symbol:
+                continue
+            ts = _event_time(msg)
+            if ts is None:
+                continue
+            if "e" not in msg and "b" in msg and "a" in msg:
+                msg["e"] = "bookTicker"
+            yield ts, msg
+
+def load_csv(path: str, symbol: Optional[str] = None) -> Iterator[MarketEvent]:
+    """读取 bookTicker CSV（需含时间戳与买一/卖一价量列，时间戳单位为毫秒），转换为 bookTicker 消息"""
+    default_symbol = symbol.upper() if symbol else None
+    with _open(path) as f:
+        reader = csv.DictReader(f)
+        columns = {}
+        for key, aliases in _CSV_COLUMNS.items():
+            columns[key] = next((a for a in aliases if a in (reader.fieldnames or [])), None)
+        missing = [k for k in ("ts", "bid", "bid_qty", "ask", "ask_qty") if columns[k] is None]
+        if missing:
+            raise ValueError(f"CSV 缺少必要列 {missing}: {path}")
+        ts_col, sym_col, uid_col = columns["ts"], columns["symbol"], columns["update_id"]
+        for row in reader:
+            row_symbol = row[sym_col].upper() if sym_col else default_symbol
+            if default_symbol and row_symbol != default_symbol:
+                continue
+            ts_ms = int(float(row[ts_col]))
+            yield ts_ms / 1000, {
+                "e": "bookTicker",
+                "s": row_symbol,
+                "u": int(row[uid_col]) if uid_col else 0,
+                "b": row[columns["bid"]],
+                "B": row[columns["bid_qty"]],
+                "a": row[columns["ask"]],
+                "A": row[columns["ask_qty"]],
+                "T": ts_ms,
+                "E": ts_ms,
+            }
+
+def _recorded_tickers(directory: str, symbol: str, start_ms, end_ms) -> Iterator[MarketEvent]:
+    for ts, _, uid, bid, bid_qty, ask, ask_qty in read_records(directory, symbol, KIND_TICKER, start_ms, end_ms):
+        yield ts / 1000, {
+            "e": "bookTicker", "s": symbol, "u": uid, "b": str(bid), "B": str(bid_qty),
+            "a": str(ask), "A": str(ask_qty), "T": ts, "E": ts,
+        }
+
+def _recorded_depth(directory: str, symbol: str, start_ms, end_ms) -> Iterator[MarketEvent]:
+    """同一 depthUpdate 事件拆成的多条记录（U/u 相同且相邻）重新合并为一条消息"""
+    records = read_records(directory, symbol, KIND_DEPTH, start_ms, end_ms)
+    for (ts, first_id, final_id, prev_id), group in itertools.groupby(records, key=lambda r: (r[0], r[2], r[3], r[4])):
+        bids, asks = [], []
+        for record in group:
+            side = record[7]
+            if side == DEPTH_BID:
+                bids.append([str(record[5]), str(record[6])])
+            elif side == DEPTH_ASK:
+                asks.append([str(record[5]), str(record[6])])
+        yield ts / 1000, {
+            "e": "depthUpdate", "s": symbol, "U": first_id, "u": final_id, "pu": prev_id,
+            "b": bids, "a": asks, "T": ts, "E": ts,
+        }
+
+def _recorded_trades(directory: str, symbol: str, start_ms, end_ms) -> Iterator[MarketEvent]:
+    for ts, _, trade_id, price, qty, buyer_is_maker in read_records(directory, symbol, KIND_TRADE, start_ms, end_ms):
+        yield ts / 1000, {
+            "e": "aggTrade", "s": symbol, "a": trade_id, "p": str(price), "q": str(qty),
+            "m": bool(buyer_is_maker), "T": ts, "E": ts,
+        }
+
+def load_recorded(directory: str, symbol: Optional[str] = None, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[MarketEvent]:
+    """
+    读取 MarketDataRecorder 录制目录，按交易所时间归并 bookTicker / depthUpdate / aggTrade 消息；
+    start / end 为 Unix 秒，未指定 symbol 时回放目录下全部交易对
+    """
+    start_ms = int(start * 1000) if start is not None else None
+    end_ms = int(end * 1000) if end is not None else None
+    symbols = [symbol.upper()] if symbol else sorted(
+        d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))
+    )
+    streams = []
+    for s in symbols:
+        streams.append(_recorded_tickers(directory, s, start_ms, end_ms))
+        streams.append(_recorded_depth(directory, s, start_ms, end_ms))
+        streams.append(_recorded_trades(directory, s, start_ms, end_ms))
+    return merge_events(*streams)
+
+def load_events(path: str, symbol: Optional[str] = None) -> Iterator[MarketEvent]:
+    """按扩展名选择读取方式（.jsonl/.json/.csv，可带 .gz）；目录视为 MarketDataRecorder 录制数据"""
+    if os.path.isdir(path):
+        return load_recorded(path, symbol)
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".csv"):
+        return load_csv(path, symbol)
+    if name.endswith((".jsonl", ".json", ".ndjson")):
+        return load_jsonl(path, symbol)
+    raise ValueError(f"不支持的行情文件格式: {path}")
+
+def merge_events(*streams: Iterable[MarketEvent]) -> Iterator[MarketEvent]:
+    """按时间戳归并多个已排序的事件流（如多个交易对或多个文件）"""
+    return heapq.merge(*streams, key=lambda e: e[0])
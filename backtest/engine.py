@@ -0,0 +1,172 @@
+import asyncio
+import copy
+import itertools
+import json
+import os
+import time
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Union
+from core.logger import LoggerWorker
+from core.market import MarketDataWorker
+from core.order import OrderManager
+from core.risk import RiskController
+from core.state import StateRegistry
+from core.user_stream import UserDataStreamWorker
+from utils.config_loader import Config, ConfigSnapshot, get_config_service, load_yaml
+from utils.symbol_rules import SymbolRules, SymbolRulesCache
+from backtest.clock import run_virtual
+from backtest.data import MarketEvent, load_events
+from backtest.exchange import SimExchange
+
+def set_path(d: Dict[str, Any], dotted_key: str, value: Any):
+    """按点分路径写入嵌套字典，如 set_path(y, "order_config.levels", 2)"""
+    keys = dotted_key.split(".")
+    for key in keys[:-1]:
+        d = d.setdefault(key, {})
+    d[keys[-1]] = value
+
+def build_snapshot(overrides: Optional[Dict[str, Any]] = None, yaml_path: str = "config.yaml") -> ConfigSnapshot:
+    """读取 config.yaml 并应用点分路径覆盖项，生成回测用配置快照（不读取 .env，无需 API Key）"""
+    y = copy.deepcopy(load_yaml(yaml_path))
+    for key, value in (overrides or {}).items():
+        set_path(y, key, value)
+    return ConfigSnapshot.from_config(Config(y, {}))
+
+def load_rules(path: str) -> Dict[str, SymbolRules]:
+    """读取 SymbolRulesCache 落盘的 exchangeInfo 缓存，作为回测撮合端的交易对规则"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {k: SymbolRules.from_dict(v) for k, v in data["rules"].items()}
+
+@dataclass
+class BacktestResult:
+    """单次回测结果，字段含义见 SimExchange.summary()"""
+    params: Dict[str, Any]
+    ticks: int
+    sim_seconds: float
+    wall_seconds: float
+    orders_placed: int
+    orders_amended: int
+    orders_canceled: int
+    fills: int
+    maker_fills: int
+    taker_fills: int
+    fill_rate: float
+    volume: float
+    turnover: float
+    fees: float
+    realized_pnl: float
+    unrealized_pnl: float
+    net_pnl: float
+    final_position: Dict[str, float] = field(default_factory=dict)
+    max_abs_position: Dict[str, float] = field(default_factory=dict)
+    avg_abs_position: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d["ticks_per_second"] = self.ticks_per_second
+        return d
+
+class Backtest:
+    """
+    回测引擎：在虚拟时间事件循环中，让未经修改的 MarketDataWorker / OrderManager / RiskController /
+    UserDataStreamWorker / LoggerWorker 对接 SimExchange，按录制行情加速回放。
+    - overrides 为 config.yaml 的点分路径覆盖项，如 {"order_config.levels": 2}，便于参数扫描
+    - quiet=True 时丢弃各模块的 print 输出（打印是回放的主要开销之一）
+    - LoggerWorker 的时间戳与文件名使用墙钟时间；未指定 log_dir 时不写 CSV
+    """
+    def __init__(self, events: Union[str, Iterable[MarketEvent]], overrides: Optional[Dict[str, Any]] = None, yaml_path: str = "config.yaml",
+                 rules: Optional[Dict[str, SymbolRules]] = None, initial_balance: Optional[float] = None, maker_fee: float = 0.0002,
+                 taker_fee: float = 0.0005, latency: float = 0.005, feed_latency: float = 0.0, user_stream: bool = True,
+                 log_dir: Optional[str] = None, quiet: bool = True):
+        self.events = events
+        self.overrides = dict(overrides or {})
+        self.snapshot = build_snapshot(self.overrides, yaml_path)
+        self.rules = rules
+        self.initial_balance = initial_balance if initial_balance is not None else float(self.snapshot.initial_capital)
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.latency = latency
+        self.feed_latency = feed_latency
+        self.user_stream = user_stream
+        self.log_dir = log_dir
+        self.quiet = quiet
+        self.exchange: Optional[SimExchange] = None
+
+    def run(self) -> BacktestResult:
+        events = load_events(self.events) if isinstance(self.events, str) else iter(self.events)
+        first = next(events, None)
+        if first is None:
+            raise ValueError("回测行情为空")
+        events = itertools.chain([first], events)
+        started = time.perf_counter()
+        if self.quiet:
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                summary = run_virtual(self._run(events), start=first[0])
+        else:
+            summary = run_virtual(self._run(events), start=first[0])
+        return BacktestResult(params=self.overrides, wall_seconds=time.perf_counter() - started, **summary)
+
+    async def _run(self, events: Iterable[MarketEvent]) -> Dict[str, Any]:
+        cfg = self.snapshot
+        config_service = get_config_service()
+        config_service.set_snapshot(cfg)
+        symbols = cfg.symbol_names
+        env = "backtest"
+        registry = StateRegistry()
+        exchange = SimExchange(
+            symbols, rules=self.rules, initial_balance=self.initial_balance, maker_fee=self.maker_fee,
+            taker_fee=self.taker_fee, latency=self.latency, feed_latency=self.feed_latency,
+        )
+        self.exchange = exchange
+        market_worker = MarketDataWorker(
+            symbols, env, rest=exchange, depth_enabled=cfg.depth_enabled, depth_snapshot_limit=cfg.depth_snapshot_limit,
+            registry=registry, ws_factory=exchange.market_ws,
+        )
+        rules_cache = SymbolRulesCache(exchange, ttl=float("inf"), cache_path=None)
+        await rules_cache.load()
+        logger_worker = LoggerWorker(exchange, self.log_dir or "", bool(self.log_dir), cfg.log_level, symbols, "backtest", env, registry=registry, config_service=config_service)
+        managers: Dict[str, OrderManager] = {}
+        workers = [logger_worker]
+        for symbol in symbols:
+            state = registry.get(symbol)
+            max_net_position = (cfg.symbol_config(symbol).max_net_notional / Decimal(str(state.mark_price or 1))).quantize(Decimal('1'))
+            workers.append(RiskController(exchange, symbol, max_net_position, logger=logger_worker, check_interval=cfg.risk_check_interval, state=state, config_service=config_service))
+
+        async def order_manager_wrapper(symbol: str):
+            state = registry.get(symbol)
+            while state.mark_price <= 0:
+                await asyncio.sleep(0.1)
+            sc = cfg.symbol_config(symbol)
+            qty_per_order = (sc.quantity_per_order_usdt / Decimal(str(state.mark_price))).quantize(Decimal('0.001'))
+            manager = OrderManager(
+                exchange, symbol, sc.levels, qty_per_order, sc.price_offset_percent, cfg.orderbook_refresh_interval, cfg.open_orders_sync_every,
+                requote_ticks=sc.requote_ticks, requote_bps=sc.requote_bps, debounce_ms=cfg.debounce_ms,
+                rules_cache=rules_cache, config_service=config_service, state=state,
+            )
+            managers[symbol] = manager
+            await manager.run()
+
+        if self.user_stream:
+            workers.append(UserDataStreamWorker(
+                exchange, symbols, env, keepalive_interval=cfg.listen_key_refresh_interval,
+                reconcile_interval=cfg.user_stream_reconcile_interval, registry=registry, ws_factory=exchange.user_ws,
+            ))
+        # 行情数据结束时模拟连接关闭，MarketDataWorker 自行退出
+        tasks = [asyncio.create_task(w.run()) for w in [market_worker] + workers]
+        tasks.extend(asyncio.create_task(order_manager_wrapper(s)) for s in symbols)
+        try:
+            await exchange.replay(events)
+        finally:
+            for worker in workers + list(managers.values()):
+                worker.stop()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return exchange.summary()
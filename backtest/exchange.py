@@ -0,0 +1,710 @@
+import asyncio
+import itertools
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+from sortedcontainers import SortedDict
+from utils.http import BinanceRestError
+from utils.symbol_rules import SymbolRules
+from backtest.data import MarketEvent
+
+# 未提供交易对规则时使用的默认规则（与 BTCUSDT 合约一致）
+DEFAULT_RULES = {
+    "price_tick": "0.1", "min_price": "0", "max_price": "0",
+    "step_size": "0.001", "min_qty": "0.001", "max_qty": "1000",
+    "market_step_size": "0.001", "market_min_qty": "0.001", "market_max_qty": "120",
+    "min_notional": "100", "multiplier_up": "1.05", "multiplier_down": "0.95",
+}
+
+def _error(code: int, msg: str) -> Dict[str, Any]:
+    return {"code": code, "msg": msg}
+
+@dataclass
+class SimOrder:
+    order_id: int
+    client_order_id: str
+    symbol: str
+    side: str
+    type: str
+    price: float
+    qty: float
+    update_time: float
+    filled: float = 0.0
+    # 同价位排在本单之前的数量；None 表示未知（价位尚未成为最优价且无深度数据）
+    queue_ahead: Optional[float] = None
+    status: str = "NEW"
+
+    @property
+    def remaining(self) -> float:
+        return self.qty - self.filled
+
+class _Position:
+    """单向持仓：数量、持仓均价、已实现盈亏，以及用于统计库存的时间加权绝对持仓"""
+    def __init__(self):
+        self.qty = 0.0
+        self.entry = 0.0
+        self.realized = 0.0
+        self.max_abs = 0.0
+        self.abs_area = 0.0
+        self.last_time: Optional[float] = None
+
+    def apply(self, signed_qty: float, price: float, now: float) -> float:
+        """按成交更新持仓，返回本次已实现盈亏"""
+        if self.last_time is not None:
+            self.abs_area += abs(self.qty) * (now - self.last_time)
+        self.last_time = now
+        realized = 0.0
+        if self.qty == 0 or (self.qty > 0) == (signed_qty > 0):
+            total = abs(self.qty) + abs(signed_qty)
+            self.entry = (self.entry * abs(self.qty) + price * abs(signed_qty)) / total
+            self.qty = round(self.qty + signed_qty, 10)
+        else:
+            closing = min(abs(signed_qty), abs(self.qty))
+            realized = closing * (price - self.entry) * (1 if self.qty > 0 else -1)
+            # 数量按 10 位小数取整，避免浮点累计误差产生 1e-17 级别的残余持仓
+            self.qty = round(self.qty + signed_qty, 10)
+            if abs(self.qty) < 1e-12:
+                self.qty, self.entry = 0.0, 0.0
+            elif (self.qty > 0) == (signed_qty > 0):
+                # 反手：剩余部分按成交价开仓
+                self.entry = price
+        self.realized += realized
+        self.max_abs = max(self.max_abs, abs(self.qty))
+        return realized
+
+class _SymbolBook:
+    """单个交易对的撮合状态：最优买卖价、可选的全量深度、本账户挂单与持仓"""
+    def __init__(self, symbol: str, rules: SymbolRules):
+        self.symbol = symbol
+        self.rules = rules
+        self.min_notional = float(rules.min_notional)
+        self.bid = self.bid_qty = self.ask = self.ask_qty = 0.0
+        self.has_ticker = False
+        self.depth_bids: SortedDict = SortedDict()
+        self.depth_asks: SortedDict = SortedDict()
+        self.last_update_id = 0
+        self.event_time = 0
+        self.orders: List[SimOrder] = []
+        self.position = _Position()
+
+    @property
+    def mid(self) -> float:
+        return (self.bid + self.ask) / 2 if self.bid > 0 and self.ask > 0 else 0.0
+
+class SimWebSocket:
+    """模拟行情 WebSocket，接口与 BinanceWebSocket 一致；消息由 SimExchange 回放推送"""
+    def __init__(self, exchange: "SimExchange", symbols, env: str = "backtest"):
+        self.exchange = exchange
+        self.symbols = [s.upper() for s in ([symbols] if isinstance(symbols, str) else symbols)]
+        self.symbol = self.symbols[0]
+        self.env = env
+        self.streams = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._connected = False
+
+    async def connect(self):
+        self.exchange._market_sockets.append(self)
+        self._connected = True
+
+    async def subscribe_bookticker(self):
+        self.streams.add("bookTicker")
+
+    async def subscribe_depth(self, speed: str = "100ms"):
+        self.streams.add("depthUpdate")
+
+    async def listen(self):
+        if not self._connected:
+            raise RuntimeError("WebSocket 未连接，无法监听消息")
+        while True:
+            msg = await self.queue.get()
+            if msg is None:
+                return
+            yield msg
+
+    async def close(self):
+        if self in self.exchange._market_sockets:
+            self.exchange._market_sockets.remove(self)
+        self._connected = False
+
+    @property
+    def connected(self):
+        return self._connected
+
+class SimUserDataWebSocket:
+    """模拟用户数据流，接口与 BinanceUserDataWebSocket 一致"""
+    def __init__(self, exchange: "SimExchange", listen_key: str, env: str = "backtest"):
+        self.exchange = exchange
+        self.listen_key = listen_key
+        self.env = env
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._connected = False
+
+    async def connect(self):
+        self.exchange._user_sockets.append(self)
+        self._connected = True
+
+    async def listen(self):
+        while True:
+            event = await self.queue.get()
+            if event is None:
+                break
+            yield event
+        self._connected = False
+
+    async def close(self):
+        if self in self.exchange._user_sockets:
+            self.exchange._user_sockets.remove(self)
+        self._connected = False
+
+    @property
+    def connected(self):
+        return self._connected
+
+class SimExchange:
+    """
+    回测撮合端，实现 AsyncBinanceRest 的接口，OrderManager / RiskController / LoggerWorker 等模块无需修改即可对接：
+    - replay() 按交易所时间戳回放 bookTicker / depthUpdate / trade 行情并推送给模拟 WebSocket，驱动虚拟时钟
+    - 限价单按队列位置成交：挂单时记录同价位排在前面的数量，该价位的成交量和挂单减少先消耗前面的队列；
+      对手价穿过挂单价时全部成交；穿价的限价单与市价单按对手最优价主动成交
+    - 被动成交收 maker 费率，主动成交收 taker 费率；REST 请求与推送可设置单程延迟（虚拟时间）
+    - 成交、挂单变化通过模拟用户数据流推送 ORDER_TRADE_UPDATE / ACCOUNT_UPDATE
+    """
+    def __init__(self, symbols, rules: Optional[Dict[str, SymbolRules]] = None, initial_balance: float = 10000.0,
+                 maker_fee: float = 0.0002, taker_fee: float = 0.0005, latency: float = 0.0, feed_latency: float = 0.0):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        rules = rules or {}
+        self.books: Dict[str, _SymbolBook] = {
+            s: _SymbolBook(s, rules.get(s) or SymbolRules.from_dict({"symbol": s, **DEFAULT_RULES})) for s in symbols
+        }
+        self.initial_balance = initial_balance
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.latency = latency
+        self.feed_latency = feed_latency
+        self.orders: Dict[int, SimOrder] = {}
+        self._order_ids = itertools.count(1)
+        self._market_sockets: List[SimWebSocket] = []
+        self._user_sockets: List[SimUserDataWebSocket] = []
+        self.finished = False
+        # 统计
+        self.ticks = 0
+        self.start_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+        self.orders_placed = 0
+        self.orders_amended = 0
+        self.orders_canceled = 0
+        self.fills = 0
+        self.maker_fills = 0
+        self.taker_fills = 0
+        self.volume = 0.0
+        self.turnover = 0.0
+        self.fees = 0.0
+
+    # ---------- 模拟连接 ----------
+
+    def market_ws(self, symbols, env: str = "backtest") -> SimWebSocket:
+        """供 MarketDataWorker(ws_factory=...) 使用"""
+        return SimWebSocket(self, symbols, env)
+
+    def user_ws(self, listen_key: str, env: str = "backtest") -> SimUserDataWebSocket:
+        """供 UserDataStreamWorker(ws_factory=...) 使用"""
+        return SimUserDataWebSocket(self, listen_key, env)
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def _deliver(self, queue: asyncio.Queue, item):
+        if self.feed_latency > 0:
+            asyncio.get_running_loop().call_later(self.feed_latency, queue.put_nowait, item)
+        else:
+            queue.put_nowait(item)
+
+    async def _delay(self):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    # ---------- 行情回放 ----------
+
+    async def replay(self, events: Iterable[MarketEvent]):
+        """按时间戳回放行情直到数据结束；虚拟时钟在事件之间直接跳过空闲时间"""
+        loop = asyncio.get_running_loop()
+        handlers = {
+            "bookTicker": self._on_book_ticker,
+            "depthUpdate": self._on_depth,
+            "trade": self._on_trade,
+            "aggTrade": self._on_trade,
+        }
+        for ts, msg in events:
+            delay = ts - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.start_time is None:
+                self.start_time = ts
+            book = self.books.get(msg.get("s"))
+            handler = handlers.get(msg.get("e"))
+            if book is None or handler is None:
+                continue
+            self.ticks += 1
+            handler(book, msg)
+        self.end_time = loop.time()
+        self.finished = True
+        for ws in self._market_sockets + self._user_sockets:
+            ws.queue.put_nowait(None)
+
+    def _publish(self, stream: str, msg: Dict[str, Any]):
+        for ws in self._market_sockets:
+            if stream in ws.streams:
+                self._deliver(ws.queue, msg)
+
+    def _on_book_ticker(self, book: _SymbolBook, msg: Dict[str, Any]):
+        book.bid = float(msg["b"])
+        book.bid_qty = float(msg["B"])
+        book.ask = float(msg["a"])
+        book.ask_qty = float(msg["A"])
+        book.has_ticker = True
+        if book.orders:
+            self._match_quotes(book)
+        self._publish("bookTicker", msg)
+
+    def _on_depth(self, book: _SymbolBook, msg: Dict[str, Any]):
+        for levels, side in ((msg.get("b", []), book.depth_bids), (msg.get("a", []), book.depth_asks)):
+            for price, qty in levels:
+                p, q = float(price), float(qty)
+                if q == 0:
+                    side.pop(p, None)
+                else:
+                    side[p] = q
+        book.last_update_id = msg.get("u", book.last_update_id)
+        book.event_time = msg.get("E", book.event_time)
+        if not book.has_ticker and book.depth_bids and book.depth_asks:
+            book.bid, book.bid_qty = book.depth_bids.peekitem(-1)
+            book.ask, book.ask_qty = book.depth_asks.peekitem(0)
+        if book.orders:
+            # 挂单所在价位数量减少时，前面的队列最多只剩该价位的剩余数量
+            for order in book.orders:
+                side = book.depth_bids if order.side == "BUY" else book.depth_asks
+                if order.queue_ahead is not None:
+                    order.queue_ahead = min(order.queue_ahead, side.get(order.price, 0.0))
+            self._match_quotes(book)
+        self._publish("depthUpdate", msg)
+
+    def _on_trade(self, book: _SymbolBook, msg: Dict[str, Any]):
+        """逐笔成交：买方为 maker（m=True）时是卖方主动成交，吃掉买单；反之吃掉卖单"""
+        if not book.orders:
+            return
+        price, qty = float(msg["p"]), float(msg["q"])
+        hit_side = "BUY" if msg.get("m") else "SELL"
+        for order in list(book.orders):
+            if order.side != hit_side:
+                continue
+            if (hit_side == "BUY" and price < order.price) or (hit_side == "SELL" and price > order.price):
+                # 成交价穿过挂单价，挂单全部成交
+                self._fill(book, order, order.remaining, order.price, maker=True)
+            elif price == order.price:
+                ahead = order.queue_ahead if order.queue_ahead is not None else qty
+                order.queue_ahead = max(0.0, ahead - qty)
+                available = qty - ahead
+                if available > 0:
+                    self._fill(book, order, min(available, order.remaining), order.price, maker=True)
+
+    def _match_quotes(self, book: _SymbolBook):
+        """按最新买一/卖一更新挂单队列位置，对手价穿过挂单价时全部成交"""
+        for order in list(book.orders):
+            if order.side == "BUY":
+                if 0 < book.ask <= order.price:
+                    self._fill(book, order, order.remaining, order.price, maker=True)
+                elif book.bid == order.price:
+                    order.queue_ahead = book.bid_qty if order.queue_ahead is None else min(order.queue_ahead, book.bid_qty)
+                elif book.bid < order.price:
+                    # 买一低于挂单价：前面的队列已被吃完或撤走，本单排在最前
+                    order.queue_ahead = 0.0
+            else:
+                if 0 < book.bid and book.bid >= order.price:
+                    self._fill(book, order, order.remaining, order.price, maker=True)
+                elif book.ask == order.price:
+                    order.queue_ahead = book.ask_qty if order.queue_ahead is None else min(order.queue_ahead, book.ask_qty)
+                elif book.ask > order.price:
+                    order.queue_ahead = 0.0
+
+    def _initial_queue(self, book: _SymbolBook, order: SimOrder) -> Optional[float]:
+        if order.side == "BUY":
+            if order.price == book.bid:
+                return book.bid_qty
+            if order.price > book.bid:
+                return 0.0
+            return book.depth_bids.get(order.price) if book.depth_bids else None
+        if order.price == book.ask:
+            return book.ask_qty
+        if order.price < book.ask:
+            return 0.0
+        return book.depth_asks.get(order.price) if book.depth_asks else None
+
+    # ---------- 撮合与账户 ----------
+
+    def _fill(self, book: _SymbolBook, order: SimOrder, qty: float, price: float, maker: bool):
+        now = self._now()
+        signed = qty if order.side == "BUY" else -qty
+        realized = book.position.apply(signed, price, now)
+        fee = price * qty * (self.maker_fee if maker else self.taker_fee)
+        self.fees += fee
+        self.fills += 1
+        if maker:
+            self.maker_fills += 1
+        else:
+            self.taker_fills += 1
+        self.volume += qty
+        self.turnover += qty * price
+        order.filled += qty
+        order.update_time = now
+        if order.remaining <= 1e-12:
+            order.status = "FILLED"
+            self._remove(book, order)
+        else:
+            order.status = "PARTIALLY_FILLED"
+        if self._user_sockets:
+            self._emit_order(order, "TRADE", last_qty=qty, last_price=price, realized=realized, commission=fee)
+            self._emit_account(book)
+
+    def _remove(self, book: _SymbolBook, order: SimOrder):
+        self.orders.pop(order.order_id, None)
+        if order in book.orders:
+            book.orders.remove(order)
+
+    @property
+    def realized_pnl(self) -> float:
+        return sum(b.position.realized for b in self.books.values())
+
+    @property
+    def wallet_balance(self) -> float:
+        return self.initial_balance + self.realized_pnl - self.fees
+
+    def unrealized_pnl(self, book: _SymbolBook) -> float:
+        pos = book.position
+        return (book.mid - pos.entry) * pos.qty if pos.qty and book.mid else 0.0
+
+    def _emit(self, event: Dict[str, Any]):
+        for ws in self._user_sockets:
+            self._deliver(ws.queue, event)
+
+    def _emit_order(self, order: SimOrder, execution: str, last_qty: float = 0.0, last_price: float = 0.0, realized: float = 0.0, commission: float = 0.0):
+        ms = int(self._now() * 1000)
+        self._emit({
+            "e": "ORDER_TRADE_UPDATE",
+            "E": ms,
+            "T": ms,
+            "o": {
+                "s": order.symbol, "c": order.client_order_id, "S": order.side, "o": order.type,
+                "q": str(order.qty), "p": str(order.price), "X": order.status, "x": execution,
+                "i": order.order_id, "l": str(last_qty), "z": str(order.filled), "L": str(last_price),
+                "n": str(commission), "N": "USDT", "rp": str(realized), "T": ms,
+            },
+        })
+
+    def _emit_account(self, book: _SymbolBook):
+        ms = int(self._now() * 1000)
+        wallet = str(self.wallet_balance)
+        self._emit({
+            "e": "ACCOUNT_UPDATE",
+            "E": ms,
+            "T": ms,
+            "a": {
+                "m": "ORDER",
+                "B": [{"a": "USDT", "wb": wallet, "cw": wallet}],
+                "P": [{
+                    "s": book.symbol, "pa": str(book.position.qty), "ep": str(book.position.entry),
+                    "up": str(self.unrealized_pnl(book)), "ps": "BOTH",
+                }],
+            },
+        })
+
+    def _order_resp(self, order: SimOrder) -> Dict[str, Any]:
+        return {
+            "orderId": order.order_id,
+            "clientOrderId": order.client_order_id,
+            "symbol": order.symbol,
+            "side": order.side,
+            "type": order.type,
+            "status": order.status,
+            "price": str(order.price),
+            "origQty": str(order.qty),
+            "executedQty": str(order.filled),
+            "timeInForce": "GTC",
+            "positionSide": "BOTH",
+            "updateTime": int(order.update_time * 1000),
+        }
+
+    def _find(self, symbol: str, order_id: Optional[int], client_order_id: Optional[str]) -> Optional[SimOrder]:
+        if order_id is not None:
+            order = self.orders.get(int(order_id))
+            return order if order is not None and order.symbol == symbol else None
+        book = self.books.get(symbol)
+        return next((o for o in book.orders if o.client_order_id == client_order_id), None) if book else None
+
+    def _place(self, symbol: str, side: str, quantity, price=None, order_type: str = "LIMIT", client_order_id: Optional[str] = None,
+               time_in_force: str = "GTC", reduce_only: bool = False) -> Dict[str, Any]:
+        book = self.books.get(symbol)
+        if book is None:
+            return _error(-1121, "Invalid symbol.")
+        qty = float(quantity)
+        if qty <= 0:
+            return _error(-4003, "Quantity less than or equal to zero.")
+        if reduce_only:
+            # 只减仓：数量不超过反方向持仓，无持仓可减时拒绝
+            reducible = -book.position.qty if side == "BUY" else book.position.qty
+            if reducible <= 1e-12:
+                return _error(-2022, "ReduceOnly Order is rejected.")
+            qty = min(qty, reducible)
+        order_id = next(self._order_ids)
+        order = SimOrder(order_id, client_order_id or f"sim-{order_id}", symbol, side, order_type,
+                         float(price) if price is not None else 0.0, qty, self._now())
+        if order_type == "MARKET":
+            px = book.ask if side == "BUY" else book.bid
+            if px <= 0:
+                return _error(-2010, "No market price available.")
+            self.orders_placed += 1
+            self._fill(book, order, qty, px, maker=False)
+            return self._order_resp(order)
+        if order.price * qty < book.min_notional and not reduce_only:
+            return _error(-4164, f"Order's notional must be no smaller than {book.rules.min_notional} (unless you choose reduce only).")
+        self.orders_placed += 1
+        crossing = book.ask if side == "BUY" else book.bid
+        if crossing > 0 and ((side == "BUY" and order.price >= crossing) or (side == "SELL" and order.price <= crossing)):
+            self._fill(book, order, qty, crossing, maker=False)
+            return self._order_resp(order)
+        if time_in_force == "IOC":
+            # 未能立即成交的 IOC 单直接过期
+            order.status = "EXPIRED"
+            return self._order_resp(order)
+        order.queue_ahead = self._initial_queue(book, order)
+        book.orders.append(order)
+        self.orders[order_id] = order
+        if self._user_sockets:
+            self._emit_order(order, "NEW")
+        return self._order_resp(order)
+
+    def _modify(self, symbol: str, side: str, quantity, price, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Dict[str, Any]:
+        order = self._find(symbol, order_id, client_order_id)
+        if order is None:
+            return _error(-2013, "Order does not exist.")
+        qty, new_price = float(quantity), float(price)
+        if qty <= order.filled:
+            return _error(-2021, "Order would immediately trigger or quantity too small.")
+        book = self.books[symbol]
+        if new_price * qty < book.min_notional:
+            return _error(-4164, f"Order's notional must be no smaller than {book.rules.min_notional} (unless you choose reduce only).")
+        self.orders_amended += 1
+        # 改价或加量会失去原队列位置；只减量保留
+        lose_priority = new_price != order.price or qty > order.qty
+        order.price, order.qty, order.update_time = new_price, qty, self._now()
+        crossing = book.ask if side == "BUY" else book.bid
+        if crossing > 0 and ((side == "BUY" and new_price >= crossing) or (side == "SELL" and new_price <= crossing)):
+            self._fill(book, order, order.remaining, crossing, maker=False)
+            return self._order_resp(order)
+        if lose_priority:
+            order.queue_ahead = self._initial_queue(book, order)
+        if self._user_sockets:
+            self._emit_order(order, "AMENDMENT")
+        return self._order_resp(order)
+
+    def _cancel(self, symbol: str, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Dict[str, Any]:
+        order = self._find(symbol, order_id, client_order_id)
+        if order is None:
+            return _error(-2011, "Unknown order sent.")
+        self.orders_canceled += 1
+        order.status = "CANCELED"
+        order.update_time = self._now()
+        self._remove(self.books[symbol], order)
+        if self._user_sockets:
+            self._emit_order(order, "CANCELED")
+        return self._order_resp(order)
+
+    @staticmethod
+    def _raise_if_error(resp: Dict[str, Any], path: str) -> Dict[str, Any]:
+        if "code" in resp and "orderId" not in resp:
+            raise BinanceRestError(400, resp["code"], resp["msg"], path)
+        return resp
+
+    # ---------- AsyncBinanceRest 接口 ----------
+
+    async def close(self):
+        pass
+
+    async def place_order(self, symbol: str, side: str, quantity: Decimal, price: Optional[Decimal] = None, order_type: str = "LIMIT", time_in_force: str = "GTC", client_order_id: Optional[str] = None,
+                          reduce_only: bool = False, resp_type: Optional[str] = None) -> Any:
+        # 撮合同步完成，回报总是包含最终成交状态（相当于 resp_type="RESULT"）
+        await self._delay()
+        resp = self._place(symbol, side, quantity, price, order_type, client_order_id, time_in_force, reduce_only)
+        await self._delay()
+        return self._raise_if_error(resp, "/fapi/v1/order")
+
+    async def modify_order(self, symbol: str, side: str, quantity: Decimal, price: Decimal, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Any:
+        await self._delay()
+        resp = self._modify(symbol, side, quantity, price, order_id, client_order_id)
+        await self._delay()
+        return self._raise_if_error(resp, "/fapi/v1/order")
+
+    async def cancel_order(self, symbol: str, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Any:
+        await self._delay()
+        resp = self._cancel(symbol, order_id, client_order_id)
+        await self._delay()
+        return self._raise_if_error(resp, "/fapi/v1/order")
+
+    async def place_batch_orders(self, symbol: str, orders: List[Dict[str, Any]]) -> List[Any]:
+        await self._delay()
+        results = [
+            self._place(symbol, o["side"], o["quantity"], o.get("price"), o.get("order_type", "LIMIT"), o.get("client_order_id"),
+                        o.get("time_in_force", "GTC"), o.get("reduce_only", False))
+            for o in orders
+        ]
+        await self._delay()
+        return results
+
+    async def modify_batch_orders(self, symbol: str, orders: List[Dict[str, Any]]) -> List[Any]:
+        await self._delay()
+        results = [
+            self._modify(symbol, o["side"], o["quantity"], o["price"], o.get("order_id"), o.get("client_order_id"))
+            for o in orders
+        ]
+        await self._delay()
+        return results
+
+    async def cancel_batch_orders(self, symbol: str, order_ids: Optional[List[int]] = None, client_order_ids: Optional[List[str]] = None) -> List[Any]:
+        await self._delay()
+        if order_ids:
+            results = [self._cancel(symbol, order_id=i) for i in order_ids]
+        else:
+            results = [self._cancel(symbol, client_order_id=c) for c in client_order_ids or []]
+        await self._delay()
+        return results
+
+    async def cancel_all_orders(self, symbol: str) -> Any:
+        await self._delay()
+        book = self.books.get(symbol)
+        for order in list(book.orders if book else []):
+            self._cancel(symbol, order_id=order.order_id)
+        await self._delay()
+        return {"code": 200, "msg": "The operation of cancel all open order is done."}
+
+    async def get_open_orders(self, symbol: Optional[str] = None) -> Any:
+        await self._delay()
+        books = [self.books[symbol]] if symbol else list(self.books.values())
+        return [self._order_resp(o) for b in books for o in b.orders]
+
+    def _position_resp(self, book: _SymbolBook) -> Dict[str, Any]:
+        pos = book.position
+        return {
+            "symbol": book.symbol,
+            "positionAmt": str(pos.qty),
+            "entryPrice": str(pos.entry),
+            "markPrice": str(book.mid),
+            "unRealizedProfit": str(self.unrealized_pnl(book)),
+            "positionSide": "BOTH",
+        }
+
+    async def get_position_info(self, symbol: str) -> Any:
+        await self._delay()
+        return self._position_resp(self.books[symbol])
+
+    async def get_all_positions(self) -> List[dict]:
+        await self._delay()
+        return [self._position_resp(b) for b in self.books.values()]
+
+    async def get_balance(self) -> Any:
+        await self._delay()
+        return [{"asset": "USDT", "balance": str(self.wallet_balance), "crossWalletBalance": str(self.wallet_balance)}]
+
+    async def get_account_info(self) -> Any:
+        await self._delay()
+        unrealized = sum(self.unrealized_pnl(b) for b in self.books.values())
+        return {
+            "totalWalletBalance": str(self.wallet_balance),
+            "totalMarginBalance": str(self.wallet_balance + unrealized),
+            "totalUnrealizedProfit": str(unrealized),
+            "positions": [
+                {"symbol": b.symbol, "positionAmt": str(b.position.qty), "entryPrice": str(b.position.entry),
+                 "unrealizedProfit": str(self.unrealized_pnl(b)), "positionSide": "BOTH"}
+                for b in self.books.values()
+            ],
+        }
+
+    async def get_depth(self, symbol: str, limit: int = 1000) -> Any:
+        """返回当前深度快照；只有 bookTicker 数据时仅含买一/卖一"""
+        await self._delay()
+        book = self.books[symbol]
+        if book.depth_bids or book.depth_asks:
+            bids = [book.depth_bids.peekitem(-1 - i) for i in range(min(limit, len(book.depth_bids)))]
+            asks = [book.depth_asks.peekitem(i) for i in range(min(limit, len(book.depth_asks)))]
+        else:
+            bids = [(book.bid, book.bid_qty)] if book.bid > 0 else []
+            asks = [(book.ask, book.ask_qty)] if book.ask > 0 else []
+        return {
+            "lastUpdateId": book.last_update_id,
+            "E": book.event_time,
+            "bids": [[str(p), str(q)] for p, q in bids],
+            "asks": [[str(p), str(q)] for p, q in asks],
+        }
+
+    async def create_listen_key(self) -> str:
+        await self._delay()
+        return "sim-listen-key"
+
+    async def keepalive_listen_key(self) -> Any:
+        return {}
+
+    async def close_listen_key(self) -> Any:
+        return {}
+
+    async def get_exchange_info(self) -> dict:
+        symbols = []
+        for book in self.books.values():
+            r = book.rules
+            symbols.append({
+                "symbol": book.symbol,
+                "status": "TRADING",
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "tickSize": str(r.price_tick), "minPrice": str(r.min_price), "maxPrice": str(r.max_price)},
+                    {"filterType": "LOT_SIZE", "stepSize": str(r.step_size), "minQty": str(r.min_qty), "maxQty": str(r.max_qty)},
+                    {"filterType": "MARKET_LOT_SIZE", "stepSize": str(r.market_step_size), "minQty": str(r.market_min_qty), "maxQty": str(r.market_max_qty)},
+                    {"filterType": "MIN_NOTIONAL", "notional": str(r.min_notional)},
+                    {"filterType": "PERCENT_PRICE", "multiplierUp": str(r.multiplier_up), "multiplierDown": str(r.multiplier_down)},
+                ],
+            })
+        return {"symbols": symbols}
+
+    async def get_symbol_info(self, symbol: str) -> dict:
+        data = await self.get_exchange_info()
+        return next(s for s in data["symbols"] if s["symbol"] == symbol)
+
+    # ---------- 统计 ----------
+
+    def summary(self) -> Dict[str, Any]:
+        end = self.end_time if self.end_time is not None else (self.start_time or 0.0)
+        duration = end - (self.start_time or end)
+        unrealized = sum(self.unrealized_pnl(b) for b in self.books.values())
+        positions, max_abs, avg_abs = {}, {}, {}
+        for symbol, book in self.books.items():
+            pos = book.position
+            area = pos.abs_area + (abs(pos.qty) * (end - pos.last_time) if pos.last_time is not None else 0.0)
+            positions[symbol] = pos.qty
+            max_abs[symbol] = pos.max_abs
+            avg_abs[symbol] = area / duration if duration > 0 else 0.0
+        return {
+            "ticks": self.ticks,
+            "sim_seconds": duration,
+            "orders_placed": self.orders_placed,
+            "orders_amended": self.orders_amended,
+            "orders_canceled": self.orders_canceled,
+            "fills": self.fills,
+            "maker_fills": self.maker_fills,
+            "taker_fills": self.taker_fills,
+            "fill_rate": self.fills / self.orders_placed if self.orders_placed else 0.0,
+            "volume": self.volume,
+            "turnover": self.turnover,
+            "fees": self.fees,
+            "realized_pnl": self.realized_pnl,
+            "unrealized_pnl": unrealized,
+            "net_pnl": self.realized_pnl + unrealized - self.fees,
+            "final_position": positions,
+            "max_abs_position": max_abs,
+            "avg_abs_position": avg_abs,
+        }
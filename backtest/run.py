@@ -0,0 +1,58 @@
+import argparse
+import json
+import yaml
+from backtest.data import load_events, merge_events
+from backtest.engine import Backtest, load_rules
+
+def parse_overrides(items):
+    """解析 --set key=value（value 按 YAML 解析，如 0.01、true、[1, 2]）"""
+    overrides = {}
+    for item in items or []:
+        if "=" not in item:
+            raise SystemExit(f"--set 参数格式应为 key=value: {item}")
+        key, value = item.split("=", 1)
+        overrides[key.strip()] = yaml.safe_load(value)
+    return overrides
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="用录制行情回测做市策略（虚拟时间加速回放）")
+    parser.add_argument("data", nargs="+", help="行情文件（.jsonl/.csv，可带 .gz）或行情录制目录，多个来源按时间归并")
+    parser.add_argument("--config", default="config.yaml", help="策略配置文件")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="覆盖配置项，如 --set order_config.levels=2")
+    parser.add_argument("--symbol", help="只回放指定交易对的行情")
+    parser.add_argument("--rules", help="交易对规则缓存文件（SymbolRulesCache 落盘的 exchange_info.json）")
+    parser.add_argument("--balance", type=float, help="初始资金，默认取 initial_capital")
+    parser.add_argument("--maker-fee", type=float, default=0.0002)
+    parser.add_argument("--taker-fee", type=float, default=0.0005)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="REST 请求单程延迟（毫秒）")
+    parser.add_argument("--feed-latency-ms", type=float, default=0.0, help="行情/用户数据推送延迟（毫秒）")
+    parser.add_argument("--no-user-stream", action="store_true", help="不启用模拟用户数据流（策略走 REST 轮询）")
+    parser.add_argument("--log-dir", help="LoggerWorker 的 CSV 输出目录，默认不写")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="保留各模块的打印输出")
+    args = parser.parse_args(argv)
+
+    streams = [load_events(path, args.symbol) for path in args.data]
+    events = streams[0] if len(streams) == 1 else merge_events(*streams)
+    backtest = Backtest(
+        events,
+        overrides=parse_overrides(args.set),
+        yaml_path=args.config,
+        rules=load_rules(args.rules) if args.rules else None,
+        initial_balance=args.balance,
+        maker_fee=args.maker_fee,
+        taker_fee=args.taker_fee,
+        latency=args.latency_ms / 1000,
+        feed_latency=args.feed_latency_ms / 1000,
+        user_stream=not args.no_user_stream,
+        log_dir=args.log_dir,
+        quiet=not args.verbose,
+    )
+    result = backtest.run().to_dict()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
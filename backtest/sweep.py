@@ -0,0 +1,270 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence
+import yaml
+from backtest.data import load_events, load_recorded, merge_events
+from backtest.engine import Backtest, load_rules
+from utils.recorder import MarketDataRecorder
+
+# 常用扫描参数的命令行简写 -> config.yaml 点分路径
+GRID_ALIASES = {
+    "levels": "order_config.levels",
+    "offset": "order_config.price_offset_percent",
+    "qty": "order_config.quantity_per_order_usdt",
+    "refresh": "refresh_config.orderbook_refresh_interval",
+    "max_pos": "max_net_position_ratio",
+}
+
+# 结果表中的指标列（取自 BacktestResult.to_dict()）
+RESULT_COLUMNS = (
+    "net_pnl", "realized_pnl", "unrealized_pnl", "fees", "fills", "maker_fills", "taker_fills", "fill_rate",
+    "orders_placed", "orders_amended", "orders_canceled", "volume", "turnover",
+    "final_position", "max_abs_position", "avg_abs_position", "ticks", "sim_seconds", "wall_seconds",
+)
+
+def parse_values(text: str) -> List[Any]:
+    """解析一组取值：'1,2,3' 或 YAML 列表 '[0.1, 0.2]'，每个值按 YAML 解析"""
+    text = text.strip()
+    values = yaml.safe_load(text if text.startswith("[") else f"[{text}]")
+    if not isinstance(values, list) or not values:
+        raise SystemExit(f"扫描取值格式错误: {text}")
+    return values
+
+def build_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """参数网格的笛卡尔积，按键名排序保证每次生成的顺序一致"""
+    keys = sorted(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+def run_id(params: Dict[str, Any], data: str = "") -> str:
+    """参数组合与行情数据指纹的稳定标识，用于断点续跑时识别已完成的组合（换了行情数据的同一组参数视为未完成）"""
+    return hashlib.sha1(json.dumps([params, data], sort_keys=True).encode()).hexdigest()[:12]
+
+def data_fingerprint(paths: Sequence[str], symbol: Optional[str] = None) -> str:
+    """输入行情的指纹：各文件的绝对路径、大小与修改时间（目录展开为其中全部文件）以及交易对过滤条件"""
+    files = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.append(path)
+    entries = []
+    for f in files:
+        st = os.stat(f)
+        entries.append([f, st.st_size, st.st_mtime_ns])
+    return hashlib.sha1(json.dumps({"files": entries, "symbol": symbol}).encode()).hexdigest()[:16]
+
+def _read_marker(marker: str) -> Optional[str]:
+    """读取 .complete 标记中记录的输入指纹（旧版本标记只有事件数，视为不匹配）"""
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def prepare_data(paths: Sequence[str], data_dir: str, symbol: Optional[str] = None, fingerprint: Optional[str] = None) -> str:
+    """
+    准备各进程共享的行情数据：
+    - 单个未压缩的录制目录直接使用
+    - 其余输入（JSONL/CSV/压缩录制）转换为未压缩录制文件写入 data_dir，各进程 mmap 读取，
+      由操作系统页缓存共享，不在进程间序列化行情
+    先转换到临时目录，完成后写入 .complete 标记（含输入指纹）再整体替换 data_dir；
+    续跑时指纹一致才跳过转换，输入文件或 --symbol 变化时重新转换。
+    中途中断只会留下临时目录（下次重新转换），不会向已有小时文件重复追加
+    """
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        has_gz = any(f.endswith(".gz") for _, _, files in os.walk(paths[0]) for f in files)
+        if not has_gz:
+            return paths[0]
+    fingerprint = fingerprint or data_fingerprint(paths, symbol)
+    marker = os.path.join(data_dir, ".complete")
+    if os.path.exists(marker):
+        if _read_marker(marker) == fingerprint:
+            return data_dir
+        print(f"[Sweep] {data_dir} 中的行情与本次输入（文件或 --symbol）不一致，重新转换")
+    tmp_dir = data_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    streams = [load_events(path, symbol) for path in paths]
+    events = streams[0] if len(streams) == 1 else merge_events(*streams)
+    ts = [0.0]
+    # 以交易所时间作为接收时间，按事件时间分小时文件
+    recorder = MarketDataRecorder(tmp_dir, compress=False, flush_interval=float("inf"), clock=lambda: ts[0])
+    count = 0
+    for ts[0], msg in events:
+        recorder.on_message(msg)
+        count += 1
+    recorder.close()
+    if count == 0:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise SystemExit("行情数据为空")
+    with open(os.path.join(tmp_dir, ".complete"), "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "events": count}, f)
+    # 旧版本中断时可能留下没有标记的半成品目录
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.replace(tmp_dir, data_dir)
+    print(f"[Sweep] 行情已转换为 mmap 录制格式: {data_dir}（{count} 条）")
+    return data_dir
+
+def _run_one(data_dir: str, symbol: Optional[str], params: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """子进程入口：mmap 读取共享行情并运行一次回测"""
+    backtest = Backtest(load_recorded(data_dir, symbol), overrides=params, **options)
+    return backtest.run().to_dict()
+
+class ResultsTable:
+    """
+    扫描结果表（CSV，每个参数组合一行，完成即追加写入）：
+    重新运行同一命令时读取已有行，跳过已完成的组合
+    """
+    def __init__(self, path: str, param_keys: Sequence[str]):
+        self.path = path
+        self.columns = ["run_id"] + list(param_keys) + list(RESULT_COLUMNS)
+        self.done: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.DictReader(f)
+                if reader.fieldnames != self.columns:
+                    raise SystemExit(f"已有结果表 {path} 的列与本次扫描参数不一致，请更换输出目录")
+                for row in reader:
+                    self.done[row["run_id"]] = row
+            self._file = open(path, "a", encoding="utf-8", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+        else:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+            self._writer.writeheader()
+            self._file.flush()
+
+    def add(self, rid: str, params: Dict[str, Any], result: Dict[str, Any]):
+        row = {"run_id": rid, **params}
+        for col in RESULT_COLUMNS:
+            value = result.get(col)
+            row[col] = json.dumps(value, sort_keys=True) if isinstance(value, dict) else value
+        self._writer.writerow(row)
+        self._file.flush()
+        self.done[rid] = {k: str(v) for k, v in row.items()}
+
+    def close(self):
+        self._file.close()
+
+def run_sweep(paths: Sequence[str], grid: Dict[str, List[Any]], out_dir: str, jobs: Optional[int] = None, symbol: Optional[str] = None,
+              backtest_options: Optional[Dict[str, Any]] = None) -> ResultsTable:
+    """在进程池中运行参数网格内的全部回测，结果写入 {out_dir}/results.csv"""
+    os.makedirs(out_dir, exist_ok=True)
+    fingerprint = data_fingerprint(paths, symbol)
+    data_dir = prepare_data(paths, os.path.join(out_dir, "data"), symbol, fingerprint)
+    combos = build_grid(grid)
+    table = ResultsTable(os.path.join(out_dir, "results.csv"), sorted(grid))
+    pending = [(rid, p) for rid, p in ((run_id(p, fingerprint), p) for p in combos) if rid not in table.done]
+    print(f"[Sweep] 共 {len(combos)} 组参数，已完成 {len(combos) - len(pending)} 组，待运行 {len(pending)} 组")
+    if not pending:
+        return table
+    options = dict(backtest_options or {})
+    jobs = min(jobs or os.cpu_count() or 1, len(pending))
+    started = time.perf_counter()
+    finished = failed = 0
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        futures = {executor.submit(_run_one, data_dir, symbol, params, options): (rid, params) for rid, params in pending}
+        not_done = set(futures)
+        while not_done:
+            done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+            for future in done:
+                rid, params = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 失败的组合不写入结果表，续跑时会重试
+                    failed += 1
+                    print(f"[Sweep] {params} 运行失败: {e}")
+                    continue
+                table.add(rid, params, result)
+                finished += 1
+                elapsed = time.perf_counter() - started
+                eta = elapsed / finished * (len(pending) - finished - failed)
+                print(f"[Sweep] {finished + failed}/{len(pending)} {params} net_pnl={result['net_pnl']:.4f} fills={result['fills']} 预计剩余 {eta:.0f}s")
+    except KeyboardInterrupt:
+        print("[Sweep] 已中断，已完成的结果已保存，重新运行同一命令可继续")
+        executor.shutdown(wait=False, cancel_futures=True)
+        table.close()
+        raise
+    executor.shutdown()
+    table.close()
+    print(f"[Sweep] 完成 {finished} 组，失败 {failed} 组，耗时 {time.perf_counter() - started:.1f}s")
+    return table
+
+def print_top(table: ResultsTable, sort_by: str = "net_pnl", top: int = 10):
+    """按指定指标降序打印前若干组参数"""
+    rows = sorted(table.done.values(), key=lambda r: float(r.get(sort_by) or "-inf"), reverse=True)[:top]
+    if not rows:
+        return
+    param_cols = [c for c in table.columns[1:] if c not in RESULT_COLUMNS]
+    cols = param_cols + [c for c in ("net_pnl", "fees", "fill_rate", "turnover", "max_abs_position") if c != sort_by]
+    cols = [sort_by] + cols
+    print(f"[Sweep] 按 {sort_by} 排序前 {len(rows)} 组：")
+    print("\t".join(cols))
+    for row in rows:
+        print("\t".join(str(row.get(c, "")) for c in cols))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程参数扫描：对参数网格逐一回测，结果汇总为一张表，支持断点续跑")
+    parser.add_argument("data", nargs="+", help="行情文件（.jsonl/.csv，可带 .gz）或行情录制目录")
+    parser.add_argument("--out", required=True, help="输出目录（results.csv 与共享行情数据），重复运行同一目录即续跑")
+    parser.add_argument("--grid", action="append", metavar="KEY=V1,V2", help="扫描参数，如 --grid order_config.levels=1,2,3")
+    parser.add_argument("--levels", help="order_config.levels 取值列表")
+    parser.add_argument("--offset", help="order_config.price_offset_percent 取值列表")
+    parser.add_argument("--qty", help="order_config.quantity_per_order_usdt 取值列表")
+    parser.add_argument("--refresh", help="refresh_config.orderbook_refresh_interval 取值列表")
+    parser.add_argument("--max-pos", dest="max_pos", help="max_net_position_ratio 取值列表")
+    parser.add_argument("--jobs", type=int, help="并行进程数，默认 CPU 核数")
+    parser.add_argument("--config", default="config.yaml", help="策略配置文件")
+    parser.add_argument("--symbol", help="只回放指定交易对的行情")
+    parser.add_argument("--rules", help="交易对规则缓存文件")
+    parser.add_argument("--balance", type=float, help="初始资金，默认取 initial_capital")
+    parser.add_argument("--maker-fee", type=float, default=0.0002)
+    parser.add_argument("--taker-fee", type=float, default=0.0005)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="REST 请求单程延迟（毫秒）")
+    parser.add_argument("--feed-latency-ms", type=float, default=0.0, help="行情/用户数据推送延迟（毫秒）")
+    parser.add_argument("--no-user-stream", action="store_true", help="不启用模拟用户数据流")
+    parser.add_argument("--sort-by", default="net_pnl", help="结果排序指标")
+    parser.add_argument("--top", type=int, default=10, help="打印前若干组结果")
+    args = parser.parse_args(argv)
+
+    grid: Dict[str, List[Any]] = {}
+    for alias, key in GRID_ALIASES.items():
+        if getattr(args, alias):
+            grid[key] = parse_values(getattr(args, alias))
+    for item in args.grid or []:
+        if "=" not in item:
+            raise SystemExit(f"--grid 参数格式应为 key=v1,v2: {item}")
+        key, values = item.split("=", 1)
+        grid[key.strip()] = parse_values(values)
+    if not grid:
+        raise SystemExit("未指定任何扫描参数")
+
+    options = {
+        "yaml_path": args.config,
+        "rules": load_rules(args.rules) if args.rules else None,
+        "initial_balance": args.balance,
+        "maker_fee": args.maker_fee,
+        "taker_fee": args.taker_fee,
+        "latency": args.latency_ms / 1000,
+        "feed_latency": args.feed_latency_ms / 1000,
+        "user_stream": not args.no_user_stream,
+    }
+    try:
+        table = run_sweep(args.data, grid, args.out, jobs=args.jobs, symbol=args.symbol, backtest_options=options)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    print_top(table, args.sort_by, args.top)
+
+if __name__ == "__main__":
+    main()
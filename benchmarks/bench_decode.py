@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import random
+from typing import Dict, List
+from benchmarks.common import measure
+from core.market import MarketDataWorker
+from core.state import StateRegistry
+from utils.decode import BookTickerFilter, get_decoder, msgspec, orjson
+
+def synthetic_bookticker(n: int, symbol: str = "BTCUSDT", price_change_ratio: float = 0.3, seed: int = 1) -> List[str]:
+    """生成 bookTicker 原始帧：约 price_change_ratio 的消息改变买一/卖一价，其余只改变挂单量（与实盘活跃交易对接近）"""
+    rng = random.Random(seed)
+    bid = 60000.0
+    frames = []
+    ts = 1700000000000
+    for i in range(n):
+        if rng.random() < price_change_ratio:
+            bid = round(bid + rng.choice((-0.1, 0.1)), 1)
+        ts += rng.randint(1, 5)
+        frames.append(json.dumps({
+            "e": "bookTicker", "u": 400900217 + i, "s": symbol,
+            "b": f"{bid:.2f}", "B": f"{rng.uniform(0.001, 20):.3f}",
+            "a": f"{bid + 0.1:.2f}", "A": f"{rng.uniform(0.001, 20):.3f}",
+            "T": ts, "E": ts + 1,
+        }, separators=(",", ":")))
+    return frames
+
+def synthetic_depth(n: int, symbol: str = "BTCUSDT", levels: int = 10, seed: int = 2) -> List[str]:
+    """生成 depthUpdate 原始帧（每帧买卖各 levels 档变化）"""
+    rng = random.Random(seed)
+    frames = []
+    uid = 1000
+    for i in range(n):
+        mid = 60000 + rng.randint(-50, 50) / 10
+        frames.append(json.dumps({
+            "e": "depthUpdate", "E": 1700000000000 + i, "T": 1700000000000 + i, "s": symbol,
+            "U": uid + 1, "u": uid + 10, "pu": uid,
+            "b": [[f"{mid - k / 10:.2f}", f"{rng.uniform(0, 5):.3f}"] for k in range(levels)],
+            "a": [[f"{mid + k / 10:.2f}", f"{rng.uniform(0, 5):.3f}"] for k in range(levels)],
+        }, separators=(",", ":")))
+        uid += 10
+    return frames
+
+async def run(n: int, repeat: int, price_change_ratio: float) -> Dict[str, float]:
+    tickers = synthetic_bookticker(n, price_change_ratio=price_change_ratio)
+    depth = synthetic_depth(max(1, n // 10))
+    registry = StateRegistry()
+    worker = MarketDataWorker(["BTCUSDT"], "bench", registry=registry, ws_factory=lambda symbols, env: None)
+    handle = worker.handle_message
+    backends = ["json"] + (["orjson"] if orjson is not None else []) + (["msgspec"] if msgspec is not None else [])
+    results: Dict[str, float] = {}
+    for backend in backends:
+        decode = get_decoder("market", backend).decode
+
+        def decode_only():
+            for raw in tickers:
+                decode(raw)
+
+        def pipeline():
+            for raw in tickers:
+                handle(decode(raw))
+
+        def filtered_pipeline():
+            ticker_filter = BookTickerFilter()
+            for raw in tickers:
+                if not ticker_filter.is_unchanged(raw):
+                    handle(decode(raw))
+
+        def depth_decode():
+            for raw in depth:
+                decode(raw)
+
+        results[f"bookticker_decode_{backend}_us"] = measure(decode_only, len(tickers), repeat)
+        results[f"bookticker_pipeline_{backend}_us"] = measure(pipeline, len(tickers), repeat)
+        results[f"bookticker_pipeline_{backend}_filtered_us"] = measure(filtered_pipeline, len(tickers), repeat)
+        results[f"depth_decode_{backend}_us"] = measure(depth_decode, len(depth), repeat)
+    ticker_filter = BookTickerFilter()
+    for raw in tickers:
+        ticker_filter.is_unchanged(raw)
+    results["filter_drop_ratio"] = ticker_filter.dropped / len(tickers)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket 消息解码与 bookTicker 处理的单条耗时基准")
+    parser.add_argument("-n", type=int, default=100000, help="bookTicker 消息条数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（取最快一次）")
+    parser.add_argument("--price-change-ratio", type=float, default=0.3, help="改变买一/卖一价的消息占比")
+    args = parser.parse_args(argv)
+    results = asyncio.run(run(args.n, args.repeat, args.price_change_ratio))
+    for key, value in results.items():
+        print(f"{key:<45} {value:10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+from backtest.exchange import SimExchange
+from benchmarks.bench_hotpath import SYMBOL, _order_manager
+from benchmarks.common import Result, percentiles, result
+from core.market import MarketDataWorker
+from core.state import SharedState, StateRegistry
+
+class BenchExchange(SimExchange):
+    """
+    端到端测试用的模拟交易所：在真实时钟的事件循环上运行（不使用回测虚拟时钟），
+    注入 bookTicker 时记下时刻，行情之后的第一笔撤/改/新单请求到达时记录 tick → 下单 延迟
+    """
+    def __init__(self, symbols):
+        super().__init__(symbols)
+        self.tick_time: Optional[float] = None
+        self.samples: List[float] = []
+        self.acked = asyncio.Event()
+
+    def inject(self, bid: float, ask: float, update_id: int):
+        msg = {"e": "bookTicker", "u": update_id, "s": SYMBOL, "b": f"{bid:.1f}", "B": "1.000", "a": f"{ask:.1f}", "A": "1.000",
+               "T": int(time.time() * 1000), "E": int(time.time() * 1000)}
+        self.acked.clear()
+        self.tick_time = time.perf_counter()
+        self._on_book_ticker(self.books[SYMBOL], msg)
+
+    def _record(self):
+        if self.tick_time is not None:
+            self.samples.append(time.perf_counter() - self.tick_time)
+            self.tick_time = None
+            self.acked.set()
+
+    async def place_batch_orders(self, symbol, orders):
+        self._record()
+        return await super().place_batch_orders(symbol, orders)
+
+    async def modify_batch_orders(self, symbol, orders):
+        self._record()
+        return await super().modify_batch_orders(symbol, orders)
+
+    async def cancel_batch_orders(self, symbol, order_ids=None, client_order_ids=None):
+        self._record()
+        return await super().cancel_batch_orders(symbol, order_ids, client_order_ids)
+
+async def _run(ticks: int, interval: float) -> Dict[str, Result]:
+    exchange = BenchExchange([SYMBOL])
+    registry = StateRegistry()
+    state: SharedState = registry.get(SYMBOL)
+    market = MarketDataWorker([SYMBOL], "bench", registry=registry, ws_factory=exchange.market_ws)
+    market_task = asyncio.create_task(market.run())
+    while not any("bookTicker" in ws.streams for ws in exchange._market_sockets):
+        await asyncio.sleep(0.001)
+    # 先推一笔行情，让挂单模块拿到有效中间价后再启动
+    exchange.inject(59999.9, 60000.1, 1)
+    while state.mark_price <= 0:
+        await asyncio.sleep(0.001)
+    manager = await _order_manager(exchange, state)
+    manager.open_orders_sync_every = 10 ** 9
+    manager_task = asyncio.create_task(manager.run())
+    await asyncio.sleep(0.05)
+    timeouts = 0
+    for i in range(ticks):
+        # 中间价在两档之间来回跳动 1 美元（10 个 tick），每笔行情都超过重挂阈值
+        mid = 60000.0 if i % 2 else 60001.0
+        exchange.inject(mid - 0.1, mid + 0.1, i + 2)
+        try:
+            await asyncio.wait_for(exchange.acked.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            exchange.tick_time = None
+            timeouts += 1
+        await asyncio.sleep(interval)
+    manager.stop()
+    exchange._publish("bookTicker", None)
+    for task in (manager_task, market_task):
+        task.cancel()
+    await asyncio.gather(manager_task, market_task, return_exceptions=True)
+    samples_us = [s * 1e6 for s in exchange.samples]
+    p = percentiles(samples_us, (0.5, 0.9, 0.99))
+    return {
+        "e2e.tick_to_order_p50_us": result(p[0.5], "us"),
+        "e2e.tick_to_order_p90_us": result(p[0.9], "us"),
+        "e2e.tick_to_order_p99_us": result(p[0.99], "us"),
+        "e2e.timeouts": result(timeouts, "count"),
+    }
+
+def bench_e2e(ticks: int, interval: float = 0.002) -> Dict[str, Result]:
+    """
+    端到端 tick → 下单延迟：行情注入 → MarketDataWorker 写入中间价 → OrderManager 被唤醒、计算梯队 → 首个批量请求到达交易所。
+    在独立的事件循环中运行，防抖设为 0；行情间隔 interval 秒，使每次测量都从空闲状态开始
+    """
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        return asyncio.run(_run(ticks, interval))
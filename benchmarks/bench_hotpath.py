@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import tempfile
+from contextlib import redirect_stdout
+from decimal import Decimal
+from typing import Dict
+from backtest.engine import build_snapshot
+from backtest.exchange import SimExchange
+from benchmarks.bench_decode import synthetic_bookticker
+from benchmarks.common import Result, measure, measure_async, result
+from core.logger import LoggerWorker
+from core.market import MarketDataWorker
+from core.order import OrderManager
+from core.state import SharedState, StateRegistry
+from utils.config_loader import get_config_service
+from utils.http import AsyncBinanceRest, _compact_json
+from utils.symbol_rules import SymbolRulesCache
+
+SYMBOL = "BTCUSDT"
+
+def bench_market(n: int, repeat: int) -> Dict[str, Result]:
+    """MarketDataWorker.handle_message：已解码 bookTicker（约 30% 改变中间价）的单条处理耗时"""
+    messages = [json.loads(raw) for raw in synthetic_bookticker(n)]
+    worker = MarketDataWorker([SYMBOL], "bench", registry=StateRegistry(), ws_factory=lambda symbols, env: None)
+    handle = worker.handle_message
+
+    def run():
+        for msg in messages:
+            handle(msg)
+
+    per_msg = measure(run, len(messages), repeat)
+    return {
+        "market.handle_bookticker_us": result(per_msg, "us/msg"),
+        "market.handle_bookticker_rate": result(1e6 / per_msg, "msg/s", "higher"),
+    }
+
+async def _order_manager(exchange: SimExchange, state: SharedState) -> OrderManager:
+    cfg = build_snapshot({"refresh_config.debounce_ms": 0})
+    service = get_config_service()
+    service.set_snapshot(cfg)
+    sc = cfg.symbol_config(SYMBOL)
+    rules_cache = SymbolRulesCache(exchange, ttl=float("inf"), cache_path=None)
+    await rules_cache.load()
+    qty_per_order = (sc.quantity_per_order_usdt / Decimal(str(state.mark_price))).quantize(Decimal('0.001'))
+    manager = OrderManager(
+        exchange, SYMBOL, sc.levels, qty_per_order, sc.price_offset_percent, cfg.orderbook_refresh_interval, cfg.open_orders_sync_every,
+        requote_ticks=sc.requote_ticks, requote_bps=sc.requote_bps, debounce_ms=0,
+        rules_cache=rules_cache, config_service=service, state=state,
+    )
+    await manager.load_symbol_info()
+    return manager
+
+async def bench_ladder(n: int, repeat: int) -> Dict[str, Result]:
+    """
+    挂单梯队：build_targets + 对账 diff 的纯计算耗时，以及完整 refresh_orders
+    （REST 由零延迟的 SimExchange 代替，包含撤/改/新单的本地处理）
+    """
+    exchange = SimExchange([SYMBOL])
+    book = exchange.books[SYMBOL]
+    state = SharedState(symbol=SYMBOL, mark_price=60000.0)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        manager = await _order_manager(exchange, state)
+    # 中间价在 10 个 tick 范围内来回移动，每轮都有改单
+    mids = [60000.0 + (i % 10) * 0.1 for i in range(n)]
+
+    async def targets_only():
+        state.user_stream_live = True
+        for mid in mids:
+            state.mark_price = mid
+            manager.book.diff(await manager.build_targets())
+
+    async def refresh():
+        # 不走用户数据流：持仓查询由 SimExchange 直接返回，挂单同步间隔设为不触发
+        state.user_stream_live = False
+        manager.open_orders_sync_every = 10 ** 9
+        for mid in mids:
+            state.mark_price = mid
+            book.bid, book.ask = mid - 0.05, mid + 0.05
+            await manager.refresh_orders()
+
+    targets_us = await measure_async(targets_only, len(mids), repeat)
+    refresh_us = await measure_async(refresh, len(mids), repeat)
+    manager.stop()
+    return {
+        "orders.build_targets_diff_us": result(targets_us, "us/round"),
+        "orders.refresh_orders_us": result(refresh_us, "us/round"),
+    }
+
+def bench_sign(n: int, repeat: int) -> Dict[str, Result]:
+    """请求签名：单笔下单参数的 HMAC-SHA256 签名，以及 5 笔批量下单的完整查询串构造"""
+    rest = AsyncBinanceRest("bench-api-key", "bench-secret-key")
+    order = {"symbol": SYMBOL, "side": "BUY", "type": "LIMIT", "quantity": "0.010", "price": "60000.1", "timeInForce": "GTX",
+             "newClientOrderId": "pmm-BTCUSDT-B1-1700000000000", "timestamp": 1700000000000}
+    batch = {"batchOrders": _compact_json([rest._batch_order_item(SYMBOL, {"side": "BUY", "quantity": Decimal("0.010"), "price": Decimal("60000.1")})] * 5)}
+
+    def sign():
+        for _ in range(n):
+            rest._sign(order)
+
+    def build_batch():
+        for _ in range(n):
+            rest._build_path("/fapi/v1/batchOrders", dict(batch), True)
+
+    return {
+        "rest.sign_order_us": result(measure(sign, n, repeat), "us/op"),
+        "rest.build_batch_path_us": result(measure(build_batch, n, repeat), "us/op"),
+    }
+
+def bench_logging(n: int, repeat: int) -> Dict[str, Result]:
+    """LoggerWorker：log_event 入队耗时（调用方可见的开销）与后台线程写盘吞吐"""
+    enqueue_best = drain_best = math.inf
+    # 写线程会回显事件行，整个测试期间丢弃打印输出
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as directory:
+                worker = LoggerWorker(None, directory, True, "info", [SYMBOL], "bench", "bench", queue_size=n * 2, flush_interval=0.05)
+
+                def enqueue():
+                    for i in range(n):
+                        worker.log_event("bench", "基准测试事件", {"seq": i, "price": 60000.1}, SYMBOL)
+
+                enqueue_best = min(enqueue_best, measure(enqueue, n, 1))
+                drain_best = min(drain_best, measure(worker.stop, 1, 1))
+    total_seconds = (enqueue_best * n + drain_best) / 1e6
+    return {
+        "logging.log_event_enqueue_us": result(enqueue_best, "us/event"),
+        "logging.write_rate": result(n / total_seconds, "rows/s", "higher"),
+    }
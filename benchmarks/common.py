@@ -0,0 +1,114 @@
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 单项结果：{"value": 数值, "unit": 单位, "better": "lower" | "higher"}
+Result = Dict[str, Any]
+
+def result(value: float, unit: str, better: str = "lower") -> Result:
+    return {"value": value, "unit": unit, "better": better}
+
+def measure(fn: Callable[[], None], n: int, repeat: int) -> float:
+    """多次运行取最快一次，返回每次操作耗时（微秒）；计时期间丢弃被测代码的打印输出"""
+    best = float("inf")
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    return best / n * 1e6
+
+async def measure_async(fn: Callable[[], Any], n: int, repeat: int) -> float:
+    """measure 的协程版本：fn() 返回协程，整体执行 n 次操作"""
+    best = float("inf")
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await fn()
+            best = min(best, time.perf_counter() - start)
+    return best / n * 1e6
+
+def percentiles(samples: List[float], quantiles=(0.5, 0.9, 0.99)) -> Dict[float, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {q: 0.0 for q in quantiles}
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _package_version(name: str) -> Optional[str]:
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return None
+
+def machine_info() -> Dict[str, Any]:
+    """运行环境元数据：结果只在相同机器/解释器之间比较才有意义"""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "cpu": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "git_commit": _git_commit(),
+        "packages": {name: _package_version(name) for name in ("orjson", "msgspec", "aiohttp", "websockets")},
+    }
+
+def save_results(path: str, results: Dict[str, Result], params: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": machine_info(), "params": params, "results": results}, f, ensure_ascii=False, indent=2)
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare_results(base: Dict[str, Result], new: Dict[str, Result], threshold: float) -> List[Tuple[str, float, float, float, str]]:
+    """
+    逐项比较两次结果：[(名称, 基准值, 新值, 变化比例, 状态)]，状态为 regression / improved / ok。
+    变化比例按“更差为正”计算：lower 越小越好的指标为 new/base-1，higher 为 base/new-1；
+    一侧为 0 时比例无意义（如丢单数、错误数等计数指标），按方向记为 ±inf：lower 由 0 变为非 0、higher 降到 0 即为退化
+    """
+    rows = []
+    for name in sorted(set(base) & set(new)):
+        b, n = base[name]["value"], new[name]["value"]
+        better = new[name].get("better", "lower")
+        if b == n:
+            rows.append((name, b, n, 0.0, "ok"))
+            continue
+        if not b or not n:
+            worse = n > b if better == "lower" else n < b
+            rows.append((name, b, n, math.inf if worse else -math.inf, "regression" if worse else "improved"))
+            continue
+        change = n / b - 1 if better == "lower" else b / n - 1
+        status = "regression" if change > threshold else "improved" if change < -threshold else "ok"
+        rows.append((name, b, n, change, status))
+    return rows
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Dict
+from benchmarks import bench_decode, bench_e2e, bench_hotpath
+from benchmarks.common import Result, compare_results, load_results, result, save_results
+
+SUITES = ("market", "orders", "rest", "logging", "decode", "e2e")
+
+# 完整运行 / --quick 的规模参数
+FULL_PARAMS = {"n": 20000, "repeat": 5, "ladder_rounds": 2000, "log_events": 20000, "e2e_ticks": 500}
+QUICK_PARAMS = {"n": 2000, "repeat": 2, "ladder_rounds": 200, "log_events": 2000, "e2e_ticks": 100}
+
+def run_suites(suites, params) -> Dict[str, Result]:
+    n, repeat = params["n"], params["repeat"]
+    results: Dict[str, Result] = {}
+    for suite in suites:
+        print(f"[Bench] 运行 {suite} ...")
+        if suite == "market":
+            results.update(bench_hotpath.bench_market(n, repeat))
+        elif suite == "orders":
+            results.update(asyncio.run(bench_hotpath.bench_ladder(params["ladder_rounds"], repeat)))
+        elif suite == "rest":
+            results.update(bench_hotpath.bench_sign(n, repeat))
+        elif suite == "logging":
+            results.update(bench_hotpath.bench_logging(params["log_events"], repeat))
+        elif suite == "decode":
+            for key, value in asyncio.run(bench_decode.run(n, repeat, 0.3)).items():
+                # 过滤比例是数据特征而非性能指标，不参与比较
+                if key != "filter_drop_ratio":
+                    results[f"decode.{key}"] = result(value, "us/msg")
+        elif suite == "e2e":
+            results.update(bench_e2e.bench_e2e(params["e2e_ticks"]))
+    return results
+
+def print_results(results: Dict[str, Result]):
+    width = max((len(k) for k in results), default=0)
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['value']:14.3f} {r['unit']}")
+
+def cmd_run(args) -> int:
+    suites = args.only.split(",") if args.only else list(SUITES)
+    unknown = [s for s in suites if s not in SUITES]
+    if unknown:
+        print(f"[Bench] 未知的测试项: {', '.join(unknown)}（可选: {', '.join(SUITES)}）")
+        return 2
+    params = dict(QUICK_PARAMS if args.quick else FULL_PARAMS)
+    results = run_suites(suites, params)
+    print_results(results)
+    output = args.output or os.path.join("benchmarks", "results", f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(output, results, {**params, "suites": suites, "quick": args.quick})
+    print(f"[Bench] 结果已保存到 {output}")
+    return 0
+
+def cmd_compare(args) -> int:
+    base, new = load_results(args.base), load_results(args.new)
+    for key in ("cpu", "python", "hostname"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"[Bench] 注意：两次运行的 {key} 不同（{base['meta'].get(key)} / {new['meta'].get(key)}），结果可比性有限")
+    rows = compare_results(base["results"], new["results"], args.threshold)
+    width = max((len(r[0]) for r in rows), default=0)
+    for name, b, n, change, status in rows:
+        flag = {"regression": "  <-- 退化", "improved": "  提升"}.get(status, "")
+        print(f"{name:<{width}}  {b:14.3f} -> {n:14.3f}  {change:+8.1%}{flag}")
+    regressions = [r for r in rows if r[4] == "regression"]
+    print(f"[Bench] 共比较 {len(rows)} 项，退化 {len(regressions)} 项（阈值 {args.threshold:.0%}）")
+    return 1 if regressions else 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="热路径离线基准：运行并保存结果（JSON，含机器信息），或比较两次结果")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="运行基准并保存结果")
+    run_parser.add_argument("--quick", action="store_true", help="缩小规模，快速检查")
+    run_parser.add_argument("--only", help=f"只运行指定项，逗号分隔（{','.join(SUITES)}）")
+    run_parser.add_argument("--output", help="结果文件路径（默认 benchmarks/results/<时间>.json）")
+    compare_parser = sub.add_parser("compare", help="比较两次结果，存在退化时退出码为 1")
+    compare_parser.add_argument("base", help="基准结果文件")
+    compare_parser.add_argument("new", help="新结果文件")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="判定退化/提升的变化比例（默认 0.1 即 10%%）")
+    args = parser.parse_args(argv)
+    return cmd_run(args) if args.command == "run" else cmd_compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
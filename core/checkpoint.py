@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+from core.reconcile import LadderKey
+from core.state import StateRegistry, state_registry
+from utils.snapshot_cache import SnapshotCache
+from utils.symbol_rules import SymbolRules, SymbolRulesCache
+
+CHECKPOINT_VERSION = 1
+
+class Checkpointer:
+    """
+    运行状态检查点（热启动）：
+    - 每 interval 秒把各交易对的交易规则、最近中间价、本策略在途挂单、持仓与暂停标记写入 path
+      （后台线程先写临时文件再替换，进程崩溃不会留下半个文件）
+    - 启动时 load() 读取不超过 max_age 的检查点：交易规则直接填入规则缓存（无需等待 exchangeInfo 下载），
+      中间价用于行情到达前估算仓位上限，挂单记录（orderId -> 档位）交给 OrderManager 接管
+    - reconcile() 用一次全量持仓查询校正恢复的持仓；挂单由各 OrderManager 用一次 openOrders 查询校正
+    保存时间取墙钟，便于跨进程判断是否过期。
+    """
+    def __init__(self, path: str, registry: StateRegistry | None = None, rules_cache: SymbolRulesCache | None = None, interval: float = 5.0, max_age: float = 600.0):
+        self.path = path
+        self.registry = registry or state_registry
+        self.rules_cache = rules_cache
+        self.interval = interval
+        self.max_age = max_age
+        self.restored: Optional[Dict[str, Any]] = None
+        self.saved_at = 0.0
+        self._running = False
+
+    def load(self) -> bool:
+        """读取并恢复检查点，返回是否热启动（文件不存在、损坏或过期时为冷启动）"""
+        if not self.path or not os.path.isfile(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[Checkpoint] 读取检查点失败，冷启动: {e}")
+            return False
+        if data.get("version") != CHECKPOINT_VERSION:
+            print(f"[Checkpoint] 检查点版本 {data.get('version')} 不兼容，冷启动")
+            return False
+        age = time.time() - float(data.get("saved_at", 0))
+        if age > self.max_age:
+            print(f"[Checkpoint] 检查点已过期（{age:.0f}s 前保存），冷启动")
+            return False
+        self.restore(data)
+        print(f"[Checkpoint] 已恢复 {age:.1f}s 前的检查点: {', '.join(self.restored['symbols'])}")
+        return True
+
+    def restore(self, data: Dict[str, Any]):
+        self.restored = data
+        rules = {}
+        for symbol, entry in data.get("symbols", {}).items():
+            if entry.get("rules"):
+                rules[symbol] = SymbolRules.from_dict(entry["rules"])
+            # 已从配置中移除的交易对不恢复
+            if symbol not in self.registry:
+                continue
+            self.registry.get(symbol).safe_update(
+                last_known_mid=float(entry.get("mark_price", 0.0)),
+                position=float(entry.get("position", 0.0)),
+                entry_price=float(entry.get("entry_price", 0.0)),
+                strategy_paused=bool(entry.get("strategy_paused", False)),
+            )
+        if rules and self.rules_cache is not None:
+            self.rules_cache.seed(rules, float(data.get("rules_fetched_at", 0.0)))
+
+    def orders_for(self, symbol: str) -> Dict[int, LadderKey]:
+        """检查点中该交易对的在途挂单：orderId -> (side, level)"""
+        if self.restored is None:
+            return {}
+        orders = self.restored.get("symbols", {}).get(symbol, {}).get("orders", [])
+        return {o["order_id"]: (o["side"], o["level"]) for o in orders if o.get("order_id") is not None}
+
+    async def reconcile(self, snapshots: SnapshotCache):
+        """热启动对账：一次全量持仓查询覆盖恢复的持仓（结果同时写入快照缓存，各模块首次查询可直接复用）"""
+        positions = await snapshots.get_all_positions()
+        for pos_info in positions:
+            symbol = pos_info.get("symbol")
+            # 单向持仓模式下 positionSide=BOTH
+            if symbol not in self.registry or pos_info.get("positionSide", "BOTH") != "BOTH":
+                continue
+            state = self.registry.get(symbol)
+            position = float(pos_info.get("positionAmt", "0"))
+            if position != state.position:
+                print(f"[Checkpoint] {symbol} 停机期间持仓变化: {state.position} -> {position}")
+            state.safe_update(position=position, entry_price=float(pos_info.get("entryPrice", "0")))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """在事件循环内采集当前运行状态（只读内存，不做 I/O）"""
+        restored = (self.restored or {}).get("symbols", {})
+        symbols = {}
+        for symbol, state in self.registry.items():
+            entry = {
+                "mark_price": state.mark_price or state.last_known_mid,
+                "position": state.position,
+                "entry_price": state.entry_price,
+                "strategy_paused": state.strategy_paused,
+                "halt_reason": state.halt_reason,
+            }
+            book = state.quote_book
+            if book is not None:
+                entry["orders"] = [
+                    {"side": o.side, "level": o.level, "order_id": o.order_id, "client_order_id": o.client_order_id, "price": str(o.price), "quantity": str(o.quantity)}
+                    for o in book.orders.values()
+                ]
+            else:
+                # 挂单模块尚未启动（等待行情），保留上次的挂单记录
+                entry["orders"] = restored.get(symbol, {}).get("orders", [])
+            rules = self.rules_cache.rules.get(symbol) if self.rules_cache is not None else None
+            if rules is not None:
+                entry["rules"] = rules.to_dict()
+            symbols[symbol] = entry
+        return {
+            "version": CHECKPOINT_VERSION,
+            "saved_at": time.time(),
+            "rules_fetched_at": self.rules_cache.fetched_at if self.rules_cache is not None else 0.0,
+            "symbols": symbols,
+        }
+
+    async def save(self):
+        data = self.snapshot()
+        try:
+            await asyncio.to_thread(self._write, data)
+            self.saved_at = data["saved_at"]
+        except Exception as e:
+            print(f"[Checkpoint] 写入检查点失败: {e}")
+
+    def _write(self, data: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def run(self):
+        """主循环：定时保存检查点"""
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    def stop(self):
+        self._running = False
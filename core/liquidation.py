@@ -0,0 +1,217 @@
+import asyncio
+import math
+from dataclasses import dataclass
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import List, Optional
+from core.state import SharedState, shared_state
+from utils.http import is_order_error
+from utils.metrics import registry
+from utils.rate_limit import request_priority, PRIORITY_EMERGENCY
+from utils.snapshot_cache import SnapshotCache
+from utils.symbol_rules import SymbolRules, SymbolRulesCache
+
+LIQUIDATION_LATENCY = registry.histogram("pmm_liquidation_seconds", "一次紧急平仓（撤单 + 分片平仓 + 确认）的耗时", ("symbol",))
+LIQUIDATION_ORDERS = registry.counter("pmm_liquidation_orders_total", "紧急平仓子订单数（filled 全部成交 / partial 部分成交 / unfilled 未成交 / error 被拒）", ("symbol", "result"))
+
+# 订单回报中的终态：据此即可确定成交量，无需再查询持仓
+FINAL_STATUSES = ("FILLED", "EXPIRED", "CANCELED", "REJECTED", "EXPIRED_IN_MATCH")
+
+@dataclass
+class LiquidationResult:
+    """一次紧急平仓的结果"""
+    initial: Decimal      # 开始时的净持仓
+    remaining: Decimal    # 结束时的剩余持仓，0 表示已归零
+    rounds: int = 0       # 下单轮数
+    orders: int = 0       # 子订单数
+    elapsed: float = 0.0  # 耗时（秒）
+
+    @property
+    def flat(self) -> bool:
+        return self.remaining == 0
+
+class LiquidationEngine:
+    """
+    异步紧急平仓引擎：
+    - 撤销全部挂单与查询持仓并发进行，随后按只减仓（reduceOnly）子订单批量平仓，整体一到两个往返
+    - 大额持仓按可见流动性分片：本地 L2 订单簿可用时每轮合计不超过对手方 slippage_bps 范围内挂单量的 depth_participation，
+      并以 IOC 限价单限定滑点，余量在下一轮按最新订单簿重新计算；否则每片不超过 max_slice_notional 与 MARKET_LOT_SIZE 上限，以市价单成交
+    - 子订单并发发出，只减仓保证不会反向开仓；成交量直接从下单回报（newOrderRespType=RESULT）确认，
+      回报非终态时等待用户数据流成交推送（最多 confirm_timeout 秒）或立即查询一次持仓，不做固定等待
+    - 最多 max_rounds 轮，最后一轮改用市价单，保证尽量归零
+    全部 REST 请求按紧急优先级调度，不阻塞事件循环中的其他模块。
+    """
+    def __init__(self, rest, symbol: str, state: SharedState | None = None, snapshots: SnapshotCache | None = None, rules_cache: SymbolRulesCache | None = None,
+                 logger=None, max_slice_notional: Decimal = Decimal("0"), depth_participation: float = 0.5, slippage_bps: float = 20.0,
+                 max_slices: int = 10, max_rounds: int = 5, confirm_timeout: float = 2.0):
+        self.rest = rest
+        self.symbol = symbol
+        self.state = state or shared_state
+        self.snapshots = snapshots or SnapshotCache(rest)
+        self.rules_cache = rules_cache
+        self.logger = logger
+        self.max_slice_notional = Decimal(str(max_slice_notional))
+        self.depth_participation = depth_participation
+        self.slippage_bps = slippage_bps
+        self.max_slices = max_slices
+        self.max_rounds = max_rounds
+        self.confirm_timeout = confirm_timeout
+        self._lock = asyncio.Lock()
+        self._latency = LIQUIDATION_LATENCY.labels(symbol)
+
+    async def flatten(self, cancel_orders: bool = True) -> LiquidationResult:
+        """撤单并平掉全部持仓；并发调用时排队执行，后者按最新持仓处理"""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            with request_priority(PRIORITY_EMERGENCY), self._latency.time():
+                result = await self._flatten(cancel_orders)
+            result.elapsed = loop.time() - start
+            return result
+
+    async def _flatten(self, cancel_orders: bool) -> LiquidationResult:
+        cancel = asyncio.create_task(self._cancel_all()) if cancel_orders else None
+        try:
+            position, rules = await asyncio.gather(self._position(), self._rules())
+            result = LiquidationResult(initial=position, remaining=position)
+            while not self._is_flat(result.remaining, rules) and result.rounds < self.max_rounds:
+                result.rounds += 1
+                # 最后一轮不再限定价格，确保成交
+                result.remaining, sent = await self._execute_round(result.remaining, rules, use_market=result.rounds == self.max_rounds)
+                result.orders += sent
+            if self._is_flat(result.remaining, rules):
+                result.remaining = Decimal("0")
+            return result
+        finally:
+            if cancel is not None:
+                await cancel
+
+    async def _cancel_all(self):
+        try:
+            await self.rest.cancel_all_orders(self.symbol)
+            print(f"[Liquidation] {self.symbol} 挂单已全部撤销。")
+        except Exception as e:
+            print(f"[Liquidation] {self.symbol} 撤销挂单异常: {e}")
+
+    async def _position(self) -> Decimal:
+        """真实持仓：用户数据流可用时读 state，否则重新查询（不使用缓存快照）"""
+        if self.state.user_stream_live:
+            return Decimal(str(self.state.position))
+        pos_info = await self.snapshots.get_position_info(self.symbol, 0)
+        return Decimal(str(pos_info.get("positionAmt", "0")))
+
+    async def _rules(self) -> Optional[SymbolRules]:
+        if self.rules_cache is None:
+            return None
+        try:
+            return await self.rules_cache.get(self.symbol)
+        except Exception as e:
+            print(f"[Liquidation] {self.symbol} 获取交易规则失败，不分片: {e}")
+            return None
+
+    @staticmethod
+    def _is_flat(position: Decimal, rules: Optional[SymbolRules]) -> bool:
+        # 不足一个最小下单步长的残量无法下单
+        step = rules.market_step_size if rules is not None and rules.market_step_size > 0 else Decimal("0")
+        return abs(position) <= step / 2 if step else position == 0
+
+    def plan_slices(self, qty: Decimal, side: str, rules: Optional[SymbolRules], use_market: bool = False) -> tuple[List[Decimal], Optional[Decimal]]:
+        """
+        将本轮平仓数量拆成子订单数量列表，并给出 IOC 限价（None 表示市价单）。
+        每片上限取 MARKET_LOT_SIZE 与 max_slice_notional 中的较小值，一轮最多 max_slices 片；
+        有订单簿时各片同价同时发出、共享同一段深度，因此本轮合计不超过可见流动性 × depth_participation，余量留给下一轮。
+        """
+        caps = []
+        limit_price = None
+        total = qty
+        price = Decimal(str(self.state.mark_price or self.state.last_known_mid or 0))
+        if rules is not None and rules.market_max_qty > 0:
+            caps.append(rules.market_max_qty)
+        if self.max_slice_notional > 0 and price > 0:
+            caps.append(self.max_slice_notional / price)
+        book = self.state.order_book
+        if not use_market and book is not None and book.synced:
+            # 平多卖给买盘，平空买入卖盘
+            book_side = "BUY" if side == "SELL" else "SELL"
+            best = book.best_bid() if side == "SELL" else book.best_ask()
+            if best is not None:
+                total = min(qty, Decimal(str(book.liquidity_within(book_side, self.slippage_bps) * self.depth_participation)))
+                limit_price = self._limit_price(Decimal(str(best[0])), side, rules)
+        cap = min(caps) if caps else total
+        if rules is not None and rules.market_step_size > 0:
+            cap = self._floor_step(cap, rules)
+            if total < qty:
+                total = min(self._floor_step(total, rules), qty)
+        if cap <= 0 or cap >= total:
+            return [total], limit_price
+        count = min(self.max_slices, math.ceil(total / cap))
+        slices = [cap] * count
+        # 最后一片补足本轮余量（不超过上限）
+        slices[-1] = min(cap, total - cap * (count - 1))
+        return slices, limit_price
+
+    @staticmethod
+    def _floor_step(qty: Decimal, rules: SymbolRules) -> Decimal:
+        """按市价单步长向下取整，且不低于最小下单量（否则无法下单）"""
+        step = rules.market_step_size
+        qty = (qty / step).to_integral_value(ROUND_FLOOR) * step
+        return max(qty, rules.market_min_qty, step)
+
+    def _limit_price(self, best: Decimal, side: str, rules: Optional[SymbolRules]) -> Decimal:
+        """IOC 限价：最优对手价外 slippage_bps，按 tick 向不利方向取整（卖出向上、买入向下），保证滑点不超过上限"""
+        ratio = Decimal(str(self.slippage_bps)) / Decimal(10000)
+        price = best * (1 - ratio) if side == "SELL" else best * (1 + ratio)
+        tick = rules.price_tick if rules is not None and rules.price_tick > 0 else None
+        if tick is None:
+            return price
+        rounding = ROUND_CEILING if side == "SELL" else ROUND_FLOOR
+        return (price / tick).to_integral_value(rounding) * tick
+
+    async def _execute_round(self, position: Decimal, rules: Optional[SymbolRules], use_market: bool) -> tuple[Decimal, int]:
+        """发出一轮只减仓子订单，按回报计算剩余持仓（回报不能确定成交量时再确认真实持仓），返回 (剩余持仓, 子订单数)"""
+        side = "SELL" if position > 0 else "BUY"
+        slices, limit_price = self.plan_slices(abs(position), side, rules, use_market)
+        orders = []
+        for qty in slices:
+            order = {"side": side, "quantity": qty, "reduce_only": True, "resp_type": "RESULT"}
+            if limit_price is None:
+                order["order_type"] = "MARKET"
+            else:
+                order.update(order_type="LIMIT", price=limit_price, time_in_force="IOC")
+            orders.append(order)
+        kind = "市价" if limit_price is None else f"IOC 限价({limit_price})"
+        print(f"[Liquidation] {self.symbol} {kind}{'卖出' if side == 'SELL' else '买入'}平仓 {abs(position)}，拆分 {len(slices)} 片: {[str(q) for q in slices]}")
+        results = await self.rest.place_batch_orders(self.symbol, orders)
+        # 持仓已变化，其他模块的缓存快照同时失效
+        self.snapshots.invalidate()
+        filled = Decimal("0")
+        certain = True
+        for qty, resp in zip(slices, results):
+            if is_order_error(resp):
+                # 只减仓被拒多为持仓已被其他途径减少，需重新确认
+                print(f"[Liquidation] {self.symbol} 平仓子订单失败: {resp.get('msg')}")
+                LIQUIDATION_ORDERS.labels(self.symbol, "error").inc()
+                certain = False
+                continue
+            executed = Decimal(str(resp.get("executedQty", "0")))
+            filled += executed
+            LIQUIDATION_ORDERS.labels(self.symbol, "filled" if executed >= qty else ("partial" if executed > 0 else "unfilled")).inc()
+            if resp.get("status") not in FINAL_STATUSES:
+                certain = False
+        expected = position - filled if position > 0 else position + filled
+        if certain:
+            return expected, len(orders)
+        return await self._confirm(expected), len(orders)
+
+    async def _confirm(self, expected: Decimal) -> Decimal:
+        """回报未达终态时确认真实持仓：用户数据流可用时等待成交推送（最多 confirm_timeout 秒），否则立即查询一次"""
+        if not self.state.user_stream_live:
+            return await self._position()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.confirm_timeout
+        while Decimal(str(self.state.position)) != expected:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            # 订单/持仓推送与中间价变动都会唤醒，逐次检查
+            await self.state.wait_mid_update(self.state.mid_seq, timeout=remaining)
+        return Decimal(str(self.state.position))
@@ -1,108 +1,177 @@
 import asyncio
-import csv
-import os
 from datetime import datetime
-from core.state import shared_state
-from utils.config_loader import get_config
+from core.state import SharedState, StateRegistry, shared_state
+from utils.config_loader import ConfigService, ConfigSnapshot, get_config, get_config_service
+from utils.log_writer import BufferedCsvWriter
+from utils.metrics_store import MetricsStore
+from utils.rate_limit import request_priority, PRIORITY_METRICS
+from utils.snapshot_cache import SnapshotCache
 import json
+from decimal import Decimal
+
+METRIC_FIELDS = ["timestamp", "instance_id", "env", "metric_name", "value", "unit", "symbol", "side", "level", "sub_type", "details"]
+EVENT_FIELDS = ["timestamp", "instance_id", "env", "event_type", "symbol", "details", "extra"]
 
 class LoggerWorker:
     """
     日志采集与指标记录模块：
-    - 定时采集关键指标，写入CSV文件
+    - 定时采集关键指标，写入CSV文件（多交易对时每个交易对一行，共用同一文件）
+    - 指标与事件只放入内存队列，由后台线程批量写盘并按日期切换文件，调用方（含紧急平仓）不等待磁盘
+    - 配置了 store 时同时写入 SQLite 指标库（账户指标、订单状态、成交、事件各一张表）
     - 结构清晰，便于扩展更多指标
     """
-    def __init__(self, rest, log_dir: str, log_to_csv: bool, log_level: str, symbol: str, instance_id: str, env: str, interval: int = 1):
+    def __init__(self, rest, log_dir: str, log_to_csv: bool, log_level: str, symbol: str | list[str], instance_id: str, env: str, interval: int = 1, registry: StateRegistry | None = None,
+                 queue_size: int = 10000, flush_interval: float = 1.0, store: MetricsStore | None = None,
+                 snapshots: SnapshotCache | None = None, account_max_age: float = 0.0, config_service: ConfigService | None = None):
         self.log_dir = log_dir
         self.log_to_csv = log_to_csv
         self.log_level = log_level
-        self.symbol = symbol
+        self.config_service = config_service or get_config_service()
+        self.config_service.subscribe(self.apply_config)
+        symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        self.symbol = symbols[0]
+        # 未传注册表时（单交易对模式）沿用全局 shared_state
+        self.states: dict[str, SharedState] = {s: registry.get(s) if registry is not None else shared_state for s in symbols}
         self.instance_id = instance_id
         self.env = env
         self.interval = interval
-        self.csv_file = None
-        self.csv_writer = None
-        self.csv_path = None
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.metrics_writer: BufferedCsvWriter | None = None
+        self.event_writer: BufferedCsvWriter | None = None
+        # 可选的 SQLite 指标库：指标、订单、成交与事件按强类型列入库，供 metrics_store 查询工具聚合
+        self.store = store
         self._prepare_csv()
         self._running = False
+        self._stopped = False
         self.rest = rest
+        # 账户信息经共享快照缓存读取，account_max_age 秒内的数据可直接复用
+        self.snapshots = snapshots or SnapshotCache(rest)
+        self.account_max_age = account_max_age
+
+    def apply_config(self, old: ConfigSnapshot, new: ConfigSnapshot):
+        """配置热更新：日志级别即时生效（日志目录与写盘参数需重启）"""
+        self.log_level = new.log_level
 
     def _prepare_csv(self):
         if not self.log_to_csv:
             return
-        os.makedirs(self.log_dir, exist_ok=True)
-        today = datetime.now().strftime("%Y%m%d")
-        self.csv_path = os.path.join(self.log_dir, f"metrics-{today}.csv")
-        file_exists = os.path.isfile(self.csv_path)
-        self.csv_file = open(self.csv_path, "a", newline="", encoding="utf-8")
-        self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=[
-            "timestamp", "instance_id", "env", "metric_name", "value", "unit", "symbol", "side", "level", "sub_type", "details"
-        ])
-        if not file_exists:
-            self.csv_writer.writeheader()
+        self.metrics_writer = BufferedCsvWriter(
+            self.log_dir, "metrics", METRIC_FIELDS, max_queue=self.queue_size, flush_interval=self.flush_interval, name="metrics",
+        )
 
     def _prepare_event_csv(self):
-        self.event_csv_path = os.path.join(self.log_dir, f"events-{datetime.now().strftime('%Y%m%d')}.csv")
-        file_exists = os.path.isfile(self.event_csv_path)
-        self.event_csv_file = open(self.event_csv_path, "a", newline="", encoding="utf-8")
-        self.event_csv_writer = csv.DictWriter(self.event_csv_file, fieldnames=[
-            "timestamp", "instance_id", "env", "event_type", "symbol", "details", "extra"
-        ])
-        if not file_exists:
-            self.event_csv_writer.writeheader()
+        self.event_writer = BufferedCsvWriter(
+            self.log_dir, "events", EVENT_FIELDS, max_queue=self.queue_size, flush_interval=self.flush_interval,
+            echo="[LoggerWorker] 事件日志", name="events",
+        )
+
+    @property
+    def csv_path(self) -> str | None:
+        return self.metrics_writer.path if self.metrics_writer else None
 
-    def log_event(self, event_type: str, details: str, extra: dict | None = None):
-        """结构化写入风控/异常等事件日志"""
+    def log_event(self, event_type: str, details: str, extra: dict | None = None, symbol: str | None = None):
+        """结构化记录风控/异常等事件日志（只入队，不做磁盘与终端 I/O）"""
+        if self._stopped:
+            return
+        if self.store is not None:
+            self.store.record_event(event_type, details, json.dumps(extra or {}, ensure_ascii=False), symbol or self.symbol)
         if not self.log_to_csv:
             return
-        if not hasattr(self, 'event_csv_writer') or self.event_csv_writer is None:
+        if self.event_writer is None:
             self._prepare_event_csv()
-        now = datetime.now().isoformat()
+        now = datetime.now()
         row = {
-            "timestamp": now,
+            "timestamp": now.isoformat(),
             "instance_id": self.instance_id,
             "env": self.env,
             "event_type": event_type,
-            "symbol": self.symbol,
+            "symbol": symbol or self.symbol,
             "details": details,
             "extra": json.dumps(extra or {}, ensure_ascii=False)
         }
-        print(f"[LoggerWorker] 事件日志: {row}")
-        self.event_csv_writer.writerow(row)
-        self.event_csv_file.flush()
+        self.event_writer.write(row, now.strftime("%Y%m%d"))
+
+    def record_order_update(self, o: dict):
+        """用户数据流的订单状态变化/成交写入指标库"""
+        if self.store is not None and not self._stopped:
+            self.store.record_order_update(o)
 
     async def run(self):
-        """主循环：定时采集并写入日志"""
+        """主循环：定时采集指标并放入写入队列"""
         self._running = True
         while self._running:
             try:
-                metrics = self.collect_metrics()
-                if self.log_to_csv and self.csv_writer and self.csv_file:
-                    self.csv_writer.writerow(metrics)
-                    self.csv_file.flush()
+                samples = await self.collect_samples()
+                metrics = self.to_rows(samples)
+                if self.store is not None:
+                    for sample in samples:
+                        self.store.record_metrics(**sample)
+                if self.metrics_writer is not None:
+                    self.metrics_writer.write_many(metrics)
                 if self.log_level == "debug":
                     print(f"[LoggerWorker] 采集指标: {metrics}")
             except Exception as e:
                 print(f"[LoggerWorker] 日志采集异常: {e}")
             await asyncio.sleep(self.interval)
 
-    def collect_metrics(self) -> dict:
-        """采集账户净值、盈亏、持仓等关键指标"""
+    def stats(self) -> dict:
+        """各写入队列的深度、丢弃与写盘统计"""
+        return {name: w.stats() for name, w in (("metrics", self.metrics_writer), ("events", self.event_writer), ("store", self.store)) if w is not None}
+
+    async def collect_metrics(self) -> list[dict]:
+        """采集账户净值、盈亏、持仓等关键指标，每个交易对一行（CSV 行格式）"""
+        return self.to_rows(await self.collect_samples())
+
+    def to_rows(self, samples: list[dict]) -> list[dict]:
         now = datetime.now().isoformat()
-        mark_price = shared_state.mark_price
+        return [
+            self._metrics_row(now, s["symbol"], s["equity"], s["realized_pnl"], s["unrealized_pnl"], s["position"], s["mark_price"])
+            for s in samples
+        ]
+
+    async def collect_samples(self) -> list[dict]:
+        """采集各交易对的指标样本（字段见 MetricsStore.record_metrics），用户数据流可用时附带两侧挂单数"""
+        if all(state.user_stream_live for state in self.states.values()):
+            # 用户数据流实时维护余额与持仓，无需REST轮询
+            samples = []
+            for symbol, state in self.states.items():
+                usdt = state.balances.get("USDT", {})
+                wallet_balance = usdt.get("wallet_balance")
+                equity = wallet_balance + Decimal(str(state.unrealized_pnl)) if wallet_balance is not None else None
+                sides = [o.get("side") for o in state.open_orders.values()]
+                samples.append({
+                    "symbol": symbol, "equity": equity, "realized_pnl": state.realized_pnl, "unrealized_pnl": state.unrealized_pnl,
+                    "position": state.position, "mark_price": state.mark_price,
+                    "bid_orders": sides.count("BUY"), "ask_orders": sides.count("SELL"),
+                })
+            return samples
+        positions = {}
         try:
-            account_info = self.rest.get_account_info()
+            # 指标采集为最低优先级，预算紧张时本轮只写本地状态
+            with request_priority(PRIORITY_METRICS):
+                account_info = await self.snapshots.get_account_info(self.account_max_age)
             equity = account_info.get("totalWalletBalance") or account_info.get("totalMarginBalance")
             realized_pnl = account_info.get("totalUnrealizedProfit")  # 实际应为已实现盈亏，Binance接口需区分
             # 兼容不同字段
             if "totalRealizedProfit" in account_info:
                 realized_pnl = account_info["totalRealizedProfit"]
-            position_info = self.rest.get_position_info(self.symbol)
-            position_amt = position_info.get("positionAmt", "0")
-            unrealized_pnl = position_info.get("unRealizedProfit", "0")
+            # 账户信息中已包含各交易对持仓，多交易对也只需一次请求
+            positions = {p.get("symbol"): p for p in account_info.get("positions", [])}
         except Exception as e:
-            equity = realized_pnl = unrealized_pnl = position_amt = None
+            equity = realized_pnl = None
             print(f"[LoggerWorker] 采集账户信息异常: {e}")
+        samples = []
+        for symbol, state in self.states.items():
+            position_info = positions.get(symbol, {})
+            samples.append({
+                "symbol": symbol, "equity": equity, "realized_pnl": realized_pnl,
+                "unrealized_pnl": position_info.get("unrealizedProfit"), "position": position_info.get("positionAmt"),
+                "mark_price": state.mark_price,
+            })
+        return samples
+
+    def _metrics_row(self, now, symbol, equity, realized_pnl, unrealized_pnl, position_amt, mark_price) -> dict:
         return {
             "timestamp": now,
             "instance_id": self.instance_id,
@@ -110,7 +179,7 @@ class LoggerWorker:
             "metric_name": "account_metrics",
             "value": equity,
             "unit": "usdt",
-            "symbol": self.symbol,
+            "symbol": symbol,
             "side": "-",
             "level": "-",
             "sub_type": "-",
@@ -118,8 +187,14 @@ class LoggerWorker:
         }
 
     def stop(self):
+        """停止采集，写完队列中剩余的日志后关闭文件"""
         self._running = False
-        if self.csv_file:
-            self.csv_file.close()
-        if hasattr(self, 'event_csv_file') and self.event_csv_file:
-            self.event_csv_file.close()
+        self._stopped = True
+        self.config_service.unsubscribe(self.apply_config)
+        for writer in (self.metrics_writer, self.event_writer):
+            if writer is not None:
+                writer.close()
+        stats = self.stats()
+        dropped = {name: st["dropped"] for name, st in stats.items() if st["dropped"]}
+        if dropped:
+            print(f"[LoggerWorker] 运行期间丢弃的日志行数: {dropped}")
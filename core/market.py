@@ -1,50 +1,181 @@
 import asyncio
+import time
+from typing import Dict, List, Union
 from utils.ws import BinanceWebSocket
-from core.state import shared_state
+from core.state import SharedState, StateRegistry, shared_state
+from core.orderbook import LocalOrderBook, DIFF_GAP
 from utils.config_loader import get_config
-from decimal import Decimal, ROUND_HALF_UP
+from utils.metrics import registry as metrics_registry
+from utils.ticks import UNIT_SCALE, to_units
+from utils.tracing import tracer
+
+# 中间价发布精度：0.01（以 1e-8 整数单位计）
+MID_QUANTUM = UNIT_SCALE // 100
+
+WS_MESSAGE_LATENCY = metrics_registry.histogram("pmm_ws_message_latency_seconds", "行情消息从收包到处理完成的耗时（bookTicker 即到中间价更新）", ("event",))
+WS_MESSAGES = metrics_registry.counter("pmm_ws_messages_total", "已处理的行情消息数", ("event",))
+
+class SymbolFeed:
+    """
+    单个交易对的行情处理状态：中间价发布、本地订单簿及其同步过程。
+    多个交易对共用一条 WebSocket 连接，由 MarketDataWorker 按消息中的交易对分发到各自的 SymbolFeed。
+    """
+    def __init__(self, symbol: str, state: SharedState, rest=None, depth_enabled: bool = False, depth_snapshot_limit: int = 1000):
+        self.symbol = symbol
+        self.state = state
+        self.rest = rest
+        self.depth_enabled = depth_enabled and rest is not None
+        self.depth_snapshot_limit = depth_snapshot_limit
+        self.order_book = LocalOrderBook(symbol)
+        self._last_printed_mid = None
+        self._depth_buffer = []        # 快照到达前缓存的增量事件
+        self._depth_syncing = False
+        self._sync_task = None
+        self._traced_seq = 0
+        if self.depth_enabled:
+            state.order_book = self.order_book
+
+    def handle_bookticker(self, msg):
+        """处理 bookTicker 消息，计算中间价（0.01 四舍五入）并写入 state；整数单位运算，结果与 Decimal 一致"""
+        try:
+            bid = to_units(msg.get('b', '0'))
+            ask = to_units(msg.get('a', '0'))
+            if bid > 0 and ask > 0:
+                # (bid + ask) / 2 按 0.01 四舍五入，结果以 0.01 为单位的整数表示
+                mid = (bid + ask + MID_QUANTUM) // (2 * MID_QUANTUM)
+                self.state.publish_mid(mid / 100)
+                # 只在价格变动大于1时打印
+                if self._last_printed_mid is None or abs(mid - self._last_printed_mid) >= 100:
+                    print(f"[MarketDataWorker] {self.symbol} 中间价更新: {mid / 100:.2f}")
+                    self._last_printed_mid = mid
+        except Exception as e:
+            print(f"[MarketDataWorker] 消息处理异常: {e}, msg={msg}")
+
+    def handle_depth(self, msg):
+        """处理 depth 增量：未同步时缓存并触发快照，同步后按序应用，断档则重新同步"""
+        if not self.depth_enabled:
+            return
+        if self._depth_syncing or not self.order_book.synced:
+            self._depth_buffer.append(msg)
+            self._start_depth_sync()
+            return
+        if self.order_book.apply_diff(msg) == DIFF_GAP:
+            print(f"[MarketDataWorker] {self.symbol} depth 序号断档（pu={msg.get('pu')}, 本地={self.order_book.last_update_id}），重新同步订单簿")
+            self.order_book.reset()
+            self._depth_buffer = [msg]
+            self._start_depth_sync()
+
+    def _start_depth_sync(self):
+        if self._depth_syncing:
+            return
+        self._depth_syncing = True
+        self._sync_task = asyncio.create_task(self._sync_order_book())
+
+    async def _sync_order_book(self):
+        """拉取 REST 快照，丢弃过期缓存事件后按序回放，直到本地订单簿与流对齐"""
+        try:
+            while True:
+                snapshot = await self.rest.get_depth(self.symbol, self.depth_snapshot_limit)
+                self.order_book.apply_snapshot(snapshot)
+                buffered, self._depth_buffer = self._depth_buffer, []
+                if all(self.order_book.apply_diff(e) != DIFF_GAP for e in buffered):
+                    print(f"[MarketDataWorker] {self.symbol} 本地订单簿已同步，lastUpdateId={self.order_book.last_update_id}")
+                    return
+                # 快照早于缓存中最早的事件或缓存内断档，保留缓存稍后用更新的快照重试（过期事件会被自动丢弃）
+                print(f"[MarketDataWorker] {self.symbol} 快照与增量流未对齐，重新拉取快照")
+                self.order_book.reset()
+                self._depth_buffer = buffered + self._depth_buffer
+                await asyncio.sleep(0.5)
+        except Exception as e:
+            print(f"[MarketDataWorker] {self.symbol} 订单簿同步异常: {e}")
+            self.order_book.reset()
+        finally:
+            self._depth_syncing = False
+
+    def cancel(self):
+        if self._sync_task:
+            self._sync_task.cancel()
 
 class MarketDataWorker:
     """
     行情订阅与处理模块：
-    - 通过 BinanceWebSocket 订阅 bookTicker
-    - 实时计算中间价并写入 shared_state
-    - 便于后续扩展多币种/多行情类型
-    - 金额、价格、数量全部用 Decimal，避免 float 精度误差
+    - 通过 BinanceWebSocket 订阅 bookTicker，多个交易对复用同一条连接
+    - 实时计算中间价并写入各交易对的 state，价格变动时通知挂单模块
+    - 可选订阅 depth 增量流，结合 REST 快照维护本地 L2 订单簿（state.order_book），断档自动重同步
+    - 价格换算为 1e-8 整数单位运算，避免 float 精度误差与逐条 Decimal 构造的开销
     """
-    def __init__(self, symbol: str, env: str = "testnet"):
-        self.symbol = symbol
+    def __init__(self, symbol: Union[str, List[str]], env: str = "testnet", rest=None, depth_enabled: bool = False, depth_snapshot_limit: int = 1000, registry: StateRegistry | None = None, ws_factory=BinanceWebSocket):
+        symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        self.symbol = symbols[0]
+        self.symbols = symbols
         self.env = env
-        self.ws = BinanceWebSocket(symbol, env)
+        # ws_factory(symbols, env) 可替换为其他实现（如回测中的模拟行情连接）
+        self.ws = ws_factory(symbols, env)
         self._running = False
-        self._last_printed_mid = None
+        self.rest = rest
+        self.depth_enabled = depth_enabled and rest is not None
+        # 未传注册表时（单交易对模式）沿用全局 shared_state
+        self.feeds: Dict[str, SymbolFeed] = {
+            s: SymbolFeed(s, registry.get(s) if registry is not None else shared_state, rest, depth_enabled, depth_snapshot_limit)
+            for s in symbols
+        }
+
+    @property
+    def order_book(self) -> LocalOrderBook:
+        return self.feeds[self.symbol].order_book
 
     async def run(self):
         """启动行情订阅主循环"""
         await self.ws.connect()
         await self.ws.subscribe_bookticker()
+        if self.depth_enabled:
+            await self.ws.subscribe_depth()
         self._running = True
-        print(f"[MarketDataWorker] 已连接 {self.env}，订阅 {self.symbol}@bookTicker")
+        print(f"[MarketDataWorker] 已连接 {self.env}，订阅 {len(self.symbols)} 个交易对 bookTicker{' + depth' if self.depth_enabled else ''}")
+        # 子序列在循环外取出，热路径上每条消息只有一次计时与两次自增
+        ticker_latency, depth_latency = WS_MESSAGE_LATENCY.labels("bookTicker"), WS_MESSAGE_LATENCY.labels("depthUpdate")
+        ticker_count, depth_count = WS_MESSAGES.labels("bookTicker"), WS_MESSAGES.labels("depthUpdate")
+        # 回测等替换实现没有收包时刻，只计数
+        timed = hasattr(self.ws, "last_recv")
+        trace_ticks = timed and tracer.enabled
+        decoded = 0.0
         try:
             async for msg in self.ws.listen():
+                if trace_ticks:
+                    decoded = time.perf_counter()
                 self.handle_message(msg)
+                if msg.get('e') == 'depthUpdate':
+                    latency, count = depth_latency, depth_count
+                else:
+                    latency, count = ticker_latency, ticker_count
+                count.inc()
+                if timed:
+                    now = time.perf_counter()
+                    latency.observe(now - self.ws.last_recv)
+                    if trace_ticks and latency is ticker_latency:
+                        self.mark_tick(msg, decoded, now)
         except Exception as e:
             print(f"[MarketDataWorker] 运行异常: {e}")
         finally:
+            for feed in self.feeds.values():
+                feed.cancel()
             await self.ws.close()
             self._running = False
 
+    def mark_tick(self, msg, decoded: float, published: float):
+        """中间价发生变动时记下触发行情的各时刻，供挂单决策的延迟追踪使用"""
+        feed = self.feeds.get(msg.get('s')) if len(self.feeds) > 1 else self.feeds[self.symbol]
+        if feed is None or feed.state.mid_seq == feed._traced_seq:
+            return
+        feed._traced_seq = feed.state.mid_seq
+        feed.state.last_tick = (msg.get('E'), self.ws.last_recv, decoded, published)
+
     def handle_message(self, msg):
-        """处理 bookTicker 消息，计算中间价并写入 shared_state（Decimal 精度）"""
-        try:
-            bid = Decimal(str(msg.get('b', '0')))
-            ask = Decimal(str(msg.get('a', '0')))
-            if bid > 0 and ask > 0:
-                mid = ((bid + ask) / 2).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                shared_state.safe_update(mark_price=float(mid))
-                # 只在价格变动大于1时打印
-                if self._last_printed_mid is None or abs(mid - self._last_printed_mid) >= Decimal('1'):
-                    print(f"[MarketDataWorker] 中间价更新: {mid}")
-                    self._last_printed_mid = mid
-        except Exception as e:
-            print(f"[MarketDataWorker] 消息处理异常: {e}, msg={msg}")
+        """按交易对分发到对应 SymbolFeed；depthUpdate 进入本地订单簿，其余按 bookTicker 处理"""
+        feed = self.feeds.get(msg.get('s')) if len(self.feeds) > 1 else self.feeds[self.symbol]
+        if feed is None:
+            return
+        if msg.get('e') == 'depthUpdate':
+            feed.handle_depth(msg)
+        else:
+            feed.handle_bookticker(msg)
@@ -1,87 +1,362 @@
 import asyncio
-from decimal import Decimal, ROUND_DOWN
-from utils.http import BinanceRest
-from core.state import shared_state
-from utils.config_loader import get_config
+from decimal import Decimal
+from utils.http import AsyncBinanceRest, is_order_error
+from core.state import SharedState, shared_state
+from core.reconcile import LadderKey, QuoteTarget, ReconcilePlan, WorkingOrder, WorkingOrderBook, make_client_order_id, parse_client_order_id
+from utils.config_loader import ConfigService, ConfigSnapshot, SymbolConfig, get_config_service
+from utils.metrics import registry
+from utils.rate_limit import request_priority, PRIORITY_EMERGENCY
+from utils.snapshot_cache import SnapshotCache
+from utils.symbol_rules import SymbolRules, SymbolRulesCache
+from utils.ticks import UNIT_SCALE, TickGrid, ladder_ticks, to_units
+from utils.tracing import current_trace, tracer
+
+REFRESH_LATENCY = registry.histogram("pmm_refresh_orders_seconds", "一轮挂单对账（计算梯队 + 撤/改/补单）的耗时", ("symbol",))
+REFRESH_ERRORS = registry.counter("pmm_refresh_orders_errors_total", "挂单对账异常次数", ("symbol",))
 
 class OrderManager:
     """
     挂单管理模块：
-    - 每N秒撤销所有挂单，自动挂3档限价单
-    - 价格、数量用Decimal，精度严格控制
+    - 中间价偏移达到阈值（或超时兜底）时计算目标挂单梯队，与本地挂单簿对账，只撤/改/补有变化的档位
+    - 撤单/改单/新单均走批量接口，整条梯队一个往返完成
+    - 价格、数量在内部以整数 tick / lot 计算，只在提交 REST 请求时转换为 Decimal，精度严格控制
+    - 启用 adopt_orders 时启动（含被监管模块重启）不撤单，接管交易所上本策略的挂单后增量对账
     - 依赖 shared_state 的中间价和配置参数
     - 便于后续扩展风控、容错等
     """
-    def __init__(self, rest: BinanceRest, symbol: str, order_levels: int, qty_per_order: Decimal, price_offset_percent: Decimal, refresh_interval: int = 5):
+    def __init__(self, rest: AsyncBinanceRest, symbol: str, order_levels: int, qty_per_order: Decimal, price_offset_percent: Decimal, refresh_interval: int = 5, open_orders_sync_every: int = 6, requote_ticks: int = 2, requote_bps: float = 0.0, debounce_ms: int = 100, rules_cache: SymbolRulesCache | None = None, config_service: ConfigService | None = None, state: SharedState | None = None,
+                 snapshots: SnapshotCache | None = None, position_max_age: float = 0.0, adopt_orders: bool = False, known_orders: dict[int, LadderKey] | None = None):
         self.rest = rest
+        # 持仓查询经共享快照缓存，position_max_age 秒内的数据可直接复用
+        self.snapshots = snapshots or SnapshotCache(rest)
+        self.position_max_age = position_max_age
+        self.state = state or shared_state
+        self.config_service = config_service or get_config_service()
+        self.config_service.subscribe(self.apply_config)
+        self.rules_cache = rules_cache or SymbolRulesCache(rest)
         self.symbol = symbol
         self.order_levels = order_levels
         self.qty_per_order = qty_per_order
         self.price_offset_percent = price_offset_percent
         self.refresh_interval = refresh_interval
+        self.open_orders_sync_every = max(1, open_orders_sync_every)
+        self.requote_ticks = requote_ticks
+        self.requote_bps = requote_bps
+        self.debounce = debounce_ms / 1000
+        self.sync_grace = 2.0
+        self._last_quote_time = 0.0
         self._running = False
-        # 自动获取币种精度参数
-        info = rest.get_symbol_info(symbol)
-        self.step_size = Decimal(info["step_size"])
-        self.min_qty = Decimal(info["min_qty"])
-        self.price_tick = Decimal(info["price_tick"])
-        print(f"[OrderManager] {symbol} 精度参数: step_size={self.step_size}, min_qty={self.min_qty}, price_tick={self.price_tick}")
+        self._initialized = False
+        self._refresh_count = 0
+        self.book = WorkingOrderBook(clock=lambda: asyncio.get_running_loop().time())
+        self.rules: SymbolRules | None = None
+        self.grid: TickGrid | None = None
+        self.step_size = None
+        self.min_qty = None
+        self.price_tick = None
+        self._symbol_cfg: SymbolConfig | None = None
+        self._refresh_latency = REFRESH_LATENCY.labels(symbol)
+        self._refresh_errors = REFRESH_ERRORS.labels(symbol)
+        # 热启动：接管已有挂单；known_orders 为检查点记录的 orderId -> 档位，优先于 clientOrderId 解析
+        self.adopt_orders = adopt_orders
+        self.known_orders = known_orders or {}
+        self.state.quote_book = self.book
+
+    def apply_config(self, old: ConfigSnapshot, new: ConfigSnapshot):
+        """配置热更新：挂单档位、偏移与重挂参数即时生效（交易对被移出配置时保持原参数）"""
+        try:
+            sc = new.symbol_config(self.symbol)
+        except KeyError:
+            return
+        self.order_levels = sc.levels
+        self.price_offset_percent = sc.price_offset_percent
+        self.requote_ticks = sc.requote_ticks
+        self.requote_bps = sc.requote_bps
+        self.refresh_interval = new.orderbook_refresh_interval
+        self.open_orders_sync_every = new.open_orders_sync_every
+        self.debounce = new.debounce_ms / 1000
+        self._symbol_cfg = sc
+
+    def symbol_config(self) -> SymbolConfig:
+        """当前交易对的配置（读取内存快照，无文件I/O）"""
+        if self._symbol_cfg is None:
+            self._symbol_cfg = self.config_service.snapshot.symbol_config(self.symbol)
+        return self._symbol_cfg
+
+    async def load_symbol_info(self):
+        """从规则缓存获取币种精度参数（缓存过期时自动刷新）"""
+        rules = await self.rules_cache.get(self.symbol)
+        if rules is self.rules:
+            return
+        self.rules = rules
+        self.step_size = self.rules.step_size
+        self.min_qty = self.rules.min_qty
+        self.price_tick = self.rules.price_tick
+        self.grid = TickGrid.from_rules(self.rules)
+        print(f"[OrderManager] {self.symbol} 精度参数: step_size={self.step_size}, min_qty={self.min_qty}, price_tick={self.price_tick}")
 
     async def run(self):
-        """主循环：定时撤单并挂单"""
+        """主循环：中间价变动触发对账挂单，长时间无变动时按 refresh_interval 兜底刷新"""
+        await self.load_symbol_info()
         self._running = True
+        loop = asyncio.get_running_loop()
         while self._running:
+            quoted_mid = self.state.mark_price
+            self._last_quote_time = loop.time()
+            # 追踪本轮挂单决策：触发行情 → 对账 → 签名/HTTP → 交易所确认（未启用追踪时 trace 为 None）
+            trace = tracer.start(self.symbol, self.state.last_tick)
+            token = current_trace.set(trace)
             try:
-                await self.refresh_orders()
+                with self._refresh_latency.time():
+                    await self.refresh_orders()
+                self.state.last_order_time = loop.time()
             except Exception as e:
+                self._refresh_errors.inc()
+                if trace is not None:
+                    trace.outcome = "error"
                 print(f"[OrderManager] 刷单异常: {e}")
-            await asyncio.sleep(self.refresh_interval)
+            finally:
+                current_trace.reset(token)
+                tracer.finish(trace)
+            await self.wait_requote_trigger(quoted_mid)
+
+    def mid_moved(self, quoted_mid: float, mid: float) -> bool:
+        """中间价相对上次挂单时的偏移是否达到重挂阈值（tick 数或基点，任一满足即可）"""
+        if quoted_mid <= 0:
+            return mid > 0
+        move = abs(mid - quoted_mid)
+        if self.requote_ticks > 0 and move >= float(self.price_tick) * self.requote_ticks:
+            return True
+        if self.requote_bps > 0 and move / quoted_mid * 10000 >= self.requote_bps:
+            return True
+        return self.requote_ticks <= 0 and self.requote_bps <= 0 and move > 0
+
+    async def wait_requote_trigger(self, quoted_mid: float):
+        """
+        等待下一次重挂时机：
+        - 中间价偏移达到阈值或有成交推送：立即返回（距上次挂单不足 debounce 时补足间隔）
+        - 超过 refresh_interval 无触发：返回，兜底刷新
+        """
+        loop = asyncio.get_running_loop()
+        seq = self.state.mid_seq
+        order_seq = self.state.order_seq
+        while self._running:
+            remaining = self._last_quote_time + self.refresh_interval - loop.time()
+            if remaining <= 0:
+                return
+            seq = await self.state.wait_mid_update(seq, timeout=remaining)
+            # 中间价偏移达到阈值，或有成交/订单状态变化（需要补挂或调整数量）
+            if self.mid_moved(quoted_mid, self.state.mark_price) or self.state.order_seq != order_seq:
+                wait = self._last_quote_time + self.debounce - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return
 
     async def refresh_orders(self):
-        print("[OrderManager] 撤销所有挂单...")
-        self.rest.cancel_all_orders(self.symbol)
-        mid = Decimal(str(shared_state.mark_price)).quantize(self.price_tick, rounding=ROUND_DOWN)
-        print(f"[OrderManager] 当前中间价: {mid}")
-        # 获取币种精度和最小下单量
-        info = self.rest.get_symbol_info(self.symbol)
-        step_size = Decimal(info["step_size"])
-        min_qty = Decimal(info["min_qty"])
-        # 动态获取最大允许仓位
-        from utils.config_loader import get_config
-        config = get_config()
-        initial_capital = Decimal(str(config.yaml.get("initial_capital", 200)))
-        max_net_position_ratio = Decimal(str(config.yaml.get("max_net_position_ratio", 0.5)))
-        mark_price = Decimal(str(shared_state.mark_price or 1))
-        max_net_position = (initial_capital * max_net_position_ratio) / mark_price
-        # 获取当前真实持仓
-        try:
-            current_position = self.rest.get_position_info(self.symbol).get("positionAmt", "0")
-            current_position = Decimal(str(current_position))
-        except Exception as e:
-            print(f"[OrderManager] 获取当前持仓失败: {e}")
-            current_position = Decimal("0")
-        # 每次从yaml读取下单金额
-        order_cfg = config.yaml.get("order_config", {})
-        qty_per_order_usdt = Decimal(str(order_cfg.get("quantity_per_order_usdt", 100)))
-        for level in range(1, self.order_levels + 1):
-            offset = self.price_offset_percent * level / Decimal('100')
-            tick_size = self.price_tick.normalize()
-            buy_price = (mid * (Decimal('1') - offset)).quantize(tick_size, rounding=ROUND_DOWN)
-            sell_price = (mid * (Decimal('1') + offset)).quantize(tick_size, rounding=ROUND_DOWN)
-            # 换算币本位数量
-            raw_qty = qty_per_order_usdt / mark_price
-            order_qty = raw_qty.quantize(step_size, rounding=ROUND_DOWN)
-            # 受最大允许仓位约束
-            max_order_qty = max_net_position - abs(current_position)
-            if order_qty > max_order_qty:
-                order_qty = max_order_qty.quantize(step_size, rounding=ROUND_DOWN)
-            # 检查最小下单量
-            if order_qty < min_qty:
-                print(f"[OrderManager] 档位{level}下单数量 {order_qty} 小于最小下单量 {min_qty}，跳过该档买卖单")
+        """计算目标挂单梯队，与本地挂单簿对账，只发送必要的撤单/改单/新单"""
+        if self.state.halt_reason or self.state.strategy_paused:
+            await self.pull_quotes()
+            return
+        if not self._initialized:
+            if self.adopt_orders:
+                await self.adopt_open_orders()
+            else:
+                # 启动时清掉上一次运行遗留的挂单，之后只做增量对账
+                print("[OrderManager] 启动清理：撤销所有挂单...")
+                await self.rest.cancel_all_orders(self.symbol)
+                self.book.clear()
+            self._initialized = True
+        elif self.state.user_stream_live or self._refresh_count % self.open_orders_sync_every == 0:
+            # 用户数据流可用时每轮都从内存同步（成交的档位立即补挂），否则按间隔走REST
+            await self.sync_open_orders()
+        self._refresh_count += 1
+        targets = await self.build_targets()
+        plan = self.book.diff(targets)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.mark_targets(len(plan.to_cancel) + len(plan.to_amend) + len(plan.to_place))
+        if plan.is_empty():
+            print(f"[OrderManager] 挂单无变化，跳过本轮（{plan}）")
+            return
+        print(f"[OrderManager] 对账结果: {plan}")
+        await self.execute_plan(plan)
+
+    async def build_targets(self) -> list[QuoteTarget]:
+        """根据中间价、偏移和仓位上限生成目标挂单梯队（整数 tick / lot 运算）"""
+        if self.rules_cache.expired() or self.rules_cache.rules.get(self.symbol) is not self.rules:
+            await self.load_symbol_info()
+        grid = self.grid
+        mark_units = to_units(self.state.mark_price or 1)
+        mid_units = grid.mid_units(self.state.mark_price)
+        print(f"[OrderManager] 当前中间价: {mid_units / UNIT_SCALE}")
+        # 动态获取最大允许仓位（读取内存中的配置快照，无文件I/O）
+        config = self.symbol_config()
+        # 获取当前真实持仓（用户数据流可用时直接读 shared_state）
+        if self.state.user_stream_live:
+            position_units = to_units(self.state.position)
+        else:
+            try:
+                pos_info = await self.snapshots.get_position_info(self.symbol, self.position_max_age)
+                position_units = to_units(pos_info.get("positionAmt", "0"))
+            except Exception as e:
+                print(f"[OrderManager] 获取当前持仓失败: {e}")
+                position_units = 0
+        # 各档数量相同：按USDT金额换算币本位数量，受最大允许仓位约束
+        order_lots = min(
+            grid.lots_for_notional(config.quantity_per_order_usdt, mark_units),
+            grid.max_lots(config.max_net_notional, mark_units, position_units),
+        )
+        if not grid.qty_ok(order_lots):
+            print(f"[OrderManager] 下单数量 {grid.quantity(order_lots)} 小于最小下单量 {self.min_qty}，跳过所有档位")
+            return []
+        targets = []
+        for level, buy_ticks, sell_ticks in ladder_ticks(mid_units, self.order_levels, self.price_offset_percent, grid.tick_units):
+            for side, ticks in (("BUY", buy_ticks), ("SELL", sell_ticks)):
+                # 检查最小名义价值与价格范围
+                if not grid.notional_ok(ticks, order_lots):
+                    print(f"[OrderManager] 档位{level}{side}名义价值 {grid.price(ticks) * grid.quantity(order_lots)} 小于最小要求 {self.rules.min_notional}，跳过")
+                    continue
+                if not grid.price_in_band(ticks, mark_units):
+                    print(f"[OrderManager] 档位{level}{side}价格 {grid.price(ticks)} 超出允许范围，跳过")
+                    continue
+                targets.append(QuoteTarget(side, level, ticks, order_lots, grid))
+        return targets
+
+    async def execute_plan(self, plan: ReconcilePlan):
+        """
+        执行对账计划：撤单、改单、新单三组批量请求并发发出，整体一个往返；
+        改单失败（原单已成交/已撤）的档位再补一次批量新挂。
+        """
+        _, failed_amends, _ = await asyncio.gather(
+            self._cancel_batch(plan.to_cancel),
+            self._amend_batch(plan.to_amend),
+            self._place_batch(plan.to_place),
+        )
+        if failed_amends:
+            await self._place_batch(failed_amends)
+
+    async def _cancel_batch(self, orders: list[WorkingOrder]):
+        if not orders:
+            return
+        for order in orders:
+            # 撤单失败多为已成交/已撤，均从本地移除，下次同步时再校正
+            self.book.remove(order.key)
+        by_id = [o for o in orders if o.order_id is not None]
+        by_client_id = [o for o in orders if o.order_id is None]
+        requests = []
+        if by_id:
+            requests.append(self.rest.cancel_batch_orders(self.symbol, order_ids=[o.order_id for o in by_id]))
+        if by_client_id:
+            requests.append(self.rest.cancel_batch_orders(self.symbol, client_order_ids=[o.client_order_id for o in by_client_id]))
+        results = [r for chunk in await asyncio.gather(*requests) for r in chunk]
+        for order, resp in zip(by_id + by_client_id, results):
+            if is_order_error(resp):
+                print(f"[OrderManager] 撤单失败 {order.side}{order.level}: {resp.get('msg')}")
+
+    async def _amend_batch(self, amends: list[tuple[WorkingOrder, QuoteTarget]]) -> list[QuoteTarget]:
+        """批量改单，返回需要重新挂单的目标"""
+        if not amends:
+            return []
+        for order, target in amends:
+            print(f"[OrderManager] 改单 {target.side}{target.level}: {order.price}/{order.quantity} -> {target.price}/{target.quantity}")
+        results = await self.rest.modify_batch_orders(self.symbol, [
+            {"side": t.side, "quantity": t.quantity, "price": t.price, "order_id": o.order_id, "client_order_id": o.client_order_id}
+            for o, t in amends
+        ])
+        failed = []
+        for (order, target), resp in zip(amends, results):
+            if is_order_error(resp):
+                # 原单可能已成交或已撤，改为重新挂单
+                print(f"[OrderManager] 改单失败 {target.side}{target.level}，改为新挂: {resp.get('msg')}")
+                self.book.remove(order.key)
+                failed.append(target)
+            else:
+                self.book.on_amended(order, target, resp)
+        return failed
+
+    async def _place_batch(self, targets: list[QuoteTarget]):
+        if not targets:
+            return
+        client_ids = [make_client_order_id(t.side, t.level) for t in targets]
+        for t in targets:
+            print(f"[OrderManager] 挂{'买' if t.side == 'BUY' else '卖'}单: {t.price}, 档位: {t.level}, 数量: {t.quantity}")
+        results = await self.rest.place_batch_orders(self.symbol, [
+            {"side": t.side, "quantity": t.quantity, "price": t.price, "client_order_id": cid}
+            for t, cid in zip(targets, client_ids)
+        ])
+        for target, cid, resp in zip(targets, client_ids, results):
+            if is_order_error(resp):
+                print(f"[OrderManager] 挂单失败 {target.side}{target.level}: {resp.get('msg')}")
+            else:
+                self.book.on_placed(target, resp, cid)
+
+    async def sync_open_orders(self):
+        """用交易所挂单校正本地挂单簿（用户数据流可用时读 shared_state，否则走REST），撤销未跟踪的孤儿单"""
+        if self.state.user_stream_live:
+            open_orders = list(self.state.open_orders.values())
+        else:
+            try:
+                open_orders = await self.rest.get_open_orders(self.symbol)
+            except Exception as e:
+                print(f"[OrderManager] 同步挂单失败: {e}")
+                return
+        # 推送/查询可能略晚于下单回报，刚确认的挂单给予宽限期
+        orphans = self.book.sync_with_exchange(open_orders, min_age=self.sync_grace)
+        if not orphans:
+            return
+        print(f"[OrderManager] 撤销未跟踪挂单: {[o.get('orderId') for o in orphans]}")
+        results = await self.rest.cancel_batch_orders(self.symbol, order_ids=[o.get("orderId") for o in orphans])
+        for o, resp in zip(orphans, results):
+            if is_order_error(resp):
+                print(f"[OrderManager] 撤销未跟踪挂单失败 {o.get('orderId')}: {resp.get('msg')}")
+
+    async def adopt_open_orders(self):
+        """
+        热启动：用一次挂单查询（用户数据流可用时读 shared_state）接管本策略的挂单，
+        档位按检查点记录或 clientOrderId 还原，同一档位有多个挂单时保留最新的；其余挂单撤销
+        """
+        if self.state.user_stream_live:
+            open_orders = list(self.state.open_orders.values())
+        else:
+            open_orders = await self.rest.get_open_orders(self.symbol)
+        self.book.clear()
+        adopted: dict[LadderKey, dict] = {}
+        stale = []
+        for o in sorted(open_orders, key=lambda o: o.get("updateTime", 0)):
+            key = self.known_orders.get(o.get("orderId")) or parse_client_order_id(o.get("clientOrderId"))
+            if key is None or o.get("side") != key[0] or o.get("type", "LIMIT") != "LIMIT":
+                stale.append(o)
                 continue
-            print(f"[OrderManager] 挂买单: {buy_price}, 卖单: {sell_price}, 档位: {level}, 数量: {order_qty}")
-            self.rest.place_order(self.symbol, side="BUY", quantity=order_qty, price=buy_price)
-            self.rest.place_order(self.symbol, side="SELL", quantity=order_qty, price=sell_price)
+            if key in adopted:
+                stale.append(adopted[key])
+            adopted[key] = o
+        for key, o in adopted.items():
+            self.book.adopt(key, o, self.grid)
+        print(f"[OrderManager] {self.symbol} 热启动：接管挂单 {len(adopted)} 个，撤销 {len(stale)} 个")
+        if not stale:
+            return
+        results = await self.rest.cancel_batch_orders(self.symbol, order_ids=[o.get("orderId") for o in stale])
+        for o, resp in zip(stale, results):
+            if is_order_error(resp):
+                print(f"[OrderManager] 撤销挂单失败 {o.get('orderId')}: {resp.get('msg')}")
+
+    async def pull_quotes(self):
+        """
+        监管模块判定行情或风控失效（state.halt_reason）或风控暂停策略（state.strategy_paused，含热启动恢复的暂停标记）：
+        撤掉残留挂单并停止报价，恢复后由订单更新通知唤醒重新报价
+        """
+        trace = current_trace.get()
+        if trace is not None:
+            trace.outcome = "halted"
+        # 首轮之前交易所上可能还留有上次运行的挂单（热启动尚未接管），同样需要撤销
+        if self._initialized and not len(self.book):
+            return
+        print(f"[OrderManager] {self.symbol} 停止报价（{self.state.halt_reason or '策略已暂停'}），撤销全部挂单")
+        with request_priority(PRIORITY_EMERGENCY):
+            await self.rest.cancel_all_orders(self.symbol)
+        self.book.clear()
+        self._initialized = True
 
     def stop(self):
         self._running = False
+        self.config_service.unsubscribe(self.apply_config)
@@ -0,0 +1,129 @@
+from typing import List, Optional, Tuple
+from sortedcontainers import SortedDict
+
+# apply_diff 返回值
+DIFF_APPLIED = "applied"   # 已应用
+DIFF_STALE = "stale"       # 早于快照的旧事件，已丢弃
+DIFF_GAP = "gap"           # 序号不连续，需要重新同步
+
+class LocalOrderBook:
+    """
+    本地 L2 订单簿（Binance 合约 depth 增量流 + REST 快照）：
+    - 买卖两侧各用一个 SortedDict(price -> qty)，插入/删除/定位均为 O(log n)
+    - 按合约规则校验 update id：丢弃 u < lastUpdateId 的事件；首个事件需满足
+      U <= lastUpdateId <= u；之后每个事件的 pu 必须等于上一事件的 u，否则判定断档
+    - 提供 top-N、微观价格、深度加权中间价、距离内流动性等查询
+    """
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids: SortedDict = SortedDict()
+        self.asks: SortedDict = SortedDict()
+        self.last_update_id: Optional[int] = None
+        self.event_time: int = 0
+        self._first_applied = False
+
+    @property
+    def synced(self) -> bool:
+        return self.last_update_id is not None
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = None
+        self._first_applied = False
+
+    def apply_snapshot(self, snapshot: dict):
+        """应用 REST /fapi/v1/depth 快照"""
+        self.reset()
+        for price, qty in snapshot.get("bids", []):
+            self._set(self.bids, price, qty)
+        for price, qty in snapshot.get("asks", []):
+            self._set(self.asks, price, qty)
+        self.last_update_id = snapshot["lastUpdateId"]
+        self.event_time = snapshot.get("E", 0)
+
+    def apply_diff(self, event: dict) -> str:
+        """应用一条 depthUpdate 增量事件，返回 DIFF_APPLIED / DIFF_STALE / DIFF_GAP"""
+        if self.last_update_id is None:
+            return DIFF_GAP
+        first_id, final_id, prev_final_id = event["U"], event["u"], event.get("pu")
+        if final_id < self.last_update_id:
+            return DIFF_STALE
+        if not self._first_applied:
+            if first_id > self.last_update_id:
+                return DIFF_GAP
+        elif prev_final_id != self.last_update_id:
+            return DIFF_GAP
+        for price, qty in event.get("b", []):
+            self._set(self.bids, price, qty)
+        for price, qty in event.get("a", []):
+            self._set(self.asks, price, qty)
+        self.last_update_id = final_id
+        self.event_time = event.get("E", self.event_time)
+        self._first_applied = True
+        return DIFF_APPLIED
+
+    @staticmethod
+    def _set(side: SortedDict, price, qty):
+        p, q = float(price), float(qty)
+        if q == 0:
+            side.pop(p, None)
+        else:
+            side[p] = q
+
+    # ---------- 查询 ----------
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        return self.bids.peekitem(-1) if self.bids else None
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        return self.asks.peekitem(0) if self.asks else None
+
+    def mid(self) -> Optional[float]:
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def top_n(self, side: str, n: int) -> List[Tuple[float, float]]:
+        """返回某一侧最优 n 档 [(price, qty), ...]，side 为 "BUY"/"SELL" """
+        if side == "BUY":
+            count = min(n, len(self.bids))
+            return [self.bids.peekitem(-1 - i) for i in range(count)]
+        count = min(n, len(self.asks))
+        return [self.asks.peekitem(i) for i in range(count)]
+
+    def microprice(self) -> Optional[float]:
+        """按最优档挂单量加权的微观价格：买量大时偏向卖价，反之偏向买价"""
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        total = bid[1] + ask[1]
+        if total <= 0:
+            return (bid[0] + ask[0]) / 2
+        return (bid[0] * ask[1] + ask[0] * bid[1]) / total
+
+    def depth_weighted_mid(self, levels: int = 5) -> Optional[float]:
+        """两侧各取前 levels 档，按数量加权的均价再取中点"""
+        bids, asks = self.top_n("BUY", levels), self.top_n("SELL", levels)
+        if not bids or not asks:
+            return None
+        bid_qty = sum(q for _, q in bids)
+        ask_qty = sum(q for _, q in asks)
+        bid_vwap = sum(p * q for p, q in bids) / bid_qty
+        ask_vwap = sum(p * q for p, q in asks) / ask_qty
+        return (bid_vwap + ask_vwap) / 2
+
+    def liquidity_within(self, side: str, distance_bps: float) -> float:
+        """最优价起 distance_bps 基点范围内某一侧的累计挂单量（二分定位区间，O(log n + k)）"""
+        if side == "BUY":
+            best = self.best_bid()
+            if best is None:
+                return 0.0
+            low = best[0] * (1 - distance_bps / 10000)
+            return sum(self.bids[p] for p in self.bids.irange(low, best[0]))
+        best = self.best_ask()
+        if best is None:
+            return 0.0
+        high = best[0] * (1 + distance_bps / 10000)
+        return sum(self.asks[p] for p in self.asks.irange(best[0], high))
@@ -1,9 +1,15 @@
 import asyncio
 from decimal import Decimal
+from core.state import SharedState, shared_state
+from utils.rate_limit import request_priority, PRIORITY_METRICS
+from utils.snapshot_cache import SnapshotCache
 
 class PositionMonitorWorker:
-    def __init__(self, rest, symbol, interval=10):
+    def __init__(self, rest, symbol, interval=10, state: SharedState | None = None, snapshots: SnapshotCache | None = None, max_age: float = 0.0):
         self.rest = rest
+        self.snapshots = snapshots or SnapshotCache(rest)
+        self.max_age = max_age
+        self.state = state or shared_state
         self.symbol = symbol
         self.interval = interval
         self._running = False
@@ -12,7 +18,18 @@ class PositionMonitorWorker:
         self._running = True
         while self._running:
             try:
-                pos_info = self.rest.get_position_info(self.symbol)
+                if self.state.user_stream_live:
+                    # 用户数据流实时维护持仓，无需REST轮询；未实现盈亏按最新中间价估算
+                    position_amt = Decimal(str(self.state.position))
+                    entry_price = Decimal(str(self.state.entry_price))
+                    mark_price = Decimal(str(self.state.mark_price))
+                    unrealized_pnl = (mark_price - entry_price) * position_amt if position_amt else Decimal("0")
+                    print(f"[PositionMonitor] 仓位: {position_amt} | 持仓均价: {entry_price} | 最新价: {mark_price} | 未实现盈亏: {unrealized_pnl:.4f}")
+                    await asyncio.sleep(self.interval)
+                    continue
+                # 仅用于展示，预算紧张时允许被丢弃
+                with request_priority(PRIORITY_METRICS):
+                    pos_info = await self.snapshots.get_position_info(self.symbol, self.max_age)
                 position_amt = Decimal(str(pos_info.get("positionAmt", "0")))
                 entry_price = Decimal(str(pos_info.get("entryPrice", "0")))
                 unrealized_pnl = Decimal(str(pos_info.get("unRealizedProfit", "0")))
@@ -0,0 +1,172 @@
+import itertools
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.ticks import TickGrid
+
+# 本地挂单簿的键：(side, level)，如 ("BUY", 1)
+LadderKey = Tuple[str, int]
+
+CLIENT_ORDER_PREFIX = "pmm"
+_client_seq = itertools.count()
+
+def make_client_order_id(side: str, level: int) -> str:
+    """生成带方向与档位信息的 clientOrderId，便于从交易所回报反查档位"""
+    return f"{CLIENT_ORDER_PREFIX}-{side[0]}{level}-{int(time.time() * 1000)}{next(_client_seq) % 1000:03d}"
+
+def parse_client_order_id(client_order_id: str) -> Optional[LadderKey]:
+    """从本模块生成的 clientOrderId 中解析 (side, level)，非本策略订单返回 None"""
+    parts = (client_order_id or "").split("-")
+    if len(parts) != 3 or parts[0] != CLIENT_ORDER_PREFIX or len(parts[1]) < 2:
+        return None
+    side = {"B": "BUY", "S": "SELL"}.get(parts[1][0])
+    if side is None or not parts[1][1:].isdigit():
+        return None
+    return side, int(parts[1][1:])
+
+@dataclass(frozen=True)
+class QuoteTarget:
+    """目标挂单：某一档位期望的价格与数量（整数 ticks / lots，由 grid 换算为 Decimal）"""
+    side: str
+    level: int
+    price_ticks: int
+    qty_lots: int
+    grid: TickGrid = field(repr=False, compare=False)
+
+    @property
+    def key(self) -> LadderKey:
+        return self.side, self.level
+
+    @property
+    def price(self) -> Decimal:
+        return self.grid.price(self.price_ticks)
+
+    @property
+    def quantity(self) -> Decimal:
+        return self.grid.quantity(self.qty_lots)
+
+@dataclass
+class WorkingOrder:
+    """本地记录的在途挂单"""
+    side: str
+    level: int
+    price_ticks: int
+    qty_lots: int
+    grid: TickGrid = field(repr=False, compare=False)
+    order_id: Optional[int] = None
+    client_order_id: Optional[str] = None
+    updated_at: float = 0.0  # 最近一次下单/改单确认的时间（挂单簿时钟）
+
+    @property
+    def key(self) -> LadderKey:
+        return self.side, self.level
+
+    @property
+    def price(self) -> Decimal:
+        return self.grid.price(self.price_ticks)
+
+    @property
+    def quantity(self) -> Decimal:
+        return self.grid.quantity(self.qty_lots)
+
+    def matches(self, target: QuoteTarget) -> bool:
+        # 交易规则刷新后网格可能变化，网格不同时视为不匹配
+        return self.price_ticks == target.price_ticks and self.qty_lots == target.qty_lots and (self.grid is target.grid or self.grid == target.grid)
+
+@dataclass
+class ReconcilePlan:
+    """一次对账需要执行的最小操作集合"""
+    to_cancel: List[WorkingOrder] = field(default_factory=list)
+    to_amend: List[Tuple[WorkingOrder, QuoteTarget]] = field(default_factory=list)
+    to_place: List[QuoteTarget] = field(default_factory=list)
+    unchanged: int = 0
+
+    def is_empty(self) -> bool:
+        return not (self.to_cancel or self.to_amend or self.to_place)
+
+    def __str__(self):
+        return f"撤单{len(self.to_cancel)} 改单{len(self.to_amend)} 新单{len(self.to_place)} 保持{self.unchanged}"
+
+class WorkingOrderBook:
+    """
+    本地挂单簿：
+    - 按 (side, level) 记录当前在交易所挂着的本策略订单
+    - diff() 对比目标挂单梯队，只产出需要的撤单、改单、新单
+    - 未变化的挂单原样保留，不丢失排队优先级
+    """
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.orders: Dict[LadderKey, WorkingOrder] = {}
+        self.clock = clock
+
+    def diff(self, targets: List[QuoteTarget]) -> ReconcilePlan:
+        plan = ReconcilePlan()
+        wanted = {t.key: t for t in targets}
+        for key, order in self.orders.items():
+            target = wanted.get(key)
+            if target is None:
+                plan.to_cancel.append(order)
+            elif order.matches(target):
+                plan.unchanged += 1
+            else:
+                plan.to_amend.append((order, target))
+        for key, target in wanted.items():
+            if key not in self.orders:
+                plan.to_place.append(target)
+        return plan
+
+    def on_placed(self, target: QuoteTarget, resp: dict, client_order_id: Optional[str] = None):
+        self.orders[target.key] = WorkingOrder(
+            side=target.side,
+            level=target.level,
+            price_ticks=target.price_ticks,
+            qty_lots=target.qty_lots,
+            grid=target.grid,
+            order_id=resp.get("orderId"),
+            client_order_id=resp.get("clientOrderId", client_order_id),
+            updated_at=self.clock(),
+        )
+
+    def on_amended(self, order: WorkingOrder, target: QuoteTarget, resp: Optional[dict] = None):
+        order.price_ticks = target.price_ticks
+        order.qty_lots = target.qty_lots
+        order.grid = target.grid
+        order.updated_at = self.clock()
+        if resp and resp.get("orderId") is not None:
+            order.order_id = resp["orderId"]
+
+    def adopt(self, key: LadderKey, order: dict, grid: TickGrid):
+        """接管交易所上已有的挂单（热启动），价格/数量按当前网格换算"""
+        self.orders[key] = WorkingOrder(
+            side=key[0],
+            level=key[1],
+            price_ticks=grid.price_ticks(order.get("price", "0")),
+            qty_lots=grid.qty_lots(order.get("origQty", "0")),
+            grid=grid,
+            order_id=order.get("orderId"),
+            client_order_id=order.get("clientOrderId"),
+            updated_at=self.clock(),
+        )
+
+    def remove(self, key: LadderKey):
+        self.orders.pop(key, None)
+
+    def sync_with_exchange(self, open_orders: List[dict], min_age: float = 0.0) -> List[dict]:
+        """
+        用交易所当前挂单校正本地挂单簿：
+        - 本地有、交易所已不存在（成交/被撤）的订单从本地移除；
+          确认时间不足 min_age 的订单暂不移除（推送可能尚未到达）
+        - 返回交易所上存在但本地未跟踪的订单（孤儿单），由调用方决定处理方式
+        """
+        open_ids = {o.get("orderId") for o in open_orders}
+        now = self.clock()
+        for key in [k for k, o in self.orders.items() if o.order_id not in open_ids and now - o.updated_at >= min_age]:
+            self.orders.pop(key)
+        tracked = {o.order_id for o in self.orders.values()}
+        return [o for o in open_orders if o.get("orderId") not in tracked]
+
+    def clear(self):
+        self.orders.clear()
+
+    def __len__(self):
+        return len(self.orders)
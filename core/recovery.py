@@ -1,51 +1,306 @@
 import asyncio
+import random
+import sys
+import threading
+import time
 import traceback
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+from core.state import SharedState
+from utils.metrics import LOOP_LAG, LOOP_LAG_LAST, registry
+from utils.rate_limit import request_priority, PRIORITY_EMERGENCY
+
+# 重启策略
+RESTART_ALWAYS = "always"          # 退出或异常都重启（常驻模块）
+RESTART_ON_FAILURE = "on_failure"  # 只在异常退出时重启
+RESTART_NEVER = "never"            # 不重启，只记录
+
+WORKER_RESTARTS = registry.counter("pmm_worker_restarts_total", "被监管模块的重启次数", ("worker", "reason"))
+LOOP_STALLS = registry.counter("pmm_event_loop_stalls_total", "事件循环阻塞超过阈值的次数")
+QUOTES_HALTED = registry.gauge("pmm_quotes_halted", "因行情/风控失效而撤单停报的交易对（1 为停报中）", ("symbol",))
+
+def stream_idle(ws) -> Optional[float]:
+    """
+    行情连接距最近一次收包的秒数，尚未收到数据时为 None。
+    读 last_frame（含被过滤的未变化 bookTicker），盘口价格长时间不变但连接正常时不会被误判为失效。
+    """
+    last = getattr(ws, "last_frame", 0.0)
+    return time.perf_counter() - last if last else None
+
+class WorkerSpec:
+    """单个被监管模块：运行入口、重启策略与心跳探针，以及运行时状态"""
+    def __init__(self, name: str, run: Callable[[], Awaitable[Any]], policy: str = RESTART_ALWAYS, critical: bool = False,
+                 heartbeat: Optional[Callable[[], Optional[float]]] = None, heartbeat_timeout: float = 0.0):
+        self.name = name
+        self.run = run
+        self.policy = policy
+        # 关键模块彻底失败（超出重启次数）时全部交易对撤单停报
+        self.critical = critical
+        # heartbeat() 返回距该模块上次活动的秒数（None 表示尚未开始），超过 heartbeat_timeout 视为卡死并重启
+        self.heartbeat = heartbeat
+        self.heartbeat_timeout = heartbeat_timeout
+        self.status = "pending"
+        self.restarts: deque = deque()
+        self.total_restarts = 0
+        self.last_error: Optional[str] = None
+        self.attempt: Optional[asyncio.Task] = None
+        self.started = 0.0
+        self.restart_reason: Optional[str] = None
+
+class LoopWatchdog:
+    """
+    事件循环卡顿看门狗：
+    - 循环内协程每 interval 秒更新一次心跳，同时把实际唤醒延迟记入 pmm_event_loop_lag_seconds
+    - 独立线程检查心跳，超过 threshold 未更新即认为循环被阻塞（同步 REST 调用、文件刷盘等），
+      立即用 sys._current_frames() 抓取事件循环线程当前的调用栈并打印，循环恢复后记录阻塞时长与调用栈
+    """
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, logger=None):
+        self.interval = interval
+        self.threshold = threshold
+        self.logger = logger
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._captured: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                start = loop.time()
+                await asyncio.sleep(self.interval)
+                self._beat = time.monotonic()
+                lag = max(0.0, loop.time() - start - self.interval)
+                LOOP_LAG.observe(lag)
+                LOOP_LAG_LAST.set(lag)
+                if lag > self.threshold:
+                    self._on_stall(lag)
+        finally:
+            self._stop.set()
+
+    def _on_stall(self, lag: float):
+        self.stalls += 1
+        self.max_lag = max(self.max_lag, lag)
+        LOOP_STALLS.inc()
+        stack, self._captured = self._captured, None
+        print(f"[LoopWatchdog] 事件循环阻塞 {lag * 1000:.0f}ms")
+        if self.logger:
+            self.logger.log_event(
+                event_type="loop_stall",
+                details=f"事件循环阻塞 {lag * 1000:.0f}ms",
+                extra={"lag_ms": round(lag * 1000, 1), "stack": stack or ""},
+            )
+
+    def _watch(self):
+        """看门狗线程：心跳超时时抓取一次事件循环线程的调用栈（同一次阻塞只抓一次）"""
+        last_beat = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat
+            if blocked <= self.interval + self.threshold or beat == last_beat:
+                continue
+            last_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self._captured = stack
+            print(f"[LoopWatchdog] 事件循环已阻塞 {blocked * 1000:.0f}ms，当前调用栈:\n{stack}")
+
+    def stop(self):
+        self._stop.set()
 
 class RecoveryManager:
     """
-    容错与异常监控模块：
-    - 监控各核心模块运行状态，发现异常自动重启或恢复
-    - 结构清晰，便于扩展更多容错策略
+    容错与异常监控模块（进程级监管者）：
+    - 按重启策略运行各核心模块，异常或退出后指数退避（带抖动）重启；restart_window 秒内重启超过 max_restarts 次视为彻底失败
+    - 心跳探针：模块长时间无活动（卡死）时取消并重启
+    - 行情或风控失效保护：行情连接超过 market_stale_after 秒无数据、风控检查超过 risk_stale_after 秒未完成、
+      或关键模块彻底失败时，立即撤销该交易对全部挂单并设置 state.halt_reason，OrderManager 停止报价；恢复后自动清除
     """
-    def __init__(self, workers: dict, check_interval: int = 5):
+    def __init__(self, workers: Optional[dict] = None, check_interval: float = 5, backoff_initial: float = 1.0, backoff_max: float = 60.0,
+                 max_restarts: int = 10, restart_window: float = 300.0, logger=None):
         """
-        workers: dict，格式如 {"market": MarketDataWorker实例, ...}
+        workers: dict，格式如 {"market": MarketDataWorker实例, ...}（按 RESTART_ALWAYS 监管其 run()），也可之后用 add() 登记
         check_interval: 监控间隔秒数
         """
-        self.workers = workers
         self.check_interval = check_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.logger = logger
+        self.workers: Dict[str, WorkerSpec] = {}
         self._running = False
-        self._tasks = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._started = 0.0
+        # 失效保护
+        self.states: Dict[str, SharedState] = {}
+        self.rest = None
+        self.market_idle: Optional[Callable[[], Optional[float]]] = None
+        self.market_stale_after = 0.0
+        self.risk_stale_after = 0.0
+        for name, worker in (workers or {}).items():
+            self.add(name, worker.run)
+
+    def add(self, name: str, run: Callable[[], Awaitable[Any]], policy: str = RESTART_ALWAYS, critical: bool = False,
+            heartbeat: Optional[Callable[[], Optional[float]]] = None, heartbeat_timeout: float = 0.0) -> WorkerSpec:
+        spec = WorkerSpec(name, run, policy, critical, heartbeat, heartbeat_timeout)
+        self.workers[name] = spec
+        if self._running:
+            self._tasks[name] = asyncio.create_task(self._run_worker(spec))
+        return spec
+
+    def guard_quotes(self, states: Dict[str, SharedState], rest, market_idle: Optional[Callable[[], Optional[float]]] = None,
+                     market_stale_after: float = 0.0, risk_stale_after: float = 0.0):
+        """启用行情/风控失效保护；market_idle() 返回行情连接距上次收包的秒数（None 表示尚未收到数据）"""
+        self.states = states
+        self.rest = rest
+        self.market_idle = market_idle
+        self.market_stale_after = market_stale_after
+        self.risk_stale_after = risk_stale_after
 
     async def run(self):
-        """主循环：定时监控并恢复异常模块"""
+        """主循环：启动所有模块，定时做心跳检查与失效保护"""
         self._running = True
-        # 启动所有worker
-        for name, worker in self.workers.items():
-            self._tasks[name] = asyncio.create_task(self._run_worker(name, worker))
+        self._started = asyncio.get_running_loop().time()
+        for name, spec in self.workers.items():
+            self._tasks[name] = asyncio.create_task(self._run_worker(spec))
         while self._running:
             await asyncio.sleep(self.check_interval)
             self.monitor_modules()
+            if self.states:
+                await self.check_staleness()
 
-    async def _run_worker(self, name, worker):
-        """包装worker的run方法，捕获异常自动重启"""
+    def _backoff(self, spec: WorkerSpec) -> float:
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** max(0, len(spec.restarts) - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _run_worker(self, spec: WorkerSpec):
+        """按重启策略运行单个模块；每次运行是独立的子任务，卡死时只取消子任务"""
+        loop = asyncio.get_running_loop()
         while self._running:
+            spec.status = "running"
+            spec.restart_reason = None
+            spec.started = loop.time()
+            spec.attempt = asyncio.create_task(spec.run())
             try:
-                await worker.run()
+                await spec.attempt
+                reason = "exited"
+                if spec.policy != RESTART_ALWAYS:
+                    spec.status = "stopped"
+                    print(f"[RecoveryManager] {spec.name} 已退出")
+                    return
+                print(f"[RecoveryManager] {spec.name} 意外退出")
+            except asyncio.CancelledError:
+                # 自身被取消（进程退出）直接结束；仅子任务被取消说明是心跳超时触发的重启
+                if spec.restart_reason is None or not self._running:
+                    spec.attempt.cancel()
+                    spec.status = "stopped"
+                    raise
+                reason = spec.restart_reason
             except Exception as e:
-                print(f"[RecoveryManager] {name} 异常: {e}\n{traceback.format_exc()}")
-                print(f"[RecoveryManager] 尝试重启 {name} ...")
-                await asyncio.sleep(2)
-                # 自动重启
-                continue
-            break
+                reason = "error"
+                spec.last_error = f"{type(e).__name__}: {e}"
+                print(f"[RecoveryManager] {spec.name} 异常: {e}\n{traceback.format_exc()}")
+                if spec.policy == RESTART_NEVER:
+                    spec.status = "failed"
+                    return
+            if not self._running:
+                return
+            now = loop.time()
+            spec.restarts.append(now)
+            while spec.restarts and now - spec.restarts[0] > self.restart_window:
+                spec.restarts.popleft()
+            if len(spec.restarts) > self.max_restarts:
+                spec.status = "failed"
+                print(f"[RecoveryManager] {spec.name} 在 {self.restart_window:.0f}s 内重启超过 {self.max_restarts} 次，停止重启")
+                if self.logger:
+                    self.logger.log_event("worker_failed", f"{spec.name} 重启次数超限，停止重启", {"worker": spec.name, "error": spec.last_error})
+                return
+            spec.total_restarts += 1
+            WORKER_RESTARTS.labels(spec.name, reason).inc()
+            delay = self._backoff(spec)
+            spec.status = "backoff"
+            print(f"[RecoveryManager] {delay:.1f}s 后重启 {spec.name}（原因: {reason}，近期第 {len(spec.restarts)} 次）")
+            if self.logger:
+                self.logger.log_event("worker_restart", f"{spec.name} 重启（{reason}）", {"worker": spec.name, "reason": reason, "error": spec.last_error, "delay": round(delay, 2)})
+            await asyncio.sleep(delay)
 
     def monitor_modules(self):
-        """检查各模块状态（可扩展更复杂健康检查）"""
-        for name, task in self._tasks.items():
-            if task.done() and not task.cancelled():
-                print(f"[RecoveryManager] 检测到 {name} 已退出，尝试重启...")
-                # 这里可实现更复杂的重启逻辑
+        """心跳检查：运行中的模块超过 heartbeat_timeout 无活动时取消当前运行，由 _run_worker 按策略重启"""
+        now = asyncio.get_running_loop().time()
+        for spec in self.workers.values():
+            if spec.status != "running" or spec.heartbeat is None or spec.heartbeat_timeout <= 0:
+                continue
+            try:
+                idle = spec.heartbeat()
+            except Exception:
+                continue
+            # 心跳时间可能来自重启前的上一次运行，只按本次运行以来计算
+            if idle is not None:
+                idle = min(idle, now - spec.started)
+            if idle is not None and idle > spec.heartbeat_timeout and spec.attempt is not None and not spec.attempt.done():
+                print(f"[RecoveryManager] {spec.name} 已 {idle:.1f}s 无心跳，判定卡死，重启")
+                spec.restart_reason = "heartbeat"
+                spec.attempt.cancel()
+
+    def _halt_reason(self, state: SharedState, now: float) -> Optional[str]:
+        failed = [s.name for s in self.workers.values() if s.critical and s.status == "failed"]
+        if failed:
+            return f"worker_failed:{','.join(failed)}"
+        if state.mark_price <= 0:
+            # 尚未收到行情，OrderManager 也不会报价
+            return None
+        if self.market_idle is not None and self.market_stale_after > 0:
+            idle = self.market_idle()
+            if idle is not None and idle > self.market_stale_after:
+                return "market_stale"
+        if self.risk_stale_after > 0:
+            last = state.last_risk_check if state.last_risk_check is not None else self._started
+            if now - last > self.risk_stale_after:
+                return "risk_stale"
+        return None
+
+    async def check_staleness(self):
+        """逐个交易对判断行情/风控是否失效：失效时撤单停报，恢复后清除停报标记并唤醒 OrderManager 重新报价"""
+        now = asyncio.get_running_loop().time()
+        for symbol, state in self.states.items():
+            reason = self._halt_reason(state, now)
+            if reason == state.halt_reason:
+                continue
+            previous, state.halt_reason = state.halt_reason, reason
+            state.publish_order_update()
+            if reason is None:
+                QUOTES_HALTED.labels(symbol).set(0)
+                print(f"[RecoveryManager] {symbol} 已恢复（{previous}），重新报价")
+                if self.logger:
+                    self.logger.log_event("quotes_resumed", f"{previous} 已恢复，重新报价", {"reason": previous}, symbol)
+                continue
+            QUOTES_HALTED.labels(symbol).set(1)
+            print(f"[RecoveryManager] {symbol} 停止报价并撤单: {reason}")
+            if self.logger:
+                self.logger.log_event("quotes_halted", f"停止报价并撤单: {reason}", {"reason": reason}, symbol)
+            if previous is None and self.rest is not None:
+                try:
+                    with request_priority(PRIORITY_EMERGENCY):
+                        await self.rest.cancel_all_orders(symbol)
+                except Exception as e:
+                    print(f"[RecoveryManager] {symbol} 撤单失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {"status": s.status, "restarts": s.total_restarts, "last_error": s.last_error}
+            for name, s in self.workers.items()
+        }
 
     def stop(self):
         self._running = False
@@ -1,44 +1,64 @@
 import asyncio
 from decimal import Decimal
-from utils.http import BinanceRest
-from core.state import shared_state
-from utils.config_loader import get_config
+from utils.http import AsyncBinanceRest
+from core.liquidation import LiquidationEngine
+from core.state import SharedState, shared_state
+from utils.config_loader import ConfigService, ConfigSnapshot, get_config_service
+from utils.metrics import registry
+from utils.snapshot_cache import SnapshotCache
+
+RISK_CHECK_LATENCY = registry.histogram("pmm_risk_check_seconds", "单次风控检查耗时", ("symbol",))
 
 class RiskController:
     """
     风控模块：
-    - 定时检查当前持仓，若超出最大持仓限制，自动市价平仓并暂停策略
+    - 定时检查当前持仓，若超出最大持仓限制，撤单并平仓（LiquidationEngine）后暂停策略
     - 依赖 shared_state、配置参数和 REST API
     - 结构清晰，便于扩展更多风控规则
     """
-    def __init__(self, rest: BinanceRest, symbol: str, max_net_position: Decimal, logger=None, check_interval: int = 1):
+    def __init__(self, rest: AsyncBinanceRest, symbol: str, max_net_position: Decimal, logger=None, check_interval: int = 1, state: SharedState | None = None,
+                 snapshots: SnapshotCache | None = None, position_max_age: float = 0.0, liquidation: LiquidationEngine | None = None, config_service: ConfigService | None = None):
         self.rest = rest
+        self.config_service = config_service or get_config_service()
+        self.config_service.subscribe(self.apply_config)
+        # 定时检查经共享快照缓存读取持仓；平仓流程始终重新请求
+        self.snapshots = snapshots or SnapshotCache(rest)
+        self.position_max_age = position_max_age
+        self.state = state or shared_state
         self.symbol = symbol
         self.max_net_position = max_net_position
         self.check_interval = check_interval
         self._running = False
         self.logger = logger
+        self._check_latency = RISK_CHECK_LATENCY.labels(symbol)
+        # 紧急平仓：撤单与分片平仓并发执行
+        self.liquidation = liquidation or LiquidationEngine(rest, symbol, state=self.state, snapshots=self.snapshots, logger=logger)
+
+    def apply_config(self, old: ConfigSnapshot, new: ConfigSnapshot):
+        """配置热更新：检查间隔即时生效（持仓上限每次检查时从配置读取）"""
+        self.check_interval = new.risk_check_interval
 
     async def run(self):
         """主循环：定时检查持仓并风控"""
         self._running = True
         while self._running:
             try:
-                await self.check_and_risk_control()
+                with self._check_latency.time():
+                    await self.check_and_risk_control()
+                # 供监管模块判断风控是否仍在正常运行
+                self.state.last_risk_check = asyncio.get_running_loop().time()
             except Exception as e:
                 print(f"[RiskController] 风控检查异常: {e}")
             await asyncio.sleep(self.check_interval)
 
     async def check_and_risk_control(self):
         """检查持仓，超限则平仓并暂停策略"""
-        from utils.config_loader import get_config
-        config = get_config()
-        initial_capital = Decimal(str(config.yaml.get("initial_capital", 200)))
-        max_net_position_ratio = Decimal(str(config.yaml.get("max_net_position_ratio", 0.5)))
-        mark_price = Decimal(str(shared_state.mark_price or 1))
+        config = self.config_service.snapshot.symbol_config(self.symbol)
+        # 行情到达前用检查点恢复的中间价估算
+        mark_price = Decimal(str(self.state.mark_price or self.state.last_known_mid or 1))
         # 正确币本位最大持仓（不做整数量化）
-        max_net_position = (initial_capital * max_net_position_ratio) / mark_price
-        position = self.get_position()
+        max_net_position = config.max_net_notional / mark_price
+        position = await self.get_position()
         print(f"[RiskController] 当前持仓: {position}, 最大允许: {max_net_position}")
         if abs(position) > max_net_position:
             print("[RiskController] 持仓超限，执行市价平仓并暂停策略！")
@@ -46,78 +66,76 @@ class RiskController:
                 self.logger.log_event(
                     event_type="risk_limit_exceeded",
                     details="持仓超限，触发风控",
-                    extra={"position": float(position), "max_net_position": float(max_net_position)}
+                    extra={"position": float(position), "max_net_position": float(max_net_position)},
+                    symbol=self.symbol,
                 )
-            self.close_position()
-            shared_state.strategy_paused = True
+            await self.close_position()
+            self.state.strategy_paused = True
 
-    def get_position(self) -> Decimal:
-        """查询当前净持仓，优先用REST接口，异常时fallback到shared_state"""
+    async def get_position(self, max_age: float | None = None) -> Decimal:
+        """
+        查询当前净持仓：用户数据流可用时直接读 shared_state，否则走REST（max_age 秒内的缓存快照可复用，默认取 position_max_age），
+        异常时fallback到shared_state
+        """
+        if self.state.user_stream_live:
+            return Decimal(str(self.state.position))
         try:
-            pos_info = self.rest.get_position_info(self.symbol)
+            pos_info = await self.snapshots.get_position_info(self.symbol, self.position_max_age if max_age is None else max_age)
             position_amt = Decimal(str(pos_info.get("positionAmt", "0")))
             return position_amt
         except Exception as e:
             print(f"[RiskController] 获取真实持仓失败，使用本地状态: {e}")
-            return Decimal(str(shared_state.position))
+            return Decimal(str(self.state.position))
 
-    def close_position(self):
-        """真实市价平仓，失败自动重试，最多5次，未归零则暂停策略"""
-        position = self.get_position()
-        if position == 0:
+    async def close_position(self, cancel_orders: bool = True):
+        """撤单并平仓（由 LiquidationEngine 并发撤单、分片只减仓平仓并按回报确认成交），未归零则暂停策略"""
+        try:
+            result = await self.liquidation.flatten(cancel_orders)
+        except Exception as e:
+            print(f"[RiskController] 平仓异常: {e}")
+            self.state.strategy_paused = True
+            if self.logger:
+                self.logger.log_event(
+                    event_type="risk_error",
+                    details=f"平仓异常: {e}",
+                    extra={},
+                    symbol=self.symbol,
+                )
+            return
+        if result.initial == 0:
             print("[RiskController] 当前无持仓，无需平仓。")
             if self.logger:
                 self.logger.log_event(
                     event_type="no_position",
                     details="当前无持仓，无需平仓。",
-                    extra={}
+                    extra={},
+                    symbol=self.symbol,
                 )
             return
-        side = "SELL" if position > 0 else "BUY"
-        qty = abs(position)
-        max_retry = 5
-        for attempt in range(1, max_retry + 1):
-            print(f"[RiskController] 第{attempt}次市价{side}平仓，数量: {qty}")
-            try:
-                self.rest.place_order(self.symbol, side=side, quantity=qty, order_type="MARKET")
-                import time
-                time.sleep(1)
-                new_position = self.get_position()
-                if abs(new_position) < 1e-8:
-                    shared_state.position = 0
-                    print(f"[RiskController] 平仓成功，真实仓位已归零。共尝试{attempt}次。")
-                    if self.logger:
-                        self.logger.log_event(
-                            event_type="forced_liquidation",
-                            details=f"市价{side}平仓成功，数量: {qty}，共尝试{attempt}次",
-                            extra={"side": side, "qty": float(qty), "attempt": attempt}
-                        )
-                    return
-                else:
-                    print(f"[RiskController] 平仓后真实仓位未归零，当前: {new_position}")
-                    if self.logger:
-                        self.logger.log_event(
-                            event_type="liquidation_retry",
-                            details=f"第{attempt}次平仓后仓位未归零，当前: {new_position}",
-                            extra={"side": side, "qty": float(qty), "remain_position": float(new_position), "attempt": attempt}
-                        )
-            except Exception as e:
-                print(f"[RiskController] 平仓异常: {e}")
-                if self.logger:
-                    self.logger.log_event(
-                        event_type="risk_error",
-                        details=f"第{attempt}次平仓异常: {e}",
-                        extra={"side": side, "qty": float(qty), "attempt": attempt}
-                    )
-        # 多次重试后仍未归零
+        side = "SELL" if result.initial > 0 else "BUY"
+        extra = {"side": side, "qty": float(abs(result.initial)), "rounds": result.rounds, "orders": result.orders, "elapsed_ms": round(result.elapsed * 1000, 1)}
+        if result.flat:
+            self.state.position = 0
+            print(f"[RiskController] 平仓成功，真实仓位已归零。共 {result.rounds} 轮 {result.orders} 笔子订单，耗时 {result.elapsed * 1000:.0f}ms。")
+            if self.logger:
+                self.logger.log_event(
+                    event_type="forced_liquidation",
+                    details=f"{side}平仓成功，数量: {abs(result.initial)}，共 {result.rounds} 轮",
+                    extra=extra,
+                    symbol=self.symbol,
+                )
+            return
+        # 多轮平仓后仍未归零
         print(f"[RiskController] 多次平仓失败，真实仓位仍未归零，暂停策略！")
-        shared_state.strategy_paused = True
+        self.state.strategy_paused = True
         if self.logger:
             self.logger.log_event(
                 event_type="liquidation_failed",
-                details=f"多次平仓失败，真实仓位仍未归零，暂停策略！最后仓位: {new_position}",
-                extra={"side": side, "qty": float(qty), "remain_position": float(new_position), "attempt": max_retry}
+                details=f"多次平仓失败，真实仓位仍未归零，暂停策略！最后仓位: {result.remaining}",
+                extra={**extra, "remain_position": float(result.remaining)},
+                symbol=self.symbol,
             )
 
     def stop(self):
         self._running = False
+        self.config_service.unsubscribe(self.apply_config)
@@ -1,22 +1,41 @@
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Any, Dict, List, Optional
+import asyncio
 import threading
 
 @dataclass
 class SharedState:
     """
-    全局共享状态结构，供各模块异步读写。
+    共享状态结构，供各模块异步读写（每个交易对一份，由 StateRegistry 管理）。
     字段可根据业务需求扩展。
     """
+    symbol: str = ""                  # 所属交易对
     mark_price: float = 0.0           # 最新中间价
     position: float = 0.0             # 当前净持仓（张/币）
     strategy_paused: bool = False     # 策略是否暂停
     last_order_time: Optional[float] = None  # 上次挂单时间戳
     last_risk_check: Optional[float] = None  # 上次风控检查时间戳
-    # 可扩展更多字段，如订单列表、账户余额等
+    mid_seq: int = 0                  # 中间价更新序号，每次变动+1
+    mid_update_time: Optional[float] = None  # 最近一次中间价变动时间（事件循环时钟）
+    last_tick: Optional[tuple] = None  # 最近一次改变中间价的行情时刻 (事件时间E, 收包, 解码完成, 写入完成)，仅启用延迟追踪时维护
+    halt_reason: Optional[str] = None  # 监管模块判定行情/风控失效时的停报原因，非空时 OrderManager 撤单并停止报价
+    last_known_mid: float = 0.0       # 从运行检查点恢复的上次中间价，收到行情前用于估算仓位上限
+    quote_book: Optional[Any] = None  # 本策略在途挂单簿（WorkingOrderBook），由 OrderManager 设置，供运行检查点读取
+    # 以下字段由用户数据流（UserDataStreamWorker）实时维护
+    user_stream_live: bool = False    # 用户数据流已连接且完成初始对账，持仓/挂单可直接使用
+    entry_price: float = 0.0          # 持仓均价
+    unrealized_pnl: float = 0.0       # 未实现盈亏（最近一次账户推送）
+    realized_pnl: float = 0.0         # 本进程启动以来累计已实现盈亏（成交推送累加）
+    position_update_time: Optional[float] = None  # 最近一次持仓更新时间（事件循环时钟）
+    balances: Dict[str, dict] = field(default_factory=dict)     # 资产 -> {"wallet_balance", "cross_wallet_balance"}（账户级，注册表内各交易对共享同一字典）
+    open_orders: Dict[int, dict] = field(default_factory=dict)  # orderId -> 交易所订单字段（与 openOrders 接口同名）
+    order_seq: int = 0                # 订单/成交更新序号，每次成交或订单状态变化+1
+    order_book: Optional[Any] = None  # 本地 L2 订单簿（LocalOrderBook），启用 depth 时由行情模块设置
 
     # 线程锁，保证多线程/协程安全（如需）
     _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    # 中间价/订单变动通知：每次发布时 set 当前事件并换一个新事件，所有等待者都会被唤醒
+    _mid_event: Optional[asyncio.Event] = field(default=None, init=False, repr=False)
 
     def safe_update(self, **kwargs):
         """线程安全地批量更新状态字段"""
@@ -24,5 +43,78 @@ class SharedState:
             for k, v in kwargs.items():
                 setattr(self, k, v)
 
-# 单例实例，供全局 import 使用
+    def publish_mid(self, mid: float):
+        """写入新的中间价并唤醒所有等待价格变动的协程（需在事件循环内调用）"""
+        if mid == self.mark_price:
+            return
+        with self._lock:
+            self.mark_price = mid
+            self.mid_seq += 1
+            self.mid_update_time = asyncio.get_running_loop().time()
+        self._notify()
+
+    def publish_order_update(self):
+        """订单状态或持仓发生变化（如成交），唤醒等待中的挂单协程"""
+        with self._lock:
+            self.order_seq += 1
+        self._notify()
+
+    def _notify(self):
+        with self._lock:
+            event, self._mid_event = self._mid_event, None
+        if event is not None:
+            event.set()
+
+    async def wait_mid_update(self, last_seq: int, timeout: Optional[float] = None) -> int:
+        """等待中间价序号超过 last_seq（订单更新也会提前唤醒），超时也返回；返回当前序号"""
+        if self.mid_seq == last_seq:
+            if self._mid_event is None:
+                self._mid_event = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._mid_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.mid_seq
+
+class StateRegistry:
+    """
+    按交易对索引的共享状态注册表：
+    - 多币种模式下每个交易对一份独立的 SharedState，互不干扰
+    - 账户级的余额字典在各交易对之间共享
+    """
+    def __init__(self):
+        self._states: Dict[str, SharedState] = {}
+        self.balances: Dict[str, dict] = {}
+
+    def get(self, symbol: str) -> SharedState:
+        """获取交易对状态，不存在时创建"""
+        state = self._states.get(symbol)
+        if state is None:
+            state = SharedState(symbol=symbol)
+            state.balances = self.balances
+            self._states[symbol] = state
+        return state
+
+    def register(self, symbol: str, state: SharedState) -> SharedState:
+        """将已有状态对象登记到注册表（如单交易对模式复用 shared_state）"""
+        state.symbol = symbol
+        state.balances = self.balances
+        self._states[symbol] = state
+        return state
+
+    def symbols(self) -> List[str]:
+        return list(self._states)
+
+    def items(self):
+        return self._states.items()
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._states
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+# 单交易对兼容入口：未显式传入 state 的模块默认使用它
 shared_state = SharedState()
+# 交易对状态注册表，供多币种模式使用
+state_registry = StateRegistry()
@@ -0,0 +1,227 @@
+import asyncio
+from decimal import Decimal
+from utils.ws import BinanceUserDataWebSocket
+from typing import Dict, List, Union
+from core.state import SharedState, StateRegistry, shared_state
+from utils.rate_limit import request_priority, PRIORITY_METRICS
+
+# 订单终态：收到后从本地挂单表移除
+FINAL_ORDER_STATUSES = {"FILLED", "CANCELED", "EXPIRED", "REJECTED", "EXPIRED_IN_MATCH"}
+
+class UserDataStreamWorker:
+    """
+    用户数据流模块：
+    - 负责 listenKey 的创建、定时续期，失效或断线后自动重建
+    - 消费 ORDER_TRADE_UPDATE / ACCOUNT_UPDATE，实时维护各交易对 state 中的持仓、余额、挂单
+    - 用户数据流为账户级，一条连接覆盖所有做市交易对
+    - REST 仅用于连接建立后的初始对账与低频兜底对账
+    - 流可用期间 state.user_stream_live=True，其他模块据此跳过 REST 轮询
+    """
+    def __init__(self, rest, symbol: Union[str, List[str]], env: str = "testnet", keepalive_interval: int = 1800, reconcile_interval: int = 300, logger=None, registry: StateRegistry | None = None, ws_factory=BinanceUserDataWebSocket):
+        self.rest = rest
+        symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        self.symbol = symbols[0]
+        # 未传注册表时（单交易对模式）沿用全局 shared_state
+        self.states: Dict[str, SharedState] = {s: registry.get(s) if registry is not None else shared_state for s in symbols}
+        self.env = env
+        self.keepalive_interval = keepalive_interval
+        self.reconcile_interval = reconcile_interval
+        self.logger = logger
+        # ws_factory(listen_key, env) 可替换为其他实现（如回测中的模拟用户数据流）
+        self.ws_factory = ws_factory
+        self.listen_key = None
+        self.ws = None
+        self._running = False
+
+    async def run(self):
+        """主循环：建立用户数据流，断线后退避重连"""
+        self._running = True
+        backoff = 1
+        while self._running:
+            try:
+                await self._run_stream()
+                backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[UserDataStream] 用户数据流异常: {e}，{backoff}s 后重连")
+            finally:
+                self._set_live(False)
+                if self.ws:
+                    await self.ws.close()
+            if self._running:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    async def _run_stream(self):
+        self.listen_key = await self.rest.create_listen_key()
+        self.ws = self.ws_factory(self.listen_key, self.env)
+        await self.ws.connect()
+        print(f"[UserDataStream] 已连接用户数据流 {self.env}")
+        # 先连接再对账：对账期间的推送会排队，不会丢失
+        await self.reconcile()
+        self._set_live(True)
+        background = [
+            asyncio.create_task(self._keepalive_loop()),
+            asyncio.create_task(self._reconcile_loop()),
+        ]
+        try:
+            async for event in self.ws.listen():
+                if self.handle_event(event) == "expired":
+                    print("[UserDataStream] listenKey 已过期，重建用户数据流")
+                    return
+        finally:
+            for task in background:
+                task.cancel()
+
+    async def _keepalive_loop(self):
+        """定时续期 listenKey，失败时关闭连接触发重建"""
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await self.rest.keepalive_listen_key()
+            except Exception as e:
+                print(f"[UserDataStream] listenKey 续期失败，重建连接: {e}")
+                await self.ws.close()
+                return
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                # 流正常时兜底对账可延后，预算紧张时允许被丢弃
+                with request_priority(PRIORITY_METRICS):
+                    await self.reconcile()
+            except Exception as e:
+                print(f"[UserDataStream] 兜底对账失败: {e}")
+
+    def _set_live(self, live: bool):
+        for state in self.states.values():
+            state.user_stream_live = live
+
+    async def reconcile(self):
+        """用 REST 快照校正各交易对 state 中的持仓与挂单（多交易对时各用一次全量查询）"""
+        if len(self.states) == 1:
+            pos_info, open_orders = await asyncio.gather(
+                self.rest.get_position_info(self.symbol),
+                self.rest.get_open_orders(self.symbol),
+            )
+            positions = [pos_info]
+        else:
+            positions, open_orders = await asyncio.gather(
+                self.rest.get_all_positions(),
+                self.rest.get_open_orders(),
+            )
+        loop = asyncio.get_running_loop()
+        orders_by_symbol: Dict[str, dict] = {s: {} for s in self.states}
+        for o in open_orders:
+            if o.get("symbol") in orders_by_symbol:
+                orders_by_symbol[o["symbol"]][o["orderId"]] = o
+        for pos_info in positions:
+            state = self.states.get(pos_info.get("symbol"))
+            # 单向持仓模式下 positionSide=BOTH
+            if state is None or pos_info.get("positionSide", "BOTH") != "BOTH":
+                continue
+            position = float(pos_info.get("positionAmt", "0"))
+            if state.user_stream_live and position != state.position:
+                print(f"[UserDataStream] {state.symbol} 对账修正持仓: {state.position} -> {position}")
+            state.safe_update(
+                position=position,
+                entry_price=float(pos_info.get("entryPrice", "0")),
+                unrealized_pnl=float(pos_info.get("unRealizedProfit", "0")),
+                position_update_time=loop.time(),
+            )
+        for symbol, state in self.states.items():
+            state.safe_update(open_orders=orders_by_symbol[symbol])
+            state.publish_order_update()
+
+    def handle_event(self, event: dict):
+        """分发用户数据事件；返回 "expired" 表示需要重建 listenKey"""
+        event_type = event.get("e")
+        try:
+            if event_type == "ORDER_TRADE_UPDATE":
+                self.handle_order_update(event["o"])
+            elif event_type == "ACCOUNT_UPDATE":
+                self.handle_account_update(event["a"])
+            elif event_type == "listenKeyExpired":
+                return "expired"
+        except Exception as e:
+            print(f"[UserDataStream] 事件处理异常: {e}, event={event}")
+        return None
+
+    def handle_order_update(self, o: dict):
+        """ORDER_TRADE_UPDATE：维护挂单表，成交时累加已实现盈亏"""
+        state = self.states.get(o.get("s"))
+        if state is None:
+            return
+        order_id = o["i"]
+        status = o.get("X")
+        if status in FINAL_ORDER_STATUSES:
+            state.open_orders.pop(order_id, None)
+        else:
+            # 字段名与 openOrders 接口保持一致，便于复用同一套对账逻辑
+            state.open_orders[order_id] = {
+                "orderId": order_id,
+                "clientOrderId": o.get("c"),
+                "symbol": o.get("s"),
+                "side": o.get("S"),
+                "type": o.get("o"),
+                "status": status,
+                "price": o.get("p"),
+                "origQty": o.get("q"),
+                "executedQty": o.get("z"),
+            }
+        if self.logger:
+            self.logger.record_order_update(o)
+        if o.get("x") == "TRADE":
+            realized = float(o.get("rp", "0"))
+            state.realized_pnl += realized
+            print(f"[UserDataStream] {state.symbol} 成交: {o.get('S')} {o.get('l')}@{o.get('L')} 状态={status} 已实现盈亏={realized}")
+            if self.logger:
+                self.logger.log_event(
+                    event_type="fill",
+                    details=f"{o.get('S')} {o.get('l')}@{o.get('L')}",
+                    extra={"order_id": order_id, "client_order_id": o.get("c"), "status": status, "realized_pnl": realized},
+                    symbol=state.symbol,
+                )
+        state.publish_order_update()
+
+    def handle_account_update(self, a: dict):
+        """ACCOUNT_UPDATE：更新余额与本交易对持仓"""
+        # 余额为账户级，注册表内各交易对共享同一字典
+        balances = next(iter(self.states.values())).balances
+        for b in a.get("B", []):
+            balances[b["a"]] = {
+                "wallet_balance": Decimal(b.get("wb", "0")),
+                "cross_wallet_balance": Decimal(b.get("cw", "0")),
+            }
+        touched = []
+        for p in a.get("P", []):
+            state = self.states.get(p.get("s"))
+            # 单向持仓模式下 ps=BOTH
+            if state is None or p.get("ps", "BOTH") != "BOTH":
+                continue
+            touched.append(state)
+            state.safe_update(
+                position=float(p.get("pa", "0")),
+                entry_price=float(p.get("ep", "0")),
+                unrealized_pnl=float(p.get("up", "0")),
+                position_update_time=asyncio.get_running_loop().time(),
+            )
+        for state in touched:
+            state.publish_order_update()
+
+    def stop(self):
+        self._running = False
+        self._set_live(False)
+
+    async def close(self):
+        """关闭连接并注销 listenKey"""
+        self.stop()
+        if self.ws:
+            await self.ws.close()
+        if self.listen_key:
+            try:
+                await self.rest.close_listen_key()
+            except Exception as e:
+                print(f"[UserDataStream] 关闭 listenKey 失败: {e}")
@@ -1,64 +1,198 @@
 import asyncio
+import functools
 import signal
-from utils.config_loader import get_config
-from utils.http import BinanceRest
+from utils.config_loader import get_config_service
+from utils.decode import get_decoder
+from utils.http import AsyncBinanceRest
+from utils.metrics import MetricsServer, registry as metrics_registry
+from utils.metrics_store import MetricsStore
+from utils.recorder import MarketDataRecorder
+from utils.snapshot_cache import SnapshotCache
+from utils.symbol_rules import SymbolRulesCache
+from utils.tracing import tracer
+from utils.ws import BinanceUserDataWebSocket, ResilientMarketStream
+from core.checkpoint import Checkpointer
+from core.liquidation import LiquidationEngine
 from core.market import MarketDataWorker
 from core.order import OrderManager
-from core.state import shared_state
+from core.state import shared_state, state_registry
 from decimal import Decimal
 from core.risk import RiskController
 from core.logger import LoggerWorker
 from core.position_monitor import PositionMonitorWorker
+from core.recovery import LoopWatchdog, RecoveryManager, stream_idle
+from core.user_stream import UserDataStreamWorker
 
 async def main():
-    config = get_config()
-    api_key = config.env.get("BINANCE_API_KEY") or ""
-    secret_key = config.env.get("BINANCE_SECRET_KEY") or ""
-    env = config.env.get("EXCHANGE_ENV", "testnet")
-    symbol = config.get("symbol", "BTCUSDT")
-    order_cfg = config.yaml.get("order_config", {})
-    levels = int(order_cfg.get("levels", 3))
-    qty_per_order_usdt = Decimal(str(order_cfg.get("quantity_per_order_usdt", 10)))
-    price_offset_percent = Decimal(str(order_cfg.get("price_offset_percent", 0.25)))
-    refresh_interval = int(config.yaml.get("refresh_config", {}).get("orderbook_refresh_interval", 5))
-    # 风控参数
-    max_net_position_ratio = Decimal(str(config.yaml.get("max_net_position_ratio", 0.5)))
-    initial_capital = Decimal(str(config.yaml.get("initial_capital", 200)))
-    # 启动行情订阅
-    market_worker = MarketDataWorker(symbol, env)
-    # 启动挂单管理（数量按最新中间价动态计算）
-    rest = BinanceRest(api_key, secret_key, env)
+    config_service = get_config_service()
+    cfg = config_service.snapshot
+    symbols = cfg.symbol_names
+    env = cfg.exchange_env
+    # 每个交易对一份独立状态；首个交易对复用全局 shared_state，保持单交易对模式行为不变
+    state_registry.register(symbols[0], shared_state)
+    for symbol in symbols:
+        state_registry.get(symbol)
+    # 挂单链路延迟追踪需在各模块启动前开启（行情模块在 run() 开始时决定是否记录行情时刻）
+    if cfg.trace_enabled:
+        tracer.configure(True, cfg.trace_capacity, cfg.trace_directory, cfg.trace_dump_interval)
+        print(f"[Main] 挂单链路延迟追踪已启用，记录导出到 {cfg.trace_directory}")
+    # 所有交易对共用一个 REST 客户端（连接池与权重预算全局共享）
+    rest = AsyncBinanceRest(
+        cfg.api_key, cfg.secret_key, env, timeout=cfg.request_timeout, pool_size=cfg.pool_size,
+        max_inflight=cfg.max_inflight_requests, weight_limit=cfg.weight_limit_per_minute,
+    )
+    # 账户/持仓查询共用一份快照缓存：各模块按自己的数据年龄要求复用，同时发起的相同查询只请求一次
+    snapshots = SnapshotCache(rest)
+    # 行情录制：在 WebSocket 收包处旁路落盘
+    recorder = None
+    if cfg.recorder_enabled:
+        recorder = MarketDataRecorder(cfg.recorder_directory, compress=cfg.recorder_compress, flush_interval=cfg.recorder_flush_interval)
+        print(f"[Main] 行情录制已启用，目录: {cfg.recorder_directory}")
+    market_decoder = get_decoder("market", cfg.json_decoder)
+    print(f"[Main] WebSocket 解码器: {market_decoder.name}")
+    # 行情连接管理：断线/假死自动重连并重新订阅，到期前轮换连接；connections >= 2 时多连接竞速去重
+    ws_factory = functools.partial(
+        ResilientMarketStream, recorder=recorder, decoder=market_decoder, skip_unchanged_ticker=cfg.skip_unchanged_ticker,
+        connections=cfg.ws_connections, stale_timeout=cfg.ws_stale_timeout, max_age=cfg.ws_rollover_hours * 3600,
+        backoff_max=cfg.ws_reconnect_backoff_max,
+    )
+    # 启动行情订阅：所有交易对复用同一组连接（启用 depth 时用 REST 快照初始化本地订单簿）
+    market_worker = MarketDataWorker(
+        symbols, env, rest=rest, depth_enabled=cfg.depth_enabled, depth_snapshot_limit=cfg.depth_snapshot_limit,
+        registry=state_registry, ws_factory=ws_factory,
+    )
+    # 交易对规则缓存：启动时加载一次（优先磁盘缓存），之后按 TTL 刷新
+    rules_cache = SymbolRulesCache(rest, ttl=cfg.exchange_info_ttl, cache_path=cfg.exchange_info_cache_path)
+    # 运行检查点：恢复交易规则、上次中间价、持仓与暂停标记，挂单由 OrderManager 接管而不是全部撤销
+    checkpoint = None
+    warm_start = False
+    if cfg.checkpoint_enabled:
+        checkpoint = Checkpointer(cfg.checkpoint_path, registry=state_registry, rules_cache=rules_cache, interval=cfg.checkpoint_interval, max_age=cfg.checkpoint_max_age)
+        warm_start = checkpoint.load()
+    await rules_cache.load()
+    if warm_start:
+        try:
+            await checkpoint.reconcile(snapshots)
+        except Exception as e:
+            print(f"[Main] 热启动持仓对账失败，沿用检查点持仓: {e}")
     # 启动日志采集
-    logging_cfg = config.yaml.get("logging", {})
-    log_dir = logging_cfg.get("log_directory", "./logs")
-    log_to_csv = logging_cfg.get("log_to_csv", True)
-    log_level = logging_cfg.get("log_level", "info")
     instance_id = "mvp_v1"
-    logger_worker = LoggerWorker(rest, log_dir, log_to_csv, log_level, symbol, instance_id, env)
-    # 计算最大持仓
-    mark_price = Decimal(str(shared_state.mark_price or 1))
-    max_net_position = (initial_capital * max_net_position_ratio / mark_price).quantize(Decimal('1'))
-    risk_controller = RiskController(rest, symbol, max_net_position, logger=logger_worker)
+    metrics_store = MetricsStore(cfg.log_metrics_db, max_queue=cfg.log_queue_size, flush_interval=cfg.log_flush_interval) if cfg.log_metrics_db else None
+    logger_worker = LoggerWorker(
+        rest, cfg.log_directory, cfg.log_to_csv, cfg.log_level, symbols, instance_id, env, registry=state_registry,
+        queue_size=cfg.log_queue_size, flush_interval=cfg.log_flush_interval, store=metrics_store,
+        snapshots=snapshots, account_max_age=cfg.snapshot_metrics_max_age, config_service=config_service,
+    )
+    # 各交易对风控与仓位监控
+    risk_controllers = {}
+    position_monitors = {}
+    for symbol in symbols:
+        state = state_registry.get(symbol)
+        # 计算最大持仓（行情到达前用检查点恢复的中间价，风控检查时按最新中间价重新计算）
+        mark_price = Decimal(str(state.mark_price or state.last_known_mid or 1))
+        max_net_position = (cfg.symbol_config(symbol).max_net_notional / mark_price).quantize(Decimal('1'))
+        # 紧急平仓引擎：风控超限与退出清理共用
+        liquidation = LiquidationEngine(
+            rest, symbol, state=state, snapshots=snapshots, rules_cache=rules_cache, logger=logger_worker,
+            max_slice_notional=cfg.liquidation_max_slice_notional, depth_participation=cfg.liquidation_depth_participation,
+            slippage_bps=cfg.liquidation_slippage_bps, max_slices=cfg.liquidation_max_slices, max_rounds=cfg.liquidation_max_rounds,
+            confirm_timeout=cfg.liquidation_confirm_timeout,
+        )
+        risk_controllers[symbol] = RiskController(
+            rest, symbol, max_net_position, logger=logger_worker, check_interval=cfg.risk_check_interval, state=state,
+            snapshots=snapshots, position_max_age=cfg.snapshot_risk_max_age, liquidation=liquidation, config_service=config_service,
+        )
+        position_monitors[symbol] = PositionMonitorWorker(rest, symbol, interval=10, state=state, snapshots=snapshots, max_age=cfg.snapshot_monitor_max_age)
 
-    async def order_manager_wrapper():
+    async def order_manager_wrapper(symbol: str):
+        state = state_registry.get(symbol)
         # 等待有效中间价
-        while shared_state.mark_price <= 0:
-            print("[Main] 等待行情模块推送有效中间价...")
-            await asyncio.sleep(1)
+        while state.mark_price <= 0:
+            print(f"[Main] 等待行情模块推送 {symbol} 有效中间价...")
+            await state.wait_mid_update(state.mid_seq, timeout=1)
         # 动态计算下单数量（按USDT金额/最新中间价）
-        qty_per_order = (qty_per_order_usdt / Decimal(str(shared_state.mark_price))).quantize(Decimal('0.001'))
-        manager = OrderManager(rest, symbol, levels, qty_per_order, price_offset_percent, refresh_interval)
+        cfg = config_service.snapshot
+        sc = cfg.symbol_config(symbol)
+        qty_per_order = (sc.quantity_per_order_usdt / Decimal(str(state.mark_price))).quantize(Decimal('0.001'))
+        manager = OrderManager(
+            rest, symbol, sc.levels, qty_per_order, sc.price_offset_percent, cfg.orderbook_refresh_interval, cfg.open_orders_sync_every,
+            requote_ticks=sc.requote_ticks, requote_bps=sc.requote_bps, debounce_ms=cfg.debounce_ms,
+            rules_cache=rules_cache, config_service=config_service, state=state,
+            snapshots=snapshots, position_max_age=cfg.snapshot_order_max_age,
+            adopt_orders=checkpoint is not None, known_orders=checkpoint.orders_for(symbol) if checkpoint is not None else None,
+        )
         await manager.run()
 
-    position_monitor = PositionMonitorWorker(rest, symbol, interval=10)
+    # 用户数据流：账户级一条连接，实时维护各交易对持仓/余额/挂单，REST 仅做兜底对账
+    user_stream = UserDataStreamWorker(
+        rest, symbols, env,
+        keepalive_interval=cfg.listen_key_refresh_interval,
+        reconcile_interval=cfg.user_stream_reconcile_interval,
+        logger=logger_worker,
+        registry=state_registry,
+        ws_factory=functools.partial(BinanceUserDataWebSocket, decoder=get_decoder("user", cfg.json_decoder)),
+    )
+
+    # 运行指标端点：队列深度等已有统计在抓取时读取，不增加热路径开销
+    metrics_server = None
+    if cfg.metrics_enabled:
+        queue_depth = metrics_registry.gauge("pmm_queue_depth", "各内部队列当前深度", ("queue",))
+        queue_depth.labels("rest_scheduler").set_function(lambda: rest.scheduler.stats()["queued"])
+        queue_depth.labels("log_metrics").set_function(lambda: logger_worker.stats().get("metrics", {}).get("queue_depth", 0))
+        queue_depth.labels("log_events").set_function(lambda: logger_worker.stats().get("events", {}).get("queue_depth", 0))
+        if metrics_store is not None:
+            queue_depth.labels("metrics_store").set_function(lambda: metrics_store.stats()["queue_depth"])
+        rest_gauge = metrics_registry.gauge("pmm_rest_scheduler", "REST 调度器状态（已用权重、在途请求数）", ("field",))
+        rest_gauge.labels("used_weight").set_function(lambda: rest.scheduler.used_weight)
+        rest_gauge.labels("inflight").set_function(lambda: rest.scheduler.inflight)
+        log_dropped = metrics_registry.gauge("pmm_log_dropped_rows", "日志写入队列满时丢弃的累计行数", ("queue",))
+        log_dropped.labels("log_metrics").set_function(lambda: logger_worker.stats().get("metrics", {}).get("dropped", 0))
+        log_dropped.labels("log_events").set_function(lambda: logger_worker.stats().get("events", {}).get("dropped", 0))
+        metrics_server = MetricsServer(metrics_registry, cfg.metrics_host, cfg.metrics_port)
+        await metrics_server.start()
+
+    def market_idle():
+        return stream_idle(market_worker.ws)
 
+    def state_idle(state, field: str):
+        last = getattr(state, field)
+        return asyncio.get_running_loop().time() - last if last is not None else None
+
+    # 进程级监管：各模块按重启策略运行，异常退出或卡死后退避重启；行情或风控失效时撤单停报
+    supervisor = RecoveryManager(
+        check_interval=cfg.supervisor_check_interval, backoff_initial=cfg.supervisor_backoff_initial, backoff_max=cfg.supervisor_backoff_max,
+        max_restarts=cfg.supervisor_max_restarts, restart_window=cfg.supervisor_restart_window, logger=logger_worker,
+    )
+    heartbeat_timeout = cfg.supervisor_heartbeat_timeout
+    supervisor.add("config", config_service.watch)
+    supervisor.add("market", market_worker.run, critical=True, heartbeat=market_idle, heartbeat_timeout=heartbeat_timeout)
+    supervisor.add("user_stream", user_stream.run)
+    supervisor.add("logger", logger_worker.run)
+    if checkpoint is not None:
+        supervisor.add("checkpoint", checkpoint.run)
+    for symbol in symbols:
+        state = state_registry.get(symbol)
+        supervisor.add(
+            f"order:{symbol}", functools.partial(order_manager_wrapper, symbol),
+            heartbeat=functools.partial(state_idle, state, "last_order_time"), heartbeat_timeout=heartbeat_timeout,
+        )
+        supervisor.add(f"position:{symbol}", position_monitors[symbol].run)
+        supervisor.add(
+            f"risk:{symbol}", risk_controllers[symbol].run, critical=True,
+            heartbeat=functools.partial(state_idle, state, "last_risk_check"), heartbeat_timeout=heartbeat_timeout,
+        )
+    supervisor.guard_quotes(
+        dict(state_registry.items()), rest, market_idle=market_idle,
+        market_stale_after=cfg.supervisor_market_stale_after, risk_stale_after=cfg.supervisor_risk_stale_after,
+    )
+    # 事件循环卡顿看门狗：阻塞超过阈值时抓取阻塞处调用栈（同时采样 pmm_event_loop_lag_seconds）
+    loop_watchdog = LoopWatchdog(cfg.loop_lag_interval, cfg.supervisor_loop_stall_threshold, logger=logger_worker)
     tasks = [
-        asyncio.create_task(market_worker.run()),
-        asyncio.create_task(order_manager_wrapper()),
-        asyncio.create_task(logger_worker.run()),
-        asyncio.create_task(position_monitor.run()),
-        asyncio.create_task(risk_controller.run())
+        asyncio.create_task(supervisor.run()),
+        asyncio.create_task(loop_watchdog.run()),
     ]
+    if tracer.enabled:
+        tasks.append(asyncio.create_task(tracer.run_dumper()))
     # 信号处理
     stop_flag = {"stop": False}
     def handle_exit(*args):
@@ -76,27 +210,40 @@ async def main():
         print(f"[Main] 程序异常: {e}")
     finally:
         print("[Main] 停止各模块...")
-        if hasattr(risk_controller, 'stop'):
+        # 先停监管与各模块，避免挂单模块在撤单后重新挂单
+        supervisor.stop()
+        loop_watchdog.stop()
+        config_service.stop()
+        for risk_controller in risk_controllers.values():
             risk_controller.stop()
-        print("[Main] 撤销所有挂单...")
-        try:
-            rest.cancel_all_orders(symbol)
-            print("[Main] 挂单已全部撤销。")
-        except Exception as e:
-            print(f"[Main] 撤销挂单异常: {e}")
-        print("[Main] 平掉所有持仓...")
-        try:
-            risk_controller.close_position()
-        except Exception as e:
-            print(f"[Main] 平仓异常: {e}")
+        if checkpoint is not None:
+            checkpoint.stop()
+        if checkpoint is not None and config_service.snapshot.checkpoint_warm_shutdown:
+            # 热退出：保留挂单与持仓，写入最终检查点，由下次启动接管
+            print("[Main] 保留挂单与持仓，写入检查点...")
+            await checkpoint.save()
+        else:
+            # 各交易对同时撤单并平仓（平仓引擎内撤单与平仓也是并发的）
+            print("[Main] 撤销所有挂单并平掉所有持仓...")
+            await asyncio.gather(*(risk_controller.close_position() for risk_controller in risk_controllers.values()))
         print("[Main] 取消所有异步任务...")
         for task in tasks:
             task.cancel()
         print("[Main] 清理完成，安全退出。")
         if hasattr(logger_worker, 'stop'):
             logger_worker.stop()
-        if hasattr(position_monitor, 'stop'):
+        if metrics_store is not None:
+            metrics_store.close()
+        for position_monitor in position_monitors.values():
             position_monitor.stop()
+        await user_stream.close()
+        await rest.close()
+        if metrics_server is not None:
+            await metrics_server.close()
+        if tracer.enabled:
+            tracer.dump()
+        if recorder is not None:
+            recorder.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,44 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from utils.http import REST_ERRORS, AsyncBinanceRest, BinanceRestError
+
+async def _call(handler, path: str = "/fapi/v1/depth"):
+    app = web.Application()
+    app.router.add_get(path, handler)
+    server = TestServer(app)
+    await server.start_server()
+    rest = AsyncBinanceRest("k", "s")
+    rest.base_url = str(server.make_url(""))
+    try:
+        return await rest.get_depth("BTCUSDT", 5)
+    finally:
+        await rest.close()
+        await server.close()
+
+def _errors(status) -> float:
+    return REST_ERRORS.labels("GET", "/fapi/v1/depth", status).value
+
+def test_html_error_page_becomes_rest_error():
+    async def bad_gateway(request):
+        return web.Response(status=502, text="<html><body>502 Bad Gateway</body></html>", content_type="text/html")
+
+    before = _errors(502)
+    try:
+        asyncio.run(_call(bad_gateway))
+    except BinanceRestError as e:
+        assert e.status == 502 and e.code is None and "Bad Gateway" in e.msg
+    else:
+        raise AssertionError("应抛出 BinanceRestError")
+    assert _errors(502) == before + 1
+
+def test_json_error_keeps_exchange_code():
+    async def rejected(request):
+        return web.json_response({"code": -1121, "msg": "Invalid symbol."}, status=400)
+
+    try:
+        asyncio.run(_call(rejected))
+    except BinanceRestError as e:
+        assert (e.status, e.code, e.msg) == (400, -1121, "Invalid symbol.")
+    else:
+        raise AssertionError("应抛出 BinanceRestError")
@@ -0,0 +1,81 @@
+import asyncio
+from decimal import Decimal
+from core.liquidation import LiquidationEngine
+from core.orderbook import LocalOrderBook
+from core.state import SharedState
+from utils.symbol_rules import SymbolRules
+
+RULES = SymbolRules.from_exchange({
+    "symbol": "BTCUSDT",
+    "filters": [
+        {"filterType": "PRICE_FILTER", "tickSize": "0.1", "minPrice": "0.1", "maxPrice": "1000000"},
+        {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "1000"},
+        {"filterType": "MARKET_LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "120"},
+    ],
+})
+
+def _state() -> SharedState:
+    state = SharedState()
+    state.mark_price = 60000.0
+    book = LocalOrderBook("BTCUSDT")
+    # 买盘 20bp 内合计 1.0，更远处另有大量挂单
+    book.apply_snapshot({
+        "lastUpdateId": 1,
+        "bids": [["60000.0", "0.4"], ["59990.0", "0.6"], ["59000.0", "50"]],
+        "asks": [["60000.1", "0.5"], ["60010.0", "0.5"]],
+    })
+    state.order_book = book
+    return state
+
+def _engine(state: SharedState, rest=None, **kwargs) -> LiquidationEngine:
+    params = dict(max_slice_notional=Decimal("3000"), depth_participation=0.5, slippage_bps=20.0, max_slices=10)
+    params.update(kwargs)
+    return LiquidationEngine(rest, "BTCUSDT", state=state, **params)
+
+def test_round_total_bounded_by_visible_liquidity():
+    state = _state()
+    cap = Decimal(str(state.order_book.liquidity_within("BUY", 20.0) * 0.5))
+    # 未设名义价值上限时深度是唯一约束，一轮合计仍不能超过可见流动性 × depth_participation
+    for max_slice_notional in (Decimal("0"), Decimal("3000"), Decimal("12000")):
+        engine = _engine(state, max_slice_notional=max_slice_notional)
+        slices, limit_price = engine.plan_slices(Decimal("10"), "SELL", RULES)
+        assert sum(slices) <= cap
+        assert limit_price == Decimal("59880.0")
+
+def test_slices_bounded_by_notional():
+    engine = _engine(_state())
+    slices, _ = engine.plan_slices(Decimal("10"), "SELL", RULES)
+    # 每片名义价值不超过 max_slice_notional（3000 / 60000 = 0.05）
+    assert len(slices) == 10 and max(slices) <= Decimal("0.05")
+
+def test_small_position_sent_in_full():
+    engine = _engine(_state())
+    slices, _ = engine.plan_slices(Decimal("0.03"), "SELL", RULES)
+    assert slices == [Decimal("0.03")]
+
+def test_market_round_ignores_book():
+    engine = _engine(_state(), max_slices=3)
+    slices, limit_price = engine.plan_slices(Decimal("10"), "SELL", RULES, use_market=True)
+    assert limit_price is None
+    assert slices == [Decimal("0.050")] * 3
+
+class _FillAllRest:
+    """按下单数量全部成交的模拟 REST，记录每次批量下单"""
+    def __init__(self):
+        self.batches = []
+
+    async def place_batch_orders(self, symbol, orders):
+        self.batches.append(orders)
+        return [{"orderId": i, "status": "FILLED", "executedQty": str(o["quantity"])} for i, o in enumerate(orders)]
+
+def test_execute_round_sends_at_most_cap():
+    state = _state()
+    rest = _FillAllRest()
+    engine = _engine(state, rest, max_slice_notional=Decimal("12000"))
+    cap = Decimal(str(state.order_book.liquidity_within("BUY", 20.0) * 0.5))
+    remaining, sent = asyncio.run(engine._execute_round(Decimal("10"), RULES, use_market=False))
+    sent_qty = sum(o["quantity"] for o in rest.batches[0])
+    assert sent == len(rest.batches[0])
+    assert sent_qty <= cap
+    assert all(o["reduce_only"] and o["time_in_force"] == "IOC" for o in rest.batches[0])
+    assert remaining == Decimal("10") - sent_qty
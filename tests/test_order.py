@@ -0,0 +1,46 @@
+import asyncio
+from decimal import Decimal
+from core.order import OrderManager
+from core.state import SharedState
+
+class _StubConfigService:
+    def subscribe(self, callback):
+        pass
+
+    def unsubscribe(self, callback):
+        pass
+
+class _RecordingRest:
+    """记录全部调用的模拟 REST；下单类接口被调用即视为测试失败"""
+    def __init__(self):
+        self.calls = []
+
+    async def cancel_all_orders(self, symbol):
+        self.calls.append(("cancel_all_orders", symbol))
+        return {"code": 200}
+
+    def __getattr__(self, name):
+        async def call(*args, **kwargs):
+            self.calls.append((name, args))
+            raise AssertionError(f"暂停期间不应调用 {name}")
+        return call
+
+def _manager(rest, state: SharedState, **kwargs) -> OrderManager:
+    return OrderManager(rest, "BTCUSDT", 3, Decimal("0.01"), Decimal("0.1"), config_service=_StubConfigService(), state=state, **kwargs)
+
+def test_paused_on_restore_cancels_leftovers_and_skips_quoting():
+    state = SharedState()
+    state.mark_price = 60000.0
+    # 检查点恢复的暂停标记
+    state.strategy_paused = True
+    rest = _RecordingRest()
+    manager = _manager(rest, state, adopt_orders=True)
+
+    async def run():
+        await manager.refresh_orders()
+        await manager.refresh_orders()
+
+    asyncio.run(run())
+    # 首轮撤掉上次运行遗留的挂单，之后挂单簿为空不再重复撤单，也不接管或下单
+    assert rest.calls == [("cancel_all_orders", "BTCUSDT")]
+    assert not len(manager.book)
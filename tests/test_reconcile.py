@@ -0,0 +1,67 @@
+from core.reconcile import QuoteTarget, WorkingOrderBook, make_client_order_id, parse_client_order_id
+from utils.symbol_rules import SymbolRules
+from utils.ticks import TickGrid
+
+def _grid(tick: str = "0.1") -> TickGrid:
+    return TickGrid.from_rules(SymbolRules.from_exchange({
+        "symbol": "BTCUSDT",
+        "filters": [
+            {"filterType": "PRICE_FILTER", "tickSize": tick, "minPrice": tick, "maxPrice": "1000000"},
+            {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "1000"},
+        ],
+    }))
+
+GRID = _grid()
+
+def _target(side: str, level: int, price_ticks: int, qty_lots: int = 10, grid: TickGrid = GRID) -> QuoteTarget:
+    return QuoteTarget(side, level, price_ticks, qty_lots, grid)
+
+def _book(*targets: QuoteTarget) -> WorkingOrderBook:
+    book = WorkingOrderBook(clock=lambda: 0.0)
+    for i, t in enumerate(targets):
+        book.on_placed(t, {"orderId": i + 1})
+    return book
+
+def test_unchanged_ladder_produces_empty_plan():
+    targets = [_target("BUY", 1, 599940), _target("SELL", 1, 600060)]
+    plan = _book(*targets).diff(list(targets))
+    assert plan.is_empty() and plan.unchanged == 2
+
+def test_price_only_change_amends():
+    book = _book(_target("BUY", 1, 599940), _target("SELL", 1, 600060))
+    new_buy = _target("BUY", 1, 599941)
+    plan = book.diff([new_buy, _target("SELL", 1, 600060)])
+    assert not plan.to_cancel and not plan.to_place
+    assert [(o.order_id, t) for o, t in plan.to_amend] == [(1, new_buy)]
+    assert plan.unchanged == 1
+
+def test_quantity_only_change_amends():
+    book = _book(_target("BUY", 1, 599940, qty_lots=10))
+    new_buy = _target("BUY", 1, 599940, qty_lots=7)
+    plan = book.diff([new_buy])
+    assert not plan.to_cancel and not plan.to_place
+    assert [t for _, t in plan.to_amend] == [new_buy]
+
+def test_removed_and_added_levels_cancel_and_place():
+    book = _book(_target("BUY", 1, 599940), _target("BUY", 2, 599880))
+    plan = book.diff([_target("BUY", 1, 599940), _target("SELL", 1, 600060)])
+    assert [o.key for o in plan.to_cancel] == [("BUY", 2)]
+    assert [t.key for t in plan.to_place] == [("SELL", 1)]
+    assert not plan.to_amend and plan.unchanged == 1
+
+def test_grid_change_amends_even_with_same_ticks():
+    book = _book(_target("BUY", 1, 599940))
+    plan = book.diff([_target("BUY", 1, 599940, grid=_grid("0.5"))])
+    assert len(plan.to_amend) == 1 and not plan.to_cancel and not plan.to_place
+
+def test_amended_order_matches_target():
+    book = _book(_target("BUY", 1, 599940))
+    new_buy = _target("BUY", 1, 599950, qty_lots=12)
+    (order, target), = book.diff([new_buy]).to_amend
+    book.on_amended(order, target, {"orderId": 1})
+    assert book.orders[("BUY", 1)].price == GRID.price(599950)
+    assert book.diff([new_buy]).is_empty()
+
+def test_client_order_id_round_trip():
+    assert parse_client_order_id(make_client_order_id("SELL", 3)) == ("SELL", 3)
+    assert parse_client_order_id("web_123") is None
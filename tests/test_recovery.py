@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+from core.recovery import RecoveryManager, stream_idle
+from core.state import SharedState
+from utils.ws import BinanceWebSocket, ResilientMarketStream
+
+class _FakeSocket:
+    """按固定间隔推送原始文本帧的模拟 websockets 连接；frames 用完后保持连接但不再推送"""
+    def __init__(self, frames, interval):
+        self.frames = list(frames)
+        self.interval = interval
+
+    async def send(self, data):
+        pass
+
+    async def close(self):
+        pass
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            await asyncio.sleep(self.interval)
+            yield frame
+        await asyncio.Event().wait()
+
+def _ticker(update_id: int, bid_qty: str) -> str:
+    return json.dumps({"e": "bookTicker", "u": update_id, "s": "BTCUSDT", "b": "60000.0", "B": bid_qty, "a": "60000.1", "A": "1.0", "T": 0, "E": 0}, separators=(",", ":"))
+
+def _leg_factory(frames, interval):
+    def factory(symbols, env):
+        ws = BinanceWebSocket(symbols, env, skip_unchanged_ticker=True, ping_interval=None, ping_timeout=None)
+
+        async def connect():
+            ws.ws = _FakeSocket(frames, interval)
+            ws._connected = True
+            ws.last_recv = time.perf_counter()
+            ws.ticker_filter.reset()
+        ws.connect = connect
+        return ws
+    return factory
+
+class _Rest:
+    def __init__(self):
+        self.cancels = []
+
+    async def cancel_all_orders(self, symbol):
+        self.cancels.append(symbol)
+
+async def _run_guard(frames, interval, duration):
+    """行情连接按给定帧推送，监管模块按 0.3 秒失效阈值检查 duration 秒，返回 (state, rest, 交付的消息数)"""
+    stream = ResilientMarketStream("btcusdt", leg_factory=_leg_factory(frames, interval), stale_timeout=0)
+    await stream.connect()
+    await stream.subscribe_bookticker()
+    delivered = []
+
+    async def consume():
+        async for msg in stream.listen():
+            delivered.append(msg)
+    consumer = asyncio.create_task(consume())
+    state = SharedState(symbol="BTCUSDT", mark_price=60000.05)
+    rest = _Rest()
+    manager = RecoveryManager(check_interval=0.05)
+    manager.guard_quotes({"BTCUSDT": state}, rest, market_idle=lambda: stream_idle(stream), market_stale_after=0.3)
+    supervisor = asyncio.create_task(manager.run())
+    await asyncio.sleep(duration)
+    manager.stop()
+    supervisor.cancel()
+    await stream.close()
+    consumer.cancel()
+    await asyncio.gather(supervisor, consumer, return_exceptions=True)
+    return state, rest, len(delivered)
+
+def test_unchanged_tickers_do_not_halt_quotes():
+    # 买一/卖一价始终不变，只有挂单量变化：除第一条外全部在解码前被过滤，但连接仍在收包
+    frames = [_ticker(i, f"{1 + i % 5}.0") for i in range(40)]
+    state, rest, delivered = asyncio.run(_run_guard(frames, 0.02, 0.7))
+    assert delivered == 1
+    assert state.halt_reason is None
+    assert rest.cancels == []
+
+def test_silent_stream_halts_quotes():
+    state, rest, _ = asyncio.run(_run_guard([_ticker(1, "1.0")], 0.02, 0.7))
+    assert state.halt_reason == "market_stale"
+    assert rest.cancels == ["BTCUSDT"]
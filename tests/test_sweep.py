@@ -0,0 +1,33 @@
+import json
+import os
+from backtest.data import load_recorded
+from backtest.sweep import data_fingerprint, prepare_data, run_id
+
+def _write_ticks(path, symbol: str, count: int):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            t = 1700000000000 + i * 100
+            f.write(json.dumps({"e": "bookTicker", "s": symbol, "u": i, "b": "100.0", "B": "1", "a": "100.1", "A": "1", "T": t, "E": t}) + "\n")
+
+def test_cached_data_rebuilt_when_inputs_change(tmp_path):
+    btc, eth = tmp_path / "btc.jsonl", tmp_path / "eth.jsonl"
+    _write_ticks(btc, "BTCUSDT", 5)
+    _write_ticks(eth, "ETHUSDT", 3)
+    data_dir = str(tmp_path / "out" / "data")
+
+    prepare_data([str(btc)], data_dir)
+    assert len(list(load_recorded(data_dir))) == 5
+    # 同一输出目录换了输入文件：不能复用旧数据
+    prepare_data([str(eth)], data_dir)
+    assert [msg["s"] for _, msg in load_recorded(data_dir)] == ["ETHUSDT"] * 3
+    # 同样的输入、不同的交易对过滤条件
+    prepare_data([str(btc), str(eth)], data_dir)
+    prepare_data([str(btc), str(eth)], data_dir, symbol="BTCUSDT")
+    assert len(list(load_recorded(data_dir))) == 5
+    with open(os.path.join(data_dir, ".complete"), encoding="utf-8") as f:
+        assert json.load(f)["fingerprint"] == data_fingerprint([str(btc), str(eth)], "BTCUSDT")
+
+def test_run_id_depends_on_data():
+    params = {"order_config.levels": 3}
+    assert run_id(params, "a") == run_id(dict(params), "a")
+    assert run_id(params, "a") != run_id(params, "b")
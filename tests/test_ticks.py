@@ -0,0 +1,89 @@
+from decimal import ROUND_DOWN, Decimal
+from utils.symbol_rules import SymbolRules
+from utils.ticks import UNIT_SCALE, TickGrid, ladder_ticks, to_units
+
+def _rules(tick: str = "0.10", step: str = "0.001", min_qty: str = "0.001", min_notional: str = "100") -> SymbolRules:
+    return SymbolRules.from_exchange({
+        "symbol": "BTCUSDT",
+        "filters": [
+            {"filterType": "PRICE_FILTER", "tickSize": tick, "minPrice": tick, "maxPrice": "4529764"},
+            {"filterType": "LOT_SIZE", "stepSize": step, "minQty": min_qty, "maxQty": "1000"},
+            {"filterType": "MIN_NOTIONAL", "notional": min_notional},
+            {"filterType": "PERCENT_PRICE", "multiplierUp": "1.05", "multiplierDown": "0.95"},
+        ],
+    })
+
+def test_to_units_exact_for_exchange_strings():
+    assert to_units("0.00000001") == 1
+    assert to_units("0.1") == UNIT_SCALE // 10
+    assert to_units(Decimal("60000.1")) == 6000010000000
+    assert to_units(0.3) == 30000000
+    assert to_units("9999999.99999999") == 999999999999999
+    assert to_units(0) == 0
+
+def test_price_round_trip_on_tick_boundaries():
+    grid = TickGrid.from_rules(_rules())
+    for ticks in (1, 9, 10, 599999, 600000, 600001, 45297640):
+        price = grid.price(ticks)
+        # 输出按 tick 的有效位数（0.10 -> 0.1）
+        assert price == Decimal(ticks) * Decimal("0.1")
+        assert grid.price_ticks(str(price)) == ticks
+        assert grid.price_ticks(float(price)) == ticks
+        assert grid.price_ticks(price) == ticks
+    # 刚好低于一个 tick 的价格向下取整
+    assert grid.price_ticks("60000.09999999") == 600000
+    assert grid.price_ticks("60000.1") == 600001
+    assert str(grid.price(600001)) == "60000.1"
+
+def test_integer_tick_price_has_no_exponent():
+    grid = TickGrid.from_rules(_rules(tick="10"))
+    assert str(grid.price(6000)) == "60000"
+    assert grid.price_ticks("60009.99") == 6000
+    assert grid.price_ticks("60010") == 6001
+
+def test_quantity_round_trip_on_lot_boundaries():
+    grid = TickGrid.from_rules(_rules())
+    for lots in (1, 999, 1000, 1999, 1000000):
+        qty = grid.quantity(lots)
+        assert qty == Decimal(lots) * Decimal("0.001")
+        assert grid.qty_lots(str(qty)) == lots
+        assert grid.qty_lots(float(qty)) == lots
+    assert grid.qty_lots("0.0009999") == 0
+    assert grid.qty_lots("1.9999") == 1999
+    assert not grid.qty_ok(0) and grid.qty_ok(1)
+    coarse = TickGrid.from_rules(_rules(step="1", min_qty="1"))
+    assert coarse.qty_lots("2.999") == 2 and str(coarse.quantity(3)) == "3"
+
+def test_mid_truncated_to_tick_literal_precision():
+    grid = TickGrid.from_rules(_rules(tick="0.10"))
+    # "0.10" 有两位小数，中间价截断到 0.01（与 Decimal.quantize(price_tick) 一致）
+    assert grid.mid_units(60000.157) == to_units("60000.15")
+    expected = Decimal("60000.157").quantize(Decimal("0.10"), rounding=ROUND_DOWN)
+    assert grid.mid_units(60000.157) == to_units(expected)
+
+def test_notional_and_lot_sizing_boundaries():
+    grid = TickGrid.from_rules(_rules())
+    # 价格 100.0 × 数量 1.000 刚好等于 MIN_NOTIONAL 100
+    assert grid.notional_ok(1000, 1000)
+    assert not grid.notional_ok(1000, 999)
+    mark = to_units("60000")
+    assert grid.lots_for_notional(Decimal("100"), mark) == 1
+    assert grid.lots_for_notional(Decimal("120"), mark) == 2
+    # 持仓已超过上限时剩余可挂数量为负
+    assert grid.max_lots(Decimal("600"), mark, to_units("0.01")) == 0
+    assert grid.max_lots(Decimal("600"), mark, to_units("0.012")) == -2
+
+def test_price_band_matches_symbol_rules():
+    rules = _rules()
+    grid = TickGrid.from_rules(rules)
+    mark = Decimal("60000")
+    for ticks in (569999, 570000, 630000, 630001):
+        assert grid.price_in_band(ticks, to_units(mark)) == rules.price_in_band(grid.price(ticks), mark)
+
+def test_ladder_matches_decimal_reference():
+    tick = Decimal("0.1")
+    for mid, offset in ((Decimal("60000.15"), Decimal("0.1")), (Decimal("3000.07"), Decimal("0.037")), (Decimal("0.5"), Decimal("1"))):
+        for level, buy, sell in ladder_ticks(to_units(mid), 5, offset, to_units(tick)):
+            ratio = offset * level / 100
+            assert Decimal(buy) * tick == (mid * (1 - ratio)).quantize(tick, rounding=ROUND_DOWN)
+            assert Decimal(sell) * tick == (mid * (1 + ratio)).quantize(tick, rounding=ROUND_DOWN)
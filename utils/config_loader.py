@@ -1,7 +1,11 @@
+import asyncio
 import os
+import threading
 import yaml
-from dotenv import load_dotenv
-from typing import Any, Dict
+from dataclasses import dataclass, fields
+from decimal import Decimal, InvalidOperation
+from dotenv import dotenv_values
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 class ConfigLoaderError(Exception):
     """自定义异常：配置加载相关错误"""
@@ -23,13 +27,14 @@ class Config:
     def __repr__(self):
         return f"<Config yaml={self.yaml} env={self.env}>"
 
+ENV_KEYS = ["BINANCE_API_KEY", "BINANCE_SECRET_KEY", "EXCHANGE_ENV", "LISTEN_KEY_REFRESH_INTERVAL"]
+
 def load_env(env_path: str = ".env") -> Dict[str, str]:
-    """加载.env文件，返回环境变量字典，None值替换为''"""
+    """加载.env文件，返回环境变量字典，None值替换为''（进程环境变量优先于文件）"""
     if not os.path.exists(env_path):
         raise ConfigLoaderError(f".env 文件未找到: {env_path}")
-    load_dotenv(env_path)
-    keys = ["BINANCE_API_KEY", "BINANCE_SECRET_KEY", "EXCHANGE_ENV", "LISTEN_KEY_REFRESH_INTERVAL"]
-    return {k: os.getenv(k) or '' for k in keys}
+    file_values = dotenv_values(env_path)
+    return {k: os.environ.get(k) or file_values.get(k) or '' for k in ENV_KEYS}
 
 def load_yaml(yaml_path: str = "config.yaml") -> Dict[str, Any]:
     """加载yaml配置文件，返回字典"""
@@ -37,12 +42,459 @@ def load_yaml(yaml_path: str = "config.yaml") -> Dict[str, Any]:
         raise ConfigLoaderError(f"config.yaml 文件未找到: {yaml_path}")
     with open(yaml_path, "r", encoding="utf-8") as f:
         try:
-            return yaml.safe_load(f)
+            return yaml.safe_load(f) or {}
         except yaml.YAMLError as e:
             raise ConfigLoaderError(f"YAML 解析错误: {e}")
 
 def get_config(env_path: str = ".env", yaml_path: str = "config.yaml") -> Config:
-    """统一加载配置，返回Config对象"""
+    """统一加载配置，返回Config对象（每次调用都会读盘，热路径请使用 get_config_service().snapshot）"""
     env_config = load_env(env_path)
     yaml_config = load_yaml(yaml_path)
     return Config(yaml_config, env_config)
+
+def _decimal(value: Any, name: str) -> Decimal:
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ConfigLoaderError(f"配置项 {name} 不是合法数字: {value!r}")
+
+@dataclass(frozen=True)
+class SymbolConfig:
+    """单个交易对的做市参数（多币种模式下可逐个覆盖全局默认值）"""
+    symbol: str
+    initial_capital: Decimal
+    max_net_position_ratio: Decimal
+    levels: int
+    quantity_per_order_usdt: Decimal
+    price_offset_percent: Decimal
+    requote_ticks: int
+    requote_bps: float
+
+    @property
+    def max_net_notional(self) -> Decimal:
+        """最大净持仓名义价值（USDT）"""
+        return self.initial_capital * self.max_net_position_ratio
+
+    @classmethod
+    def from_yaml(cls, entry: Any, defaults: Dict[str, Any]) -> "SymbolConfig":
+        """
+        entry 可以是交易对字符串，或形如 {"symbol": ..., "order_config": {...}, ...} 的字典；
+        未覆盖的字段取全局配置（defaults 为整个 yaml）
+        """
+        if isinstance(entry, str):
+            entry = {"symbol": entry}
+        def pick(section: Optional[str], key: str, default: Any) -> Any:
+            if section is None:
+                return entry.get(key, defaults.get(key, default))
+            local = entry.get(section, {}) or {}
+            return local.get(key, (defaults.get(section, {}) or {}).get(key, default))
+        symbol = str(entry["symbol"]).upper()
+        return cls(
+            symbol=symbol,
+            initial_capital=_decimal(pick(None, "initial_capital", 200), f"{symbol}.initial_capital"),
+            max_net_position_ratio=_decimal(pick(None, "max_net_position_ratio", 0.5), f"{symbol}.max_net_position_ratio"),
+            levels=int(pick("order_config", "levels", 3)),
+            quantity_per_order_usdt=_decimal(pick("order_config", "quantity_per_order_usdt", 100), f"{symbol}.quantity_per_order_usdt"),
+            price_offset_percent=_decimal(pick("order_config", "price_offset_percent", 0.25), f"{symbol}.price_offset_percent"),
+            requote_ticks=int(pick("refresh_config", "requote_ticks", 2)),
+            requote_bps=float(pick("refresh_config", "requote_bps", 0)),
+        )
+
+    def validate(self) -> List[str]:
+        checks = [
+            (self.initial_capital > 0, "initial_capital 必须大于0"),
+            (0 < self.max_net_position_ratio <= 1, "max_net_position_ratio 必须在 (0, 1] 区间"),
+            (self.levels >= 1, "order_config.levels 必须 >= 1"),
+            (self.quantity_per_order_usdt > 0, "order_config.quantity_per_order_usdt 必须大于0"),
+            (self.price_offset_percent > 0, "order_config.price_offset_percent 必须大于0"),
+            (self.requote_ticks >= 0 and self.requote_bps >= 0, "requote_ticks/requote_bps 不能为负"),
+        ]
+        return [f"{self.symbol}: {msg}" for ok, msg in checks if not ok]
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    解析并校验后的只读配置快照：
+    - 数值字段预先转为 Decimal/int/float，热路径直接读属性，无需再解析
+    - 快照不可变，配置变更时整体替换，读者不会看到“半新半旧”的配置
+    """
+    version: int
+    # 账户与交易所
+    api_key: str
+    secret_key: str
+    exchange_env: str
+    listen_key_refresh_interval: int
+    symbol: str
+    leverage: int
+    initial_capital: Decimal
+    max_net_position_ratio: Decimal
+    # 挂单
+    levels: int
+    quantity_per_order_usdt: Decimal
+    price_offset_percent: Decimal
+    # 刷新
+    orderbook_refresh_interval: int
+    open_orders_sync_every: int
+    requote_ticks: int
+    requote_bps: float
+    debounce_ms: int
+    risk_check_interval: float
+    user_stream_reconcile_interval: float
+    # 行情
+    depth_enabled: bool
+    depth_snapshot_limit: int
+    json_decoder: str
+    skip_unchanged_ticker: bool
+    ws_connections: int
+    ws_stale_timeout: float
+    ws_rollover_hours: float
+    ws_reconnect_backoff_max: float
+    # 行情录制
+    recorder_enabled: bool
+    recorder_directory: str
+    recorder_compress: bool
+    recorder_flush_interval: float
+    # REST
+    request_timeout: float
+    pool_size: int
+    exchange_info_ttl: float
+    exchange_info_cache_path: str
+    # 账户/持仓快照缓存（各调用方可接受的数据年龄）
+    snapshot_order_max_age: float
+    snapshot_risk_max_age: float
+    snapshot_monitor_max_age: float
+    snapshot_metrics_max_age: float
+    # 日志
+    log_to_csv: bool
+    log_directory: str
+    log_level: str
+    log_queue_size: int
+    log_flush_interval: float
+    log_metrics_db: str
+    # 运行指标端点
+    metrics_enabled: bool
+    metrics_host: str
+    metrics_port: int
+    loop_lag_interval: float
+    # 进程级监管
+    supervisor_check_interval: float
+    supervisor_backoff_initial: float
+    supervisor_backoff_max: float
+    supervisor_max_restarts: int
+    supervisor_restart_window: float
+    supervisor_heartbeat_timeout: float
+    supervisor_market_stale_after: float
+    supervisor_risk_stale_after: float
+    supervisor_loop_stall_threshold: float
+    liquidation_max_slice_notional: Decimal
+    liquidation_depth_participation: float
+    liquidation_slippage_bps: float
+    liquidation_max_slices: int
+    liquidation_max_rounds: int
+    liquidation_confirm_timeout: float
+    checkpoint_enabled: bool
+    checkpoint_path: str
+    checkpoint_interval: float
+    checkpoint_max_age: float
+    checkpoint_warm_shutdown: bool
+    # 挂单链路延迟追踪
+    trace_enabled: bool
+    trace_capacity: int
+    trace_dump_interval: float
+    trace_directory: str
+    # 做市交易对列表（未配置 symbols 时只含顶层 symbol）
+    symbols: Tuple[SymbolConfig, ...]
+    # REST 全局请求预算
+    max_inflight_requests: int
+    weight_limit_per_minute: int
+    # 原始配置，供未建模的扩展字段使用
+    raw: Config
+
+    # 修改后需要重启进程才能生效的字段
+    RESTART_FIELDS = ("api_key", "secret_key", "exchange_env", "symbol", "depth_enabled", "depth_snapshot_limit", "json_decoder", "skip_unchanged_ticker", "ws_connections", "ws_stale_timeout", "ws_rollover_hours", "ws_reconnect_backoff_max", "listen_key_refresh_interval", "user_stream_reconcile_interval", "recorder_enabled", "recorder_directory", "recorder_compress", "recorder_flush_interval", "request_timeout", "pool_size", "max_inflight_requests", "weight_limit_per_minute", "exchange_info_ttl", "exchange_info_cache_path", "log_directory", "log_to_csv", "log_queue_size", "log_flush_interval", "log_metrics_db", "snapshot_order_max_age", "snapshot_risk_max_age", "snapshot_monitor_max_age", "snapshot_metrics_max_age", "metrics_enabled", "metrics_host", "metrics_port", "loop_lag_interval", "supervisor_check_interval", "supervisor_backoff_initial", "supervisor_backoff_max", "supervisor_max_restarts", "supervisor_restart_window", "supervisor_heartbeat_timeout", "supervisor_market_stale_after", "supervisor_risk_stale_after", "supervisor_loop_stall_threshold", "liquidation_max_slice_notional", "liquidation_depth_participation", "liquidation_slippage_bps", "liquidation_max_slices", "liquidation_max_rounds", "liquidation_confirm_timeout", "checkpoint_enabled", "checkpoint_path", "checkpoint_interval", "checkpoint_max_age", "trace_enabled", "trace_capacity", "trace_dump_interval", "trace_directory")
+
+    @property
+    def max_net_notional(self) -> Decimal:
+        """最大净持仓名义价值（USDT）"""
+        return self.initial_capital * self.max_net_position_ratio
+
+    def symbol_config(self, symbol: str) -> SymbolConfig:
+        for sc in self.symbols:
+            if sc.symbol == symbol:
+                return sc
+        raise KeyError(f"交易对 {symbol} 未在配置中")
+
+    @property
+    def symbol_names(self) -> List[str]:
+        return [sc.symbol for sc in self.symbols]
+
+    @classmethod
+    def from_config(cls, config: Config, version: int = 0) -> "ConfigSnapshot":
+        y = config.yaml
+        order_cfg = y.get("order_config", {}) or {}
+        refresh_cfg = y.get("refresh_config", {}) or {}
+        rest_cfg = y.get("rest_config", {}) or {}
+        market_cfg = y.get("market_data", {}) or {}
+        recorder_cfg = y.get("recorder", {}) or {}
+        logging_cfg = y.get("logging", {}) or {}
+        metrics_cfg = y.get("metrics", {}) or {}
+        tracing_cfg = y.get("tracing", {}) or {}
+        supervisor_cfg = y.get("supervisor", {}) or {}
+        liquidation_cfg = y.get("liquidation", {}) or {}
+        checkpoint_cfg = y.get("checkpoint", {}) or {}
+        snapshot_cfg = y.get("snapshot_cache", {}) or {}
+        try:
+            symbol_entries = y.get("symbols") or [config.get("symbol", "BTCUSDT")]
+            symbols = tuple(SymbolConfig.from_yaml(e, y) for e in symbol_entries)
+            snapshot = cls(
+                version=version,
+                api_key=config.env.get("BINANCE_API_KEY") or "",
+                secret_key=config.env.get("BINANCE_SECRET_KEY") or "",
+                exchange_env=config.env.get("EXCHANGE_ENV") or "testnet",
+                listen_key_refresh_interval=int(config.env.get("LISTEN_KEY_REFRESH_INTERVAL") or 1800),
+                symbol=symbols[0].symbol,
+                leverage=int(y.get("leverage", 1)),
+                initial_capital=_decimal(y.get("initial_capital", 200), "initial_capital"),
+                max_net_position_ratio=_decimal(y.get("max_net_position_ratio", 0.5), "max_net_position_ratio"),
+                levels=int(order_cfg.get("levels", 3)),
+                quantity_per_order_usdt=_decimal(order_cfg.get("quantity_per_order_usdt", 100), "quantity_per_order_usdt"),
+                price_offset_percent=_decimal(order_cfg.get("price_offset_percent", 0.25), "price_offset_percent"),
+                orderbook_refresh_interval=int(refresh_cfg.get("orderbook_refresh_interval", 5)),
+                open_orders_sync_every=int(refresh_cfg.get("open_orders_sync_every", 6)),
+                requote_ticks=int(refresh_cfg.get("requote_ticks", 2)),
+                requote_bps=float(refresh_cfg.get("requote_bps", 0)),
+                debounce_ms=int(refresh_cfg.get("debounce_ms", 100)),
+                risk_check_interval=float(refresh_cfg.get("risk_check_interval", 1)),
+                user_stream_reconcile_interval=float(refresh_cfg.get("user_stream_reconcile_interval", 300)),
+                depth_enabled=bool(market_cfg.get("depth_enabled", False)),
+                depth_snapshot_limit=int(market_cfg.get("depth_snapshot_limit", 1000)),
+                json_decoder=str(market_cfg.get("json_decoder", "auto")),
+                skip_unchanged_ticker=bool(market_cfg.get("skip_unchanged_ticker", True)),
+                ws_connections=int(market_cfg.get("connections", 1)),
+                ws_stale_timeout=float(market_cfg.get("stale_timeout", 30)),
+                ws_rollover_hours=float(market_cfg.get("rollover_hours", 23.5)),
+                ws_reconnect_backoff_max=float(market_cfg.get("reconnect_backoff_max", 30)),
+                recorder_enabled=bool(recorder_cfg.get("enabled", False)),
+                recorder_directory=str(recorder_cfg.get("directory", "./data")),
+                recorder_compress=bool(recorder_cfg.get("compress", True)),
+                recorder_flush_interval=float(recorder_cfg.get("flush_interval", 1)),
+                request_timeout=float(rest_cfg.get("request_timeout", 5)),
+                pool_size=int(rest_cfg.get("pool_size", 10)),
+                exchange_info_ttl=float(rest_cfg.get("exchange_info_ttl", 3600)),
+                exchange_info_cache_path=str(rest_cfg.get("exchange_info_cache_path", "./cache/exchange_info.json")),
+                snapshot_order_max_age=float(snapshot_cfg.get("order_position_max_age", 0)),
+                snapshot_risk_max_age=float(snapshot_cfg.get("risk_position_max_age", 0)),
+                snapshot_monitor_max_age=float(snapshot_cfg.get("monitor_position_max_age", 0)),
+                snapshot_metrics_max_age=float(snapshot_cfg.get("metrics_account_max_age", 0)),
+                log_to_csv=bool(logging_cfg.get("log_to_csv", True)),
+                log_directory=str(logging_cfg.get("log_directory", "./logs")),
+                log_level=str(logging_cfg.get("log_level", "info")),
+                log_queue_size=int(logging_cfg.get("queue_size", 10000)),
+                log_flush_interval=float(logging_cfg.get("flush_interval", 1)),
+                log_metrics_db=str(logging_cfg.get("metrics_db") or ""),
+                metrics_enabled=bool(metrics_cfg.get("enabled", False)),
+                metrics_host=str(metrics_cfg.get("host", "127.0.0.1")),
+                metrics_port=int(metrics_cfg.get("port", 9108)),
+                loop_lag_interval=float(metrics_cfg.get("loop_lag_interval", 0.1)),
+                supervisor_check_interval=float(supervisor_cfg.get("check_interval", 0.5)),
+                supervisor_backoff_initial=float(supervisor_cfg.get("restart_backoff_initial", 1)),
+                supervisor_backoff_max=float(supervisor_cfg.get("restart_backoff_max", 60)),
+                supervisor_max_restarts=int(supervisor_cfg.get("max_restarts", 10)),
+                supervisor_restart_window=float(supervisor_cfg.get("restart_window", 300)),
+                supervisor_heartbeat_timeout=float(supervisor_cfg.get("heartbeat_timeout", 60)),
+                supervisor_market_stale_after=float(supervisor_cfg.get("market_stale_after", 5)),
+                supervisor_risk_stale_after=float(supervisor_cfg.get("risk_stale_after", 10)),
+                supervisor_loop_stall_threshold=float(supervisor_cfg.get("loop_stall_threshold", 0.25)),
+                liquidation_max_slice_notional=_decimal(liquidation_cfg.get("max_slice_notional", 0), "liquidation.max_slice_notional"),
+                liquidation_depth_participation=float(liquidation_cfg.get("depth_participation", 0.5)),
+                liquidation_slippage_bps=float(liquidation_cfg.get("slippage_bps", 20)),
+                liquidation_max_slices=int(liquidation_cfg.get("max_slices", 10)),
+                liquidation_max_rounds=int(liquidation_cfg.get("max_rounds", 5)),
+                liquidation_confirm_timeout=float(liquidation_cfg.get("confirm_timeout", 2)),
+                checkpoint_enabled=bool(checkpoint_cfg.get("enabled", True)),
+                checkpoint_path=str(checkpoint_cfg.get("path", "./cache/checkpoint.json")),
+                checkpoint_interval=float(checkpoint_cfg.get("interval", 5)),
+                checkpoint_max_age=float(checkpoint_cfg.get("max_age", 600)),
+                checkpoint_warm_shutdown=bool(checkpoint_cfg.get("warm_shutdown", False)),
+                trace_enabled=bool(tracing_cfg.get("enabled", False)),
+                trace_capacity=int(tracing_cfg.get("capacity", 4096)),
+                trace_dump_interval=float(tracing_cfg.get("dump_interval", 10)),
+                trace_directory=str(tracing_cfg.get("directory", "./logs")),
+                symbols=symbols,
+                max_inflight_requests=int(rest_cfg.get("max_inflight_requests", 10)),
+                weight_limit_per_minute=int(rest_cfg.get("weight_limit_per_minute", 2400)),
+                raw=config,
+            )
+        except (TypeError, ValueError, KeyError) as e:
+            raise ConfigLoaderError(f"配置项类型错误: {e}")
+        snapshot.validate()
+        return snapshot
+
+    def validate(self):
+        """校验取值范围，不合法时抛出 ConfigLoaderError"""
+        checks = [
+            (self.initial_capital > 0, "initial_capital 必须大于0"),
+            (0 < self.max_net_position_ratio <= 1, "max_net_position_ratio 必须在 (0, 1] 区间"),
+            (self.levels >= 1, "order_config.levels 必须 >= 1"),
+            (self.quantity_per_order_usdt > 0, "order_config.quantity_per_order_usdt 必须大于0"),
+            (self.price_offset_percent > 0, "order_config.price_offset_percent 必须大于0"),
+            (self.orderbook_refresh_interval > 0, "refresh_config.orderbook_refresh_interval 必须大于0"),
+            (self.open_orders_sync_every >= 1, "refresh_config.open_orders_sync_every 必须 >= 1"),
+            (self.requote_ticks >= 0 and self.requote_bps >= 0, "requote_ticks/requote_bps 不能为负"),
+            (self.debounce_ms >= 0, "refresh_config.debounce_ms 不能为负"),
+            (self.risk_check_interval > 0, "refresh_config.risk_check_interval 必须大于0"),
+            (self.depth_snapshot_limit in (5, 10, 20, 50, 100, 500, 1000), "market_data.depth_snapshot_limit 必须是 5/10/20/50/100/500/1000 之一"),
+            (self.json_decoder in ("auto", "msgspec", "orjson", "json"), "market_data.json_decoder 必须是 auto/msgspec/orjson/json 之一"),
+            (1 <= self.ws_connections <= 5, "market_data.connections 必须在 1~5 之间"),
+            (self.ws_stale_timeout >= 0, "market_data.stale_timeout 不能为负"),
+            (0 < self.ws_rollover_hours < 24, "market_data.rollover_hours 必须在 (0, 24) 区间"),
+            (self.ws_reconnect_backoff_max > 0, "market_data.reconnect_backoff_max 必须大于0"),
+            (self.log_queue_size > 0 and self.log_flush_interval > 0, "logging.queue_size 与 logging.flush_interval 必须大于0"),
+            (self.recorder_flush_interval > 0, "recorder.flush_interval 必须大于0"),
+            (min(self.snapshot_order_max_age, self.snapshot_risk_max_age, self.snapshot_monitor_max_age, self.snapshot_metrics_max_age) >= 0, "snapshot_cache 各 max_age 不能为负"),
+            (0 <= self.metrics_port <= 65535, "metrics.port 必须在 0~65535 之间"),
+            (self.loop_lag_interval > 0, "metrics.loop_lag_interval 必须大于0"),
+            (self.supervisor_check_interval > 0, "supervisor.check_interval 必须大于0"),
+            (0 < self.supervisor_backoff_initial <= self.supervisor_backoff_max, "supervisor.restart_backoff_initial 必须大于0且不超过 restart_backoff_max"),
+            (self.supervisor_max_restarts >= 1 and self.supervisor_restart_window > 0, "supervisor.max_restarts 必须 >= 1，restart_window 必须大于0"),
+            (self.supervisor_heartbeat_timeout >= 0, "supervisor.heartbeat_timeout 不能为负"),
+            (self.supervisor_market_stale_after >= 0 and self.supervisor_risk_stale_after >= 0, "supervisor.market_stale_after/risk_stale_after 不能为负"),
+            (self.supervisor_loop_stall_threshold > 0, "supervisor.loop_stall_threshold 必须大于0"),
+            (self.liquidation_max_slice_notional >= 0, "liquidation.max_slice_notional 不能为负"),
+            (0 < self.liquidation_depth_participation <= 1, "liquidation.depth_participation 必须在 (0, 1] 区间"),
+            (self.liquidation_slippage_bps > 0, "liquidation.slippage_bps 必须大于0"),
+            (self.liquidation_max_slices >= 1 and self.liquidation_max_rounds >= 1, "liquidation.max_slices/max_rounds 必须 >= 1"),
+            (self.liquidation_confirm_timeout > 0, "liquidation.confirm_timeout 必须大于0"),
+            (self.checkpoint_interval > 0 and self.checkpoint_max_age > 0, "checkpoint.interval/max_age 必须大于0"),
+            (self.trace_capacity > 0 and self.trace_dump_interval > 0, "tracing.capacity 与 tracing.dump_interval 必须大于0"),
+            (self.user_stream_reconcile_interval > 0, "refresh_config.user_stream_reconcile_interval 必须大于0"),
+            (self.listen_key_refresh_interval > 0, "LISTEN_KEY_REFRESH_INTERVAL 必须大于0"),
+        ]
+        errors = [msg for ok, msg in checks if not ok]
+        names = self.symbol_names
+        if len(set(names)) != len(names):
+            errors.append("symbols 中存在重复交易对")
+        if self.max_inflight_requests < 1 or self.weight_limit_per_minute < 1:
+            errors.append("rest_config.max_inflight_requests/weight_limit_per_minute 必须 >= 1")
+        for sc in self.symbols:
+            errors.extend(sc.validate())
+        if errors:
+            raise ConfigLoaderError("配置校验失败: " + "; ".join(errors))
+
+    def changed_fields(self, other: "ConfigSnapshot") -> List[str]:
+        skip = {"version", "raw"}
+        return [f.name for f in fields(self) if f.name not in skip and getattr(self, f.name) != getattr(other, f.name)]
+
+# 订阅回调：callback(old_snapshot, new_snapshot)
+ConfigSubscriber = Callable[[ConfigSnapshot, ConfigSnapshot], None]
+
+class ConfigService:
+    """
+    进程级配置服务：
+    - 启动时解析一次 .env 与 config.yaml，生成不可变的 ConfigSnapshot
+    - watch() 按 mtime 轮询文件变化，变更后重新解析校验，通过后原子替换快照并通知订阅者
+    - 新配置不合法时保留旧快照，只打印错误
+    - 热路径只读 service.snapshot 属性，不做任何文件 I/O
+    """
+    def __init__(self, env_path: str = ".env", yaml_path: str = "config.yaml", poll_interval: float = 1.0):
+        self.env_path = env_path
+        self.yaml_path = yaml_path
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._mtimes: Tuple[float, float] = (0.0, 0.0)
+        self._subscribers: List[ConfigSubscriber] = []
+        self._running = False
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+
+    def _stat(self) -> Tuple[float, float]:
+        def mtime(path):
+            try:
+                return os.stat(path).st_mtime_ns
+            except OSError:
+                return 0
+        return mtime(self.env_path), mtime(self.yaml_path)
+
+    def load(self) -> ConfigSnapshot:
+        """读取并校验配置文件，成功后替换当前快照"""
+        mtimes = self._stat()
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        snapshot = ConfigSnapshot.from_config(get_config(self.env_path, self.yaml_path), version)
+        self._snapshot, self._mtimes = snapshot, mtimes
+        return snapshot
+
+    def set_snapshot(self, snapshot: ConfigSnapshot):
+        """直接替换当前快照并通知订阅者，不读文件（回测等场景注入配置）"""
+        old, self._snapshot = self._snapshot, snapshot
+        if old is None:
+            return
+        for callback in list(self._subscribers):
+            try:
+                callback(old, snapshot)
+            except Exception as e:
+                print(f"[ConfigService] 配置订阅回调异常: {e}")
+
+    def subscribe(self, callback: ConfigSubscriber):
+        """注册配置变更回调"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: ConfigSubscriber):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def reload_if_changed(self) -> bool:
+        """文件 mtime 变化时重新加载，返回是否切换了新快照"""
+        if self._stat() == self._mtimes:
+            return False
+        old = self.snapshot
+        try:
+            new = self.load()
+        except ConfigLoaderError as e:
+            # 记录本次 mtime，避免对同一份错误配置反复报错
+            self._mtimes = self._stat()
+            print(f"[ConfigService] 新配置无效，继续使用版本 {old.version}: {e}")
+            return False
+        changed = new.changed_fields(old)
+        if not changed:
+            return False
+        print(f"[ConfigService] 配置已更新到版本 {new.version}，变更字段: {changed}")
+        restart_needed = [f for f in changed if f in ConfigSnapshot.RESTART_FIELDS]
+        if new.symbol_names != old.symbol_names:
+            # 单个交易对参数可热更新，增删交易对需重启
+            restart_needed.append("symbols")
+        if restart_needed:
+            print(f"[ConfigService] 以下字段需重启进程才能生效: {restart_needed}")
+        for callback in list(self._subscribers):
+            try:
+                callback(old, new)
+            except Exception as e:
+                print(f"[ConfigService] 配置订阅回调异常: {e}")
+        return True
+
+    async def watch(self):
+        """后台协程：定时检查配置文件变化"""
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"[ConfigService] 检查配置变化异常: {e}")
+
+    def stop(self):
+        self._running = False
+
+_service: Optional[ConfigService] = None
+_service_lock = threading.Lock()
+
+def get_config_service(env_path: str = ".env", yaml_path: str = "config.yaml") -> ConfigService:
+    """获取进程级配置服务单例（首次调用时创建）"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConfigService(env_path, yaml_path)
+        return _service
@@ -0,0 +1,175 @@
+import json
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# 可选的高性能 JSON 库：orjson（通用解码）、msgspec（按消息类型直接解码为结构体）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+RawMessage = Union[str, bytes]
+
+def _json_loads(raw: RawMessage) -> Any:
+    return json.loads(raw)
+
+def _orjson_loads(raw: RawMessage) -> Any:
+    return orjson.loads(raw)
+
+if msgspec is not None:
+    class _Event(msgspec.Struct, tag_field="e", frozen=True):
+        """
+        WebSocket 事件结构体基类：字段名与 Binance 原始字段一致，
+        提供与 dict 相同的 get()/[]/in 访问方式，下游处理代码无需区分结构体与字典
+        """
+        def get(self, key: str, default: Any = None) -> Any:
+            if key == "e":
+                # 事件类型是结构体的标签而非字段
+                return self.__struct_config__.tag
+            return getattr(self, key, default)
+
+        def __getitem__(self, key: str) -> Any:
+            if key == "e":
+                return self.__struct_config__.tag
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+
+        def __contains__(self, key: str) -> bool:
+            return key == "e" or hasattr(self, key)
+
+    class BookTickerEvent(_Event, tag="bookTicker"):
+        u: int = 0
+        s: str = ""
+        b: str = "0"
+        B: str = "0"
+        a: str = "0"
+        A: str = "0"
+        T: int = 0
+        E: int = 0
+
+    class DepthUpdateEvent(_Event, tag="depthUpdate"):
+        E: int = 0
+        T: int = 0
+        s: str = ""
+        U: int = 0
+        u: int = 0
+        pu: int = 0
+        b: list = []
+        a: list = []
+
+    class AggTradeEvent(_Event, tag="aggTrade"):
+        E: int = 0
+        s: str = ""
+        a: int = 0
+        p: str = "0"
+        q: str = "0"
+        f: int = 0
+        l: int = 0
+        T: int = 0
+        m: bool = False
+
+    class OrderTradeUpdateEvent(_Event, tag="ORDER_TRADE_UPDATE"):
+        E: int = 0
+        T: int = 0
+        o: dict = {}
+
+    class AccountUpdateEvent(_Event, tag="ACCOUNT_UPDATE"):
+        E: int = 0
+        T: int = 0
+        a: dict = {}
+
+    MARKET_EVENTS = Union[BookTickerEvent, DepthUpdateEvent, AggTradeEvent]
+    USER_EVENTS = Union[OrderTradeUpdateEvent, AccountUpdateEvent]
+
+class MessageDecoder:
+    """
+    WebSocket 消息解码器：
+    - loads 为通用 JSON 解码（优先 orjson，否则标准库 json），结果为 dict
+    - 传入 msgspec 的事件类型联合时，已知事件直接解码为结构体（跳过构造中间 dict），
+      未知事件（订阅回执、其他推送）回退到通用解码
+    """
+    def __init__(self, loads: Callable[[RawMessage], Any] = _json_loads, typed: Any = None):
+        self.loads = loads
+        self.name = "orjson" if loads is _orjson_loads else "json"
+        self._typed = None
+        if typed is not None and msgspec is not None:
+            self._typed = msgspec.json.Decoder(typed)
+            self.name = "msgspec"
+
+    def decode(self, raw: RawMessage) -> Any:
+        if self._typed is not None:
+            try:
+                return self._typed.decode(raw)
+            except msgspec.ValidationError:
+                pass
+        return self.loads(raw)
+
+def get_decoder(kind: str = "market", backend: str = "auto") -> MessageDecoder:
+    """
+    按可用依赖选择解码器：auto 依次尝试 msgspec 结构体解码、orjson、标准库 json；
+    kind 为 "market"（行情）或 "user"（用户数据流），决定结构体解码的事件类型
+    """
+    if backend in ("auto", "msgspec") and msgspec is not None:
+        return MessageDecoder(_orjson_loads if orjson is not None else _json_loads, MARKET_EVENTS if kind == "market" else USER_EVENTS)
+    if backend in ("auto", "orjson") and orjson is not None:
+        return MessageDecoder(_orjson_loads)
+    if backend not in ("auto", "json", "orjson", "msgspec"):
+        raise ValueError(f"未知的 JSON 解码器: {backend}")
+    return MessageDecoder(_json_loads)
+
+class BookTickerFilter:
+    """
+    bookTicker 快速过滤：解码前直接在原始文本中截取交易对与买一/卖一价，
+    与上一条相同（只有挂单量变化）的消息直接丢弃，省去完整解码与后续处理。
+    中间价只依赖买一/卖一价，丢弃这些消息不影响报价；非 bookTicker 消息一律放行。
+    """
+    PREFIX = '{"e":"bookTicker"'
+
+    def __init__(self):
+        self.last: Dict[str, Tuple[str, str]] = {}
+        self.passed = 0
+        self.dropped = 0
+
+    @staticmethod
+    def _field(raw: str, key: str) -> Optional[str]:
+        start = raw.find(key)
+        if start < 0:
+            return None
+        start += len(key)
+        end = raw.find('"', start)
+        return raw[start:end] if end > 0 else None
+
+    def _quote(self, raw: str) -> Optional[Tuple[str, str, str]]:
+        """截取 (交易对, 买一价, 卖一价)：按 Binance 固定字段顺序一次 split，顺序不符时退回逐字段查找"""
+        parts = raw.split('"', 22)
+        if len(parts) > 21 and parts[7] == "s" and parts[11] == "b" and parts[19] == "a":
+            return parts[9], parts[13], parts[21]
+        symbol = self._field(raw, '"s":"')
+        bid = self._field(raw, '"b":"')
+        ask = self._field(raw, '"a":"')
+        if symbol is None or bid is None or ask is None:
+            return None
+        return symbol, bid, ask
+
+    def is_unchanged(self, raw: RawMessage) -> bool:
+        if not isinstance(raw, str) or not raw.startswith(self.PREFIX):
+            return False
+        quote = self._quote(raw)
+        if quote is None:
+            return False
+        symbol, bid, ask = quote
+        if self.last.get(symbol) == (bid, ask):
+            self.dropped += 1
+            return True
+        self.last[symbol] = (bid, ask)
+        self.passed += 1
+        return False
+
+    def reset(self):
+        """重连后清空，避免与断线前最后一条比较而丢掉新连接的首条行情"""
+        self.last.clear()
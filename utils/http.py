@@ -1,10 +1,17 @@
+import asyncio
 import requests
+import aiohttp
 import time
 import hmac
 import hashlib
+import json
+from urllib.parse import urlencode
 from decimal import Decimal
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from utils.config_loader import get_config
+from utils.metrics import registry
+from utils.rate_limit import RestScheduler, PRIORITY_EMERGENCY, current_priority, endpoint_weight, endpoint_order_count
+from utils.tracing import current_trace
 
 # Binance Future REST API地址
 BINANCE_API_URLS = {
@@ -12,43 +19,68 @@ BINANCE_API_URLS = {
     # "mainnet": "https://fapi.binance.com",  # 实盘，后续支持
 }
 
-class BinanceRest:
+REST_LATENCY = registry.histogram("pmm_rest_request_seconds", "REST 请求耗时（拿到发送名额到收到响应）", ("method", "endpoint"))
+REST_ERRORS = registry.counter("pmm_rest_errors_total", "REST 请求失败数（HTTP 状态码或异常类型）", ("method", "endpoint", "reason"))
+REST_QUEUE_WAIT = registry.histogram("pmm_rest_queue_wait_seconds", "REST 请求在调度器中排队等待发送名额的耗时")
+
+# 批量接口单次请求上限（/fapi/v1/batchOrders）
+BATCH_ORDER_LIMIT = 5
+BATCH_CANCEL_LIMIT = 10
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _compact_json(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+def is_order_error(resp: Any) -> bool:
+    """批量接口中单笔结果是否为错误（形如 {"code": -2010, "msg": ...}）"""
+    return isinstance(resp, dict) and "orderId" not in resp and "code" in resp
+
+class BinanceRestError(Exception):
+    """REST 接口返回非 2xx 时抛出，携带状态码与交易所错误信息"""
+    def __init__(self, status: int, code: Optional[int], msg: str, path: str):
+        super().__init__(f"HTTP {status} {path}: code={code}, msg={msg}")
+        self.status = status
+        self.code = code
+        self.msg = msg
+        self.path = path
+
+class _BinanceRestBase:
     """
-    Binance Future REST API 封装，支持 testnet，预留 mainnet 切换。
-    金额、价格、数量均用 Decimal 处理。
+    同步/异步客户端共用的参数构造、签名与结果解析逻辑，
+    保证两种实现的接口行为完全一致。
     """
     def __init__(self, api_key: str, secret_key: str, env: str = "testnet"):
         self.api_key = api_key
         self.secret_key = secret_key
         self.env = env
         self.base_url = BINANCE_API_URLS.get(env, BINANCE_API_URLS["testnet"])
-        self.session = requests.Session()
-        self.session.headers.update({"X-MBX-APIKEY": self.api_key})
 
     def _sign(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """签名参数"""
         params = {k: v for k, v in params.items() if v is not None}
-        query = "&".join([f"{k}={v}" for k, v in params.items()])
+        query = urlencode(params)
         signature = hmac.new(self.secret_key.encode(), query.encode(), hashlib.sha256).hexdigest()
         params["signature"] = signature
         return params
 
-    def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, signed: bool = False) -> Any:
-        url = self.base_url + path
+    def _prepare_params(self, params: Optional[Dict[str, Any]], signed: bool) -> Dict[str, Any]:
         params = params or {}
         if signed:
             params["timestamp"] = int(time.time() * 1000)
             params = self._sign(params)
-        resp = self.session.request(method, url, params=params)
-        try:
-            resp.raise_for_status()
-        except Exception:
-            print("[调试用] 接口返回内容:", resp.text)  # TODO: 问题排查后请删除本行
-            raise
-        return resp.json()
+        return params
 
-    def place_order(self, symbol: str, side: str, quantity: Decimal, price: Optional[Decimal] = None, order_type: str = "LIMIT", time_in_force: str = "GTC") -> Any:
-        """下单，自动区分限价单和市价单参数"""
+    def _build_path(self, path: str, params: Optional[Dict[str, Any]], signed: bool) -> str:
+        """自行编码查询串，保证发送内容与签名内容逐字节一致（批量接口含 JSON 参数）"""
+        query = urlencode(self._prepare_params(params, signed))
+        return f"{path}?{query}" if query else path
+
+    @staticmethod
+    def _order_params(symbol: str, side: str, quantity: Decimal, price: Optional[Decimal], order_type: str, time_in_force: str, client_order_id: Optional[str] = None,
+                      reduce_only: bool = False, resp_type: Optional[str] = None) -> Dict[str, Any]:
+        """下单参数，自动区分限价单和市价单；reduce_only 为只减仓单，resp_type="RESULT" 时回报包含最终成交状态"""
         params = {
             "symbol": symbol,
             "side": side,
@@ -59,16 +91,162 @@ class BinanceRest:
             params["price"] = str(price)
             params["timeInForce"] = time_in_force
         # 市价单不加 price 和 timeInForce
+        if client_order_id:
+            params["newClientOrderId"] = client_order_id
+        if reduce_only:
+            params["reduceOnly"] = "true"
+        if resp_type:
+            params["newOrderRespType"] = resp_type
+        return params
+
+    @staticmethod
+    def _order_ref_params(symbol: str, order_id: Optional[int], client_order_id: Optional[str]) -> Dict[str, Any]:
+        """按 orderId 或 origClientOrderId 定位单个订单"""
+        if order_id is None and not client_order_id:
+            raise ValueError("order_id 与 client_order_id 至少提供一个")
+        params: Dict[str, Any] = {"symbol": symbol}
+        if order_id is not None:
+            params["orderId"] = order_id
+        else:
+            params["origClientOrderId"] = client_order_id
+        return params
+
+    @classmethod
+    def _batch_order_item(cls, symbol: str, order: Dict[str, Any]) -> Dict[str, str]:
+        """批量下单中的单笔参数，字段同 place_order 的关键字参数"""
+        params = cls._order_params(
+            symbol, order["side"], order["quantity"], order.get("price"),
+            order.get("order_type", "LIMIT"), order.get("time_in_force", "GTC"), order.get("client_order_id"),
+            order.get("reduce_only", False), order.get("resp_type"),
+        )
+        return {k: str(v) for k, v in params.items()}
+
+    @classmethod
+    def _batch_modify_item(cls, symbol: str, order: Dict[str, Any]) -> Dict[str, str]:
+        """批量改单中的单笔参数，字段同 modify_order 的关键字参数"""
+        params = cls._order_ref_params(symbol, order.get("order_id"), order.get("client_order_id"))
+        params.update({"side": order["side"], "quantity": order["quantity"], "price": order["price"]})
+        return {k: str(v) for k, v in params.items()}
+
+    @staticmethod
+    def _batch_cancel_params(symbol: str, order_ids: Optional[List[int]], client_order_ids: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """按单次上限拆分批量撤单参数"""
+        if order_ids:
+            return [{"symbol": symbol, "orderIdList": _compact_json(chunk)} for chunk in _chunks(list(order_ids), BATCH_CANCEL_LIMIT)]
+        if client_order_ids:
+            return [{"symbol": symbol, "origClientOrderIdList": _compact_json(chunk)} for chunk in _chunks(list(client_order_ids), BATCH_CANCEL_LIMIT)]
+        return []
+
+    @staticmethod
+    def _chunk_error(size: int, e: Exception) -> List[Dict[str, Any]]:
+        """整批请求失败时为其中每一笔生成错误结果，保持与入参一一对应"""
+        code = getattr(e, "code", None)
+        return [{"code": code if code is not None else -1, "msg": str(e)} for _ in range(size)]
+
+    @staticmethod
+    def _pick_position(data: Any, symbol: str) -> dict:
+        if isinstance(data, list):
+            for pos in data:
+                if pos.get("symbol") == symbol:
+                    return pos
+        elif isinstance(data, dict) and data.get("symbol") == symbol:
+            return data
+        raise ValueError(f"Position info for {symbol} not found")
+
+    @staticmethod
+    def _pick_symbol_info(data: dict, symbol: str) -> dict:
+        for s in data["symbols"]:
+            if s["symbol"] == symbol:
+                lot_size = next(f for f in s["filters"] if f["filterType"] == "LOT_SIZE")
+                price_filter = next(f for f in s["filters"] if f["filterType"] == "PRICE_FILTER")
+                return {
+                    "step_size": lot_size["stepSize"],
+                    "min_qty": lot_size["minQty"],
+                    "price_tick": price_filter["tickSize"]
+                }
+        raise ValueError(f"Symbol {symbol} not found in exchangeInfo")
+
+class BinanceRest(_BinanceRestBase):
+    """
+    Binance Future REST API 的同步薄封装，供脚本与交互式排查使用（策略主流程只用 AsyncBinanceRest）。
+    不经 RestScheduler 限频，接口与参数构造同 AsyncBinanceRest，非 2xx 同样抛出 BinanceRestError。
+    """
+    def __init__(self, api_key: str, secret_key: str, env: str = "testnet"):
+        super().__init__(api_key, secret_key, env)
+        self.session = requests.Session()
+        self.session.headers.update({"X-MBX-APIKEY": self.api_key})
+
+    def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, signed: bool = False) -> Any:
+        url = self.base_url + self._build_path(path, params, signed)
+        resp = self.session.request(method, url)
+        if resp.status_code >= 400:
+            try:
+                data = resp.json()
+            except ValueError:
+                data = resp.text
+            code = data.get("code") if isinstance(data, dict) else None
+            msg = data.get("msg") if isinstance(data, dict) else str(data)
+            raise BinanceRestError(resp.status_code, code, msg, path)
+        return resp.json()
+
+    def place_order(self, symbol: str, side: str, quantity: Decimal, price: Optional[Decimal] = None, order_type: str = "LIMIT", time_in_force: str = "GTC", client_order_id: Optional[str] = None,
+                    reduce_only: bool = False, resp_type: Optional[str] = None) -> Any:
+        """下单，自动区分限价单和市价单参数"""
+        params = self._order_params(symbol, side, quantity, price, order_type, time_in_force, client_order_id, reduce_only, resp_type)
         return self._request("POST", "/fapi/v1/order", params, signed=True)
 
+    def modify_order(self, symbol: str, side: str, quantity: Decimal, price: Decimal, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Any:
+        """改单（仅限价单），原地修改价格和数量"""
+        params = self._order_ref_params(symbol, order_id, client_order_id)
+        params.update({"side": side, "quantity": str(quantity), "price": str(price)})
+        return self._request("PUT", "/fapi/v1/order", params, signed=True)
+
+    def cancel_order(self, symbol: str, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Any:
+        """撤销单个挂单"""
+        params = self._order_ref_params(symbol, order_id, client_order_id)
+        return self._request("DELETE", "/fapi/v1/order", params, signed=True)
+
+    def place_batch_orders(self, symbol: str, orders: List[Dict[str, Any]]) -> List[Any]:
+        """批量下单，按每批上限拆分；返回结果与 orders 一一对应，失败项为 {"code", "msg"}"""
+        results: List[Any] = []
+        for chunk in _chunks(orders, BATCH_ORDER_LIMIT):
+            items = [self._batch_order_item(symbol, o) for o in chunk]
+            try:
+                results.extend(self._request("POST", "/fapi/v1/batchOrders", {"batchOrders": _compact_json(items)}, signed=True))
+            except Exception as e:
+                results.extend(self._chunk_error(len(chunk), e))
+        return results
+
+    def modify_batch_orders(self, symbol: str, orders: List[Dict[str, Any]]) -> List[Any]:
+        """批量改单，按每批上限拆分；返回结果与 orders 一一对应"""
+        results: List[Any] = []
+        for chunk in _chunks(orders, BATCH_ORDER_LIMIT):
+            items = [self._batch_modify_item(symbol, o) for o in chunk]
+            try:
+                results.extend(self._request("PUT", "/fapi/v1/batchOrders", {"batchOrders": _compact_json(items)}, signed=True))
+            except Exception as e:
+                results.extend(self._chunk_error(len(chunk), e))
+        return results
+
+    def cancel_batch_orders(self, symbol: str, order_ids: Optional[List[int]] = None, client_order_ids: Optional[List[str]] = None) -> List[Any]:
+        """批量撤单，按每批上限拆分；返回结果与入参一一对应"""
+        results: List[Any] = []
+        for params in self._batch_cancel_params(symbol, order_ids, client_order_ids):
+            size = len(json.loads(params.get("orderIdList") or params["origClientOrderIdList"]))
+            try:
+                results.extend(self._request("DELETE", "/fapi/v1/batchOrders", params, signed=True))
+            except Exception as e:
+                results.extend(self._chunk_error(size, e))
+        return results
+
     def cancel_all_orders(self, symbol: str) -> Any:
         """撤销该交易对所有挂单"""
         params = {"symbol": symbol}
         return self._request("DELETE", "/fapi/v1/allOpenOrders", params, signed=True)
 
-    def get_open_orders(self, symbol: str) -> Any:
-        """查询当前挂单"""
-        params = {"symbol": symbol}
+    def get_open_orders(self, symbol: Optional[str] = None) -> Any:
+        """查询当前挂单；symbol 为空时返回所有交易对的挂单（权重更高）"""
+        params = {"symbol": symbol} if symbol else None
         return self._request("GET", "/fapi/v1/openOrders", params, signed=True)
 
     def get_balance(self) -> Any:
@@ -79,28 +257,243 @@ class BinanceRest:
         """获取账户信息（含总权益、已实现盈亏等）"""
         return self._request("GET", "/fapi/v2/account", signed=True)
 
+    def get_all_positions(self) -> List[dict]:
+        """获取所有交易对的持仓信息（一次请求，多币种对账使用）"""
+        return self._request("GET", "/fapi/v2/positionRisk", signed=True)
+
     def get_position_info(self, symbol: str) -> Any:
         """获取指定交易对持仓信息（含未实现盈亏等）"""
         params = {"symbol": symbol}
         data = self._request("GET", "/fapi/v2/positionRisk", params, signed=True)
-        if isinstance(data, list):
-            for pos in data:
-                if pos.get("symbol") == symbol:
-                    return pos
-        elif isinstance(data, dict) and data.get("symbol") == symbol:
-            return data
-        raise ValueError(f"Position info for {symbol} not found")
+        return self._pick_position(data, symbol)
+
+    def get_depth(self, symbol: str, limit: int = 1000) -> Any:
+        """获取订单簿快照（含 lastUpdateId，用于初始化本地订单簿）"""
+        return self._request("GET", "/fapi/v1/depth", {"symbol": symbol, "limit": limit})
+
+    def create_listen_key(self) -> str:
+        """创建用户数据流 listenKey（有效期60分钟）"""
+        return self._request("POST", "/fapi/v1/listenKey")["listenKey"]
+
+    def keepalive_listen_key(self) -> Any:
+        """延长 listenKey 有效期60分钟"""
+        return self._request("PUT", "/fapi/v1/listenKey")
+
+    def close_listen_key(self) -> Any:
+        """关闭用户数据流"""
+        return self._request("DELETE", "/fapi/v1/listenKey")
+
+    def get_exchange_info(self) -> dict:
+        """获取完整 exchangeInfo（体积较大，常规查询请走 SymbolRulesCache）"""
+        return self._request("GET", "/fapi/v1/exchangeInfo")
 
     def get_symbol_info(self, symbol: str) -> dict:
         """获取交易对的精度和最小下单量等规则"""
-        data = self._request("GET", "/fapi/v1/exchangeInfo")
-        for s in data["symbols"]:
-            if s["symbol"] == symbol:
-                lot_size = next(f for f in s["filters"] if f["filterType"] == "LOT_SIZE")
-                price_filter = next(f for f in s["filters"] if f["filterType"] == "PRICE_FILTER")
-                return {
-                    "step_size": lot_size["stepSize"],
-                    "min_qty": lot_size["minQty"],
-                    "price_tick": price_filter["tickSize"]
-                }
-        raise ValueError(f"Symbol {symbol} not found in exchangeInfo")
+        data = self.get_exchange_info()
+        return self._pick_symbol_info(data, symbol)
+
+class AsyncBinanceRest(_BinanceRestBase):
+    """
+    Binance Future REST API 的 asyncio 版本，接口与 BinanceRest 一致，所有方法均需 await。
+    - 复用同一个 aiohttp 会话与连接池（keep-alive），避免每次请求重新握手
+    - 每个请求都有独立超时，慢请求不会卡住事件循环，行情照常处理
+    - 会话在首次请求时于当前事件循环内惰性创建，退出时需调用 close()
+    - 所有请求经 RestScheduler 按权重与优先级调度（见 utils/rate_limit.py），多交易对共用一个实例即共享预算；
+      调用方用 request_priority() 标记紧急/指标类请求，相同的 GET 请求在途时合并为一次
+    """
+    def __init__(self, api_key: str, secret_key: str, env: str = "testnet", timeout: float = 5.0, pool_size: int = 10, keepalive_timeout: float = 30.0, max_inflight: int = 10, weight_limit: int = 2400, weight_headroom: float = 0.9, scheduler: Optional[RestScheduler] = None):
+        super().__init__(api_key, secret_key, env)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.scheduler = scheduler or RestScheduler(weight_limit=weight_limit, max_inflight=max_inflight, headroom=weight_headroom)
+        # 进行中的 GET 请求，相同请求合并为一次
+        self._pending_gets: Dict[Any, Tuple[int, asyncio.Future]] = {}
+
+    @property
+    def used_weight(self) -> int:
+        return self.scheduler.used_weight
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(
+                base_url=self.base_url,
+                connector=connector,
+                headers={"X-MBX-APIKEY": self.api_key},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, signed: bool = False, timeout: Optional[float] = None) -> Any:
+        """按当前上下文优先级（request_priority）经调度器发送；相同的 GET 请求在途时直接复用其结果"""
+        priority = current_priority()
+        if method != "GET":
+            return await self._send(method, path, params, signed, timeout, priority)
+        key = (path, tuple(sorted((params or {}).items())))
+        pending = self._pending_gets.get(key)
+        # 只合并到优先级不低于自己的请求上，避免紧急请求被排队中的低优先级请求拖住
+        if pending is not None and pending[0] <= priority:
+            return await asyncio.shield(pending[1])
+        task = asyncio.ensure_future(self._send(method, path, params, signed, timeout, priority))
+        self._pending_gets[key] = (priority, task)
+        task.add_done_callback(lambda t: self._pending_gets.pop(key, None) if self._pending_gets.get(key, (None, None))[1] is t else None)
+        return await asyncio.shield(task)
+
+    async def _send(self, method: str, path: str, params: Optional[Dict[str, Any]], signed: bool, timeout: Optional[float], priority: int) -> Any:
+        weight = endpoint_weight(method, path, params)
+        batch = params.get("batchOrders") if params else None
+        orders = endpoint_order_count(method, path, len(json.loads(batch)) if batch else 1)
+        # 紧急请求遇到 429 时在退避结束后重试（紧急请求本身不受退避限制，这里额外等待以免升级为 418 封禁）
+        attempts = 3 if priority <= PRIORITY_EMERGENCY else 1
+        latency = REST_LATENCY.labels(method, path)
+        # 挂单决策的延迟追踪（见 utils/tracing.py），由 OrderManager 经任务上下文传入
+        trace = current_trace.get()
+        for attempt in range(1, attempts + 1):
+            queued_at = time.perf_counter()
+            window = await self.scheduler.acquire(priority, weight, orders)
+            started = time.perf_counter()
+            REST_QUEUE_WAIT.observe(started - queued_at)
+            try:
+                session = self._get_session()
+                req_timeout = aiohttp.ClientTimeout(total=timeout) if timeout is not None else None
+                # 签名放在拿到发送名额之后，排队等待不会导致 timestamp 过期
+                signing = time.perf_counter()
+                request_path = self._build_path(path, params, signed)
+                if trace is not None:
+                    trace.on_request(signing, time.perf_counter() - signing)
+                async with session.request(method, request_path, timeout=req_timeout) as resp:
+                    self.scheduler.on_response(resp.status, resp.headers, window)
+                    try:
+                        data = await resp.json(content_type=None)
+                    except ValueError:
+                        # 网关返回的 HTML 错误页（502/503、418 封禁页等）不是 JSON，按原文交给下面的错误处理
+                        data = (await resp.text())[:500]
+                        if resp.status < 400:
+                            REST_ERRORS.labels(method, path, "invalid_json").inc()
+                            raise BinanceRestError(resp.status, None, f"响应不是 JSON: {data}", path)
+                    finished = time.perf_counter()
+                    latency.observe(finished - started)
+                    if trace is not None:
+                        trace.on_response(finished, resp.status, data)
+                    if resp.status >= 400:
+                        REST_ERRORS.labels(method, path, resp.status).inc()
+                        code = data.get("code") if isinstance(data, dict) else None
+                        msg = data.get("msg") if isinstance(data, dict) else str(data)
+                        if resp.status == 429 and attempt < attempts:
+                            wait = max(self.scheduler.backoff_until - time.time(), 0.5)
+                            print(f"[AsyncBinanceRest] 紧急请求 {method} {path} 被限频，{wait:.1f}s 后重试")
+                            await asyncio.sleep(wait)
+                            continue
+                        raise BinanceRestError(resp.status, code, msg, path)
+                    return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                REST_ERRORS.labels(method, path, type(e).__name__).inc()
+                raise
+            finally:
+                self.scheduler.release()
+
+    async def close(self):
+        """关闭 HTTP 会话与连接池"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def place_order(self, symbol: str, side: str, quantity: Decimal, price: Optional[Decimal] = None, order_type: str = "LIMIT", time_in_force: str = "GTC", client_order_id: Optional[str] = None,
+                          reduce_only: bool = False, resp_type: Optional[str] = None) -> Any:
+        """下单，自动区分限价单和市价单参数"""
+        params = self._order_params(symbol, side, quantity, price, order_type, time_in_force, client_order_id, reduce_only, resp_type)
+        return await self._request("POST", "/fapi/v1/order", params, signed=True)
+
+    async def modify_order(self, symbol: str, side: str, quantity: Decimal, price: Decimal, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Any:
+        """改单（仅限价单），原地修改价格和数量"""
+        params = self._order_ref_params(symbol, order_id, client_order_id)
+        params.update({"side": side, "quantity": str(quantity), "price": str(price)})
+        return await self._request("PUT", "/fapi/v1/order", params, signed=True)
+
+    async def cancel_order(self, symbol: str, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Any:
+        """撤销单个挂单"""
+        params = self._order_ref_params(symbol, order_id, client_order_id)
+        return await self._request("DELETE", "/fapi/v1/order", params, signed=True)
+
+    async def _batch(self, method: str, param_chunks: List[Dict[str, Any]], sizes: List[int]) -> List[Any]:
+        """各批次并发发送，整体只需一个往返；结果按原顺序拼接"""
+        async def send(params, size):
+            try:
+                return await self._request(method, "/fapi/v1/batchOrders", params, signed=True)
+            except Exception as e:
+                return self._chunk_error(size, e)
+        chunk_results = await asyncio.gather(*(send(p, n) for p, n in zip(param_chunks, sizes)))
+        return [r for chunk in chunk_results for r in chunk]
+
+    async def place_batch_orders(self, symbol: str, orders: List[Dict[str, Any]]) -> List[Any]:
+        """批量下单，按每批上限拆分并发发送；返回结果与 orders 一一对应，失败项为 {"code", "msg"}"""
+        chunks = _chunks(orders, BATCH_ORDER_LIMIT)
+        params = [{"batchOrders": _compact_json([self._batch_order_item(symbol, o) for o in c])} for c in chunks]
+        return await self._batch("POST", params, [len(c) for c in chunks])
+
+    async def modify_batch_orders(self, symbol: str, orders: List[Dict[str, Any]]) -> List[Any]:
+        """批量改单，按每批上限拆分并发发送；返回结果与 orders 一一对应"""
+        chunks = _chunks(orders, BATCH_ORDER_LIMIT)
+        params = [{"batchOrders": _compact_json([self._batch_modify_item(symbol, o) for o in c])} for c in chunks]
+        return await self._batch("PUT", params, [len(c) for c in chunks])
+
+    async def cancel_batch_orders(self, symbol: str, order_ids: Optional[List[int]] = None, client_order_ids: Optional[List[str]] = None) -> List[Any]:
+        """批量撤单，按每批上限拆分并发发送；返回结果与入参一一对应"""
+        params = self._batch_cancel_params(symbol, order_ids, client_order_ids)
+        sizes = [len(json.loads(p.get("orderIdList") or p["origClientOrderIdList"])) for p in params]
+        return await self._batch("DELETE", params, sizes)
+
+    async def cancel_all_orders(self, symbol: str) -> Any:
+        """撤销该交易对所有挂单"""
+        params = {"symbol": symbol}
+        return await self._request("DELETE", "/fapi/v1/allOpenOrders", params, signed=True)
+
+    async def get_open_orders(self, symbol: Optional[str] = None) -> Any:
+        """查询当前挂单；symbol 为空时返回所有交易对的挂单（权重更高）"""
+        params = {"symbol": symbol} if symbol else None
+        return await self._request("GET", "/fapi/v1/openOrders", params, signed=True)
+
+    async def get_balance(self) -> Any:
+        """查询账户余额（USDT等）"""
+        return await self._request("GET", "/fapi/v2/balance", signed=True)
+
+    async def get_account_info(self) -> Any:
+        """获取账户信息（含总权益、已实现盈亏等）"""
+        return await self._request("GET", "/fapi/v2/account", signed=True)
+
+    async def get_all_positions(self) -> List[dict]:
+        """获取所有交易对的持仓信息（一次请求，多币种对账使用）"""
+        return await self._request("GET", "/fapi/v2/positionRisk", signed=True)
+
+    async def get_position_info(self, symbol: str) -> Any:
+        """获取指定交易对持仓信息（含未实现盈亏等）"""
+        params = {"symbol": symbol}
+        data = await self._request("GET", "/fapi/v2/positionRisk", params, signed=True)
+        return self._pick_position(data, symbol)
+
+    async def get_depth(self, symbol: str, limit: int = 1000) -> Any:
+        """获取订单簿快照（含 lastUpdateId，用于初始化本地订单簿）"""
+        return await self._request("GET", "/fapi/v1/depth", {"symbol": symbol, "limit": limit})
+
+    async def create_listen_key(self) -> str:
+        """创建用户数据流 listenKey（有效期60分钟）"""
+        return (await self._request("POST", "/fapi/v1/listenKey"))["listenKey"]
+
+    async def keepalive_listen_key(self) -> Any:
+        """延长 listenKey 有效期60分钟"""
+        return await self._request("PUT", "/fapi/v1/listenKey")
+
+    async def close_listen_key(self) -> Any:
+        """关闭用户数据流"""
+        return await self._request("DELETE", "/fapi/v1/listenKey")
+
+    async def get_exchange_info(self) -> dict:
+        """获取完整 exchangeInfo（体积较大，常规查询请走 SymbolRulesCache）"""
+        return await self._request("GET", "/fapi/v1/exchangeInfo")
+
+    async def get_symbol_info(self, symbol: str) -> dict:
+        """获取交易对的精度和最小下单量等规则"""
+        data = await self.get_exchange_info()
+        return self._pick_symbol_info(data, symbol)
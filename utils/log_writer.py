@@ -0,0 +1,169 @@
+import csv
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+class BufferedCsvWriter:
+    """
+    后台线程批量写 CSV：
+    - write() 只把行放进有界内存队列，从不阻塞调用方（事件循环中的报价、风控协程）
+    - 队列满时丢弃新行并计数（显式背压），磁盘卡顿只会导致丢日志，不会拖慢交易
+    - 写线程攒批写入，满 batch_size 条或距上次刷盘超过 flush_interval 秒时 flush
+    - 按行入队时的本地日期写入 {prefix}-{YYYYMMDD}.csv，跨零点自动切换文件
+    - echo 非空时写入的同时在写线程中打印每一行（echo 为打印前缀）
+    """
+    def __init__(self, directory: str, prefix: str, fieldnames: Sequence[str], max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, echo: Optional[str] = None, name: Optional[str] = None):
+        self.directory = directory
+        self.prefix = prefix
+        self.fieldnames = list(fieldnames)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.echo = echo
+        self.name = name or prefix
+        self.queue: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue(maxsize=max_queue)
+        self.path: Optional[str] = None
+        self._file = None
+        self._writer = None
+        self._day: Optional[str] = None
+        self._closed = False
+        # 统计
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.max_depth = 0
+        self.last_flush_seconds = 0.0
+        self._last_drop_report = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"csv-writer-{self.name}", daemon=True)
+        self._thread.start()
+
+    def write(self, row: Dict[str, Any], day: Optional[str] = None) -> bool:
+        """非阻塞入队；队列已满或已关闭时丢弃并返回 False。day 为文件日期（YYYYMMDD），默认取当前本地日期"""
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait((day or datetime.now().strftime("%Y%m%d"), row))
+        except queue.Full:
+            self.dropped += 1
+            now = time.monotonic()
+            if now - self._last_drop_report >= 10:
+                self._last_drop_report = now
+                print(f"[BufferedCsvWriter] {self.name} 写入队列已满，已丢弃 {self.dropped} 行")
+            return False
+        self.enqueued += 1
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def write_many(self, rows: List[Dict[str, Any]], day: Optional[str] = None) -> int:
+        """批量入队，返回成功入队的行数"""
+        day = day or datetime.now().strftime("%Y%m%d")
+        return sum(1 for row in rows if self.write(row, day))
+
+    def _run(self):
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        batch_started = 0.0
+        while True:
+            # 空闲时阻塞等待；已有待写行时最多等到本批攒满 flush_interval
+            timeout = self.flush_interval if not batch else max(0.0, batch_started + self.flush_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            while item:
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                # 已在队列中的行一次取完，减少唤醒次数
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = ()
+            if item is None:
+                self._write_batch(batch)
+                self._close_file()
+                return
+            if batch and (len(batch) >= self.batch_size or time.monotonic() - batch_started >= self.flush_interval):
+                self._write_batch(batch)
+                batch = []
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        if not batch:
+            return
+        started = time.monotonic()
+        try:
+            for day, row in batch:
+                if day != self._day:
+                    self._rotate(day)
+                self._writer.writerow(row)
+                if self.echo:
+                    # 回显也在写线程中完成，终端输出阻塞不影响调用方
+                    print(f"{self.echo}: {row}")
+            self._file.flush()
+            self.written += len(batch)
+            self.flushes += 1
+        except (OSError, ValueError) as e:
+            # 磁盘异常时丢弃本批，下批重新打开文件
+            self.write_errors += 1
+            self.dropped += len(batch)
+            print(f"[BufferedCsvWriter] {self.name} 写入失败，丢弃 {len(batch)} 行: {e}")
+            self._close_file()
+        self.last_flush_seconds = time.monotonic() - started
+
+    def _rotate(self, day: str):
+        if self._day is not None:
+            self.rotations += 1
+        self._close_file()
+        self.path = os.path.join(self.directory, f"{self.prefix}-{day}.csv")
+        file_exists = os.path.isfile(self.path) and os.path.getsize(self.path) > 0
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction="ignore")
+        if not file_exists:
+            self._writer.writeheader()
+        self._day = day
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+        self._writer = None
+        self._day = None
+
+    def close(self, timeout: float = 5.0):
+        """停止接收新行，写完队列中的剩余行后关闭文件（最多等待 timeout 秒）"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            print(f"[BufferedCsvWriter] {self.name} 关闭时队列仍满，剩余日志可能未写入")
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
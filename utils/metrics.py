@@ -0,0 +1,308 @@
+import asyncio
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 直方图内部精度：每个 2 的幂区间再等分为 16 个子桶（相对误差约 6%），记录单位为微秒
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# 最大可区分 2^36 微秒（约 19 小时），超出的值计入最后一个桶
+MAX_EXPONENT = 36
+FINE_BUCKETS = (MAX_EXPONENT + 2) * SUB_BUCKETS
+# /metrics 导出的桶边界（秒）：50µs ~ 10s 的 1-2-5 序列，由内部细粒度桶汇总得到
+EXPORT_BOUNDS = (
+    0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+    0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0,
+)
+
+def _bucket_index(us: int) -> int:
+    """微秒值所在的细粒度桶：小于 2*SUB_BUCKETS 时每微秒一个桶，之后按指数 + 高位尾数定位"""
+    if us < 2 * SUB_BUCKETS:
+        return us if us > 0 else 0
+    shift = us.bit_length() - SUB_BUCKET_BITS - 1
+    if shift > MAX_EXPONENT:
+        return FINE_BUCKETS - 1
+    return (shift << SUB_BUCKET_BITS) + (us >> shift)
+
+def _bucket_upper(index: int) -> int:
+    """细粒度桶的上界（微秒，不含）"""
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return (mantissa + 1) << shift
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """抓取时调用 function() 取值（用于队列深度等已有统计，热路径零开销）"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+        return self.value
+
+class _HistogramChild:
+    """
+    HDR 风格直方图：对数分桶 + 桶内线性子桶，observe() 只做一次整数换算和数组自增，
+    分位数与导出时的桶汇总都在抓取时计算
+    """
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * FINE_BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[_bucket_index(int(seconds * 1e6))] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def time(self) -> "_Timer":
+        """with hist.time(): ... 记录代码块耗时"""
+        return _Timer(self)
+
+    def quantile(self, q: float) -> float:
+        """近似分位数（秒），取所在细粒度桶的上界"""
+        if self.count == 0:
+            return 0.0
+        target = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(_bucket_upper(index) / 1e6, self.max)
+        return self.max
+
+    def export_buckets(self) -> List[Tuple[float, int]]:
+        """按 EXPORT_BOUNDS 汇总的累计计数 [(le, count)]，最后一项为 +Inf"""
+        result = []
+        seen = 0
+        index = 0
+        for bound in EXPORT_BOUNDS:
+            limit = int(bound * 1e6)
+            while index < FINE_BUCKETS and _bucket_upper(index) <= limit:
+                seen += self.counts[index]
+                index += 1
+            result.append((bound, seen))
+        result.append((math.inf, self.count))
+        return result
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: _HistogramChild):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class Metric:
+    """
+    指标族：同名指标按标签值区分子序列。
+    无标签时直接调用 inc()/set()/observe()；有标签时先 labels(...) 取子序列，
+    热路径上建议把 labels() 的结果缓存起来复用
+    """
+    child_class = None
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际传入 {key}")
+            child = self._children[key] = self.child_class()
+        return child
+
+    def __getattr__(self, item):
+        # 无标签指标直接转发到默认子序列（inc/set/observe/time 等）
+        if item.startswith("_") or "_default" not in self.__dict__:
+            raise AttributeError(item)
+        return getattr(self._default, item)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._expose_child(values, child))
+        return lines
+
+    def _expose_child(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    child_class = _CounterChild
+    kind = "counter"
+
+    def _expose_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+class Gauge(Metric):
+    child_class = _GaugeChild
+    kind = "gauge"
+
+    def _expose_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+class Histogram(Metric):
+    child_class = _HistogramChild
+    kind = "histogram"
+
+    def _expose_child(self, values, child):
+        lines = []
+        for le, n in child.export_buckets():
+            bucket_labels = _format_labels(self.labelnames, values, 'le="%s"' % _format_value(le))
+            lines.append(f"{self.name}_bucket{bucket_labels} {n}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    进程内指标注册表：同名指标只创建一次（重复注册返回已有实例），
+    expose() 生成 Prometheus 文本格式（text/plain; version=0.0.4）
+    """
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get(self, cls, name: str, documentation: str, labelnames: Sequence[str]):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, documentation, labelnames)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Histogram:
+        return self._get(Histogram, name, documentation, labelnames)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+# 进程级默认注册表，各模块在模块级定义自己的指标
+registry = MetricsRegistry()
+
+# 事件循环卡顿：定时 sleep 的实际唤醒延迟（由 core.recovery.LoopWatchdog 采样）
+LOOP_LAG = registry.histogram("pmm_event_loop_lag_seconds", "事件循环调度延迟（定时唤醒的实际超时）")
+LOOP_LAG_LAST = registry.gauge("pmm_event_loop_lag_last_seconds", "最近一次测得的事件循环调度延迟")
+
+class MetricsServer:
+    """
+    本地 HTTP 指标端点：GET /metrics 返回 Prometheus 文本格式，其他路径返回 404。
+    基于 asyncio.start_server，与交易协程共用事件循环；指标在抓取时才汇总，记录侧无锁、无 I/O
+    """
+    def __init__(self, metrics: MetricsRegistry = registry, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = metrics
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.scrapes = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 时取系统分配的端口
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"[MetricsServer] 指标端点已启动: http://{self.host}:{self.port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读完请求头（不关心内容）
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+            if len(parts) >= 2 and parts[0] == "GET" and path == "/metrics":
+                self.scrapes += 1
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", self.registry.expose().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
@@ -0,0 +1,329 @@
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 表结构：全部为强类型列，时间戳 ts 为 Unix 秒；(symbol, ts) 与 ts 索引使按交易对/时间范围的查询只扫描命中区间
+SCHEMA = {
+    "account_metrics": (
+        ("ts", "REAL NOT NULL"),
+        ("symbol", "TEXT NOT NULL"),
+        ("equity", "REAL"),
+        ("realized_pnl", "REAL"),
+        ("unrealized_pnl", "REAL"),
+        ("position", "REAL"),
+        ("mark_price", "REAL"),
+        ("bid_orders", "INTEGER"),
+        ("ask_orders", "INTEGER"),
+    ),
+    "orders": (
+        ("ts", "REAL NOT NULL"),
+        ("symbol", "TEXT NOT NULL"),
+        ("order_id", "INTEGER"),
+        ("client_order_id", "TEXT"),
+        ("side", "TEXT"),
+        ("execution_type", "TEXT"),
+        ("status", "TEXT"),
+        ("price", "REAL"),
+        ("quantity", "REAL"),
+        ("filled_quantity", "REAL"),
+    ),
+    "fills": (
+        ("ts", "REAL NOT NULL"),
+        ("symbol", "TEXT NOT NULL"),
+        ("order_id", "INTEGER"),
+        ("client_order_id", "TEXT"),
+        ("side", "TEXT"),
+        ("price", "REAL"),
+        ("quantity", "REAL"),
+        ("realized_pnl", "REAL"),
+        ("commission", "REAL"),
+        ("commission_asset", "TEXT"),
+        ("maker", "INTEGER"),
+    ),
+    "events": (
+        ("ts", "REAL NOT NULL"),
+        ("symbol", "TEXT"),
+        ("event_type", "TEXT"),
+        ("details", "TEXT"),
+        ("extra", "TEXT"),
+    ),
+}
+
+def _insert_sql(table: str) -> str:
+    columns = [c for c, _ in SCHEMA[table]]
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+def connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    """打开指标库：写连接启用 WAL（读写互不阻塞），只读连接供查询工具使用"""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for table, columns in SCHEMA.items():
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{c} {t}' for c, t in columns)})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_symbol_ts ON {table} (symbol, ts)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (ts)")
+        conn.commit()
+    return conn
+
+def _float(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class MetricsStore:
+    """
+    SQLite（WAL 模式）指标库：
+    - 账户指标、订单状态变化、成交、事件分表存储，字段为强类型列，查询无需再解析字符串
+    - 记录接口只把行放入有界队列，后台线程按表 executemany 批量写入，一批一个事务；
+      队列满时丢弃并计数，与 BufferedCsvWriter 一样不阻塞交易协程
+    """
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 1000, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self._closed = False
+        # 建表在调用线程完成，路径或权限错误在启动时即暴露
+        connect(path).close()
+        self._thread = threading.Thread(target=self._run, name="metrics-store", daemon=True)
+        self._thread.start()
+
+    def _put(self, table: str, row: tuple) -> bool:
+        if self._closed:
+            return False
+        try:
+            self.queue.put_nowait((table, row))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def record_metrics(self, symbol: str, equity=None, realized_pnl=None, unrealized_pnl=None, position=None, mark_price=None,
+                       bid_orders: Optional[int] = None, ask_orders: Optional[int] = None, ts: Optional[float] = None) -> bool:
+        return self._put("account_metrics", (
+            ts or time.time(), symbol, _float(equity), _float(realized_pnl), _float(unrealized_pnl), _float(position),
+            _float(mark_price), bid_orders, ask_orders,
+        ))
+
+    def record_order_update(self, o: Dict[str, Any]) -> bool:
+        """记录 ORDER_TRADE_UPDATE 中的订单状态变化；成交（x=TRADE）同时写入 fills 表"""
+        ts = (o.get("T") or 0) / 1000 or time.time()
+        ok = self._put("orders", (
+            ts, o.get("s"), o.get("i"), o.get("c"), o.get("S"), o.get("x"), o.get("X"),
+            _float(o.get("p")), _float(o.get("q")), _float(o.get("z")),
+        ))
+        if o.get("x") == "TRADE":
+            ok = self._put("fills", (
+                ts, o.get("s"), o.get("i"), o.get("c"), o.get("S"), _float(o.get("L")), _float(o.get("l")),
+                _float(o.get("rp")), _float(o.get("n")), o.get("N"), 1 if o.get("m") else 0,
+            )) and ok
+        return ok
+
+    def record_event(self, event_type: str, details: str, extra: str = "", symbol: Optional[str] = None, ts: Optional[float] = None) -> bool:
+        return self._put("events", (ts or time.time(), symbol, event_type, details, extra))
+
+    def _run(self):
+        conn = connect(self.path)
+        sql = {table: _insert_sql(table) for table in SCHEMA}
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = [item]
+                while item is not None and len(batch) < self.batch_size:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+                stop = batch[-1] is None
+                rows: Dict[str, List[tuple]] = {}
+                for entry in batch:
+                    if entry is not None:
+                        rows.setdefault(entry[0], []).append(entry[1])
+                try:
+                    with conn:
+                        for table, values in rows.items():
+                            conn.executemany(sql[table], values)
+                    self.written += sum(len(v) for v in rows.values())
+                except sqlite3.Error as e:
+                    self.write_errors += 1
+                    self.dropped += sum(len(v) for v in rows.values())
+                    print(f"[MetricsStore] 写入失败，丢弃 {sum(len(v) for v in rows.values())} 行: {e}")
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def close(self, timeout: float = 5.0):
+        """写完队列中剩余的记录后关闭"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            print("[MetricsStore] 关闭时队列仍满，剩余记录可能未写入")
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queue_depth": self.queue.qsize(), "written": self.written, "dropped": self.dropped, "write_errors": self.write_errors}
+
+# ---------------- 查询 ----------------
+
+def _where(symbol: Optional[str], start: Optional[float], end: Optional[float]) -> Tuple[str, list]:
+    """生成 WHERE 子句：条件全部落在 (symbol, ts) 索引上，只读取命中的时间区间"""
+    clauses, params = [], []
+    if symbol:
+        clauses.append("symbol = ?")
+        params.append(symbol.upper())
+    if start is not None:
+        clauses.append("ts >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("ts < ?")
+        params.append(end)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def query_pnl(conn: sqlite3.Connection, bucket: float, symbol=None, start=None, end=None) -> List[tuple]:
+    """每个时间桶末尾的净值与盈亏（SQLite 中 MAX() 聚合的裸列取自最大值所在行）"""
+    where, params = _where(symbol, start, end)
+    return conn.execute(
+        f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, symbol, MAX(ts), equity, realized_pnl, unrealized_pnl "
+        f"FROM account_metrics{where} GROUP BY bucket, symbol ORDER BY bucket, symbol",
+        [bucket, bucket] + params,
+    ).fetchall()
+
+def query_inventory(conn: sqlite3.Connection, bucket: float, symbol=None, start=None, end=None) -> List[tuple]:
+    where, params = _where(symbol, start, end)
+    return conn.execute(
+        f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, symbol, AVG(position), MIN(position), MAX(position), AVG(ABS(position)) "
+        f"FROM account_metrics{where} GROUP BY bucket, symbol ORDER BY bucket, symbol",
+        [bucket, bucket] + params,
+    ).fetchall()
+
+def query_fills(conn: sqlite3.Connection, bucket: float, symbol=None, start=None, end=None) -> List[tuple]:
+    """每个时间桶的新挂单数、成交笔数、成交订单数、成交率（有成交的订单 / 新挂单）、成交量与 maker 占比"""
+    where, params = _where(symbol, start, end)
+    orders = {
+        (b, s): (placed, filled) for b, s, placed, filled in conn.execute(
+            f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, symbol, "
+            f"SUM(execution_type = 'NEW'), COUNT(DISTINCT CASE WHEN execution_type = 'TRADE' THEN order_id END) "
+            f"FROM orders{where} GROUP BY bucket, symbol",
+            [bucket, bucket] + params,
+        )
+    }
+    fills = {
+        (b, s): rest for b, s, *rest in conn.execute(
+            f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, symbol, COUNT(*), SUM(quantity), SUM(price * quantity), AVG(maker), "
+            f"SUM(realized_pnl), SUM(commission) FROM fills{where} GROUP BY bucket, symbol",
+            [bucket, bucket] + params,
+        )
+    }
+    rows = []
+    for key in sorted(set(orders) | set(fills)):
+        placed, filled = orders.get(key, (0, 0))
+        count, volume, notional, maker_ratio, realized, commission = fills.get(key, (0, 0.0, 0.0, None, 0.0, 0.0))
+        rows.append(key + (placed, count, filled, filled / placed if placed else None, volume, notional, maker_ratio, realized, commission))
+    return rows
+
+def query_uptime(conn: sqlite3.Connection, bucket: float, symbol=None, start=None, end=None) -> List[tuple]:
+    """报价在线率：采样点中买卖两侧都有挂单的比例（以及单侧有挂单的比例）"""
+    where, params = _where(symbol, start, end)
+    where += (" AND " if where else " WHERE ") + "bid_orders IS NOT NULL"
+    return conn.execute(
+        f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, symbol, COUNT(*), "
+        f"AVG(bid_orders > 0 AND ask_orders > 0), AVG(bid_orders > 0 OR ask_orders > 0) "
+        f"FROM account_metrics{where} GROUP BY bucket, symbol ORDER BY bucket, symbol",
+        [bucket, bucket] + params,
+    ).fetchall()
+
+QUERIES = {
+    "pnl": (query_pnl, ("bucket", "symbol", "last_ts", "equity", "realized_pnl", "unrealized_pnl")),
+    "inventory": (query_inventory, ("bucket", "symbol", "avg_position", "min_position", "max_position", "avg_abs_position")),
+    "fills": (query_fills, ("bucket", "symbol", "orders_placed", "fills", "orders_filled", "fill_rate", "volume", "notional", "maker_ratio", "realized_pnl", "commission")),
+    "uptime": (query_uptime, ("bucket", "symbol", "samples", "two_sided", "any_side")),
+}
+
+def parse_duration(text: str) -> float:
+    """解析时间桶长度：30s / 5m / 1h / 1d，或纯数字秒"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+def parse_time(text: Optional[str]) -> Optional[float]:
+    """解析时间：Unix 秒、ISO 日期时间（无时区时按 UTC），或相对当前的时长（如 1h 表示一小时前）"""
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    if text[-1:] in "smhd" and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - parse_duration(text)
+    dt = datetime.fromisoformat(text)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def _format(value: Any, column: str) -> str:
+    if value is None:
+        return "-"
+    if column == "bucket":
+        return datetime.fromtimestamp(value, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    if column == "last_ts":
+        return datetime.fromtimestamp(value, tz=timezone.utc).strftime("%H:%M:%S")
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+def print_table(columns: Sequence[str], rows: List[tuple]):
+    cells = [list(columns)] + [[_format(v, c) for v, c in zip(row, columns)] for row in rows]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(columns))]
+    for r in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(r, widths)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询指标库：按时间桶聚合盈亏、持仓、成交率与报价在线率")
+    parser.add_argument("db", help="指标库路径（logging.metrics_db）")
+    parser.add_argument("query", choices=sorted(QUERIES), help="查询类型")
+    parser.add_argument("--symbol", help="交易对")
+    parser.add_argument("--since", help="开始时间（Unix 秒、ISO 时间（UTC）或相对时长如 6h）")
+    parser.add_argument("--until", help="结束时间（不含）")
+    parser.add_argument("--bucket", default="1h", help="时间桶长度，如 5m/1h/1d")
+    parser.add_argument("--csv", action="store_true", help="以 CSV 输出")
+    args = parser.parse_args(argv)
+    fn, columns = QUERIES[args.query]
+    conn = connect(args.db, readonly=True)
+    try:
+        rows = fn(conn, parse_duration(args.bucket), args.symbol, parse_time(args.since), parse_time(args.until))
+    finally:
+        conn.close()
+    if args.csv:
+        print(",".join(columns))
+        for row in rows:
+            print(",".join("" if v is None else str(v) for v in row))
+    else:
+        print_table(columns, rows)
+
+if __name__ == "__main__":
+    main()
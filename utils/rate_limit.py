@@ -0,0 +1,252 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 请求优先级（数值越小越优先）
+PRIORITY_EMERGENCY = 0   # 紧急撤单/平仓：不受并发上限与 429 退避限制，可用满全部权重
+PRIORITY_QUOTE = 1       # 报价相关（下单/改单/撤单/对账），默认优先级
+PRIORITY_METRICS = 2     # 指标采集/仓位轮询：预算紧张时直接丢弃，不排队等待
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("rest_priority", default=PRIORITY_QUOTE)
+
+@contextmanager
+def request_priority(priority: int):
+    """在当前任务上下文内设置 REST 请求优先级，例如：with request_priority(PRIORITY_EMERGENCY): ..."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+def _depth_weight(params: Dict[str, Any]) -> int:
+    limit = int(params.get("limit", 500))
+    if limit <= 50:
+        return 2
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 10
+    return 20
+
+# 各接口请求权重（Binance 合约文档），未列出的接口按 1 计
+ENDPOINT_WEIGHTS: Dict[Tuple[str, str], Any] = {
+    ("POST", "/fapi/v1/order"): 1,
+    ("PUT", "/fapi/v1/order"): 1,
+    ("DELETE", "/fapi/v1/order"): 1,
+    ("POST", "/fapi/v1/batchOrders"): 5,
+    ("PUT", "/fapi/v1/batchOrders"): 5,
+    ("DELETE", "/fapi/v1/batchOrders"): 1,
+    ("DELETE", "/fapi/v1/allOpenOrders"): 1,
+    ("GET", "/fapi/v1/openOrders"): lambda params: 1 if params.get("symbol") else 40,
+    ("GET", "/fapi/v2/balance"): 5,
+    ("GET", "/fapi/v2/account"): 5,
+    ("GET", "/fapi/v2/positionRisk"): 5,
+    ("GET", "/fapi/v1/depth"): _depth_weight,
+    ("GET", "/fapi/v1/exchangeInfo"): 1,
+}
+
+# 计入下单频率（X-MBX-ORDER-COUNT-*）的接口
+ORDER_ENDPOINTS = {("POST", "/fapi/v1/order"), ("PUT", "/fapi/v1/order"), ("POST", "/fapi/v1/batchOrders"), ("PUT", "/fapi/v1/batchOrders")}
+
+def endpoint_weight(method: str, path: str, params: Optional[Dict[str, Any]] = None) -> int:
+    weight = ENDPOINT_WEIGHTS.get((method, path), 1)
+    return weight(params or {}) if callable(weight) else weight
+
+def endpoint_order_count(method: str, path: str, batch_size: int = 1) -> int:
+    return batch_size if (method, path) in ORDER_ENDPOINTS else 0
+
+class RequestShedError(Exception):
+    """低优先级请求在预算紧张时被丢弃"""
+
+class RestScheduler:
+    """
+    REST 请求调度器（令牌桶 + 优先级队列）：
+    - 本地按自然分钟累计请求权重，发送前预扣，响应后用 X-MBX-USED-WEIGHT-1M 校正（取较大值，兼容同 IP 的其他进程）
+    - 下单类请求同时按 X-MBX-ORDER-COUNT-10S / -1M 控制下单频率
+    - 等待中的请求按优先级出队：紧急 > 报价 > 指标；指标类在预算紧张时直接丢弃（RequestShedError）
+    - 收到 429 时按 Retry-After 退避（缺省指数退避），期间仅放行紧急请求；418 封禁期间全部暂停
+    """
+    def __init__(self, weight_limit: int = 2400, max_inflight: int = 10, headroom: float = 0.9, shed_ratio: float = 0.7,
+                 order_limit_10s: int = 300, order_limit_1m: int = 1200, clock: Callable[[], float] = time.time):
+        self.weight_limit = weight_limit
+        self.max_inflight = max_inflight
+        self.headroom = headroom
+        self.shed_ratio = shed_ratio
+        self.order_limit_10s = order_limit_10s
+        self.order_limit_1m = order_limit_1m
+        self.clock = clock
+        self.inflight = 0
+        self.used_weight = 0
+        self.order_count_10s = 0
+        self.order_count_1m = 0
+        self.backoff_until = 0.0
+        self.banned_until = 0.0
+        self._backoff = 0.0
+        self._minute = int(clock() // 60)
+        self._ten_sec = int(clock() // 10)
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # 统计
+        self.shed_count = 0
+        self.throttled_count = 0
+        self.rate_limited_count = 0
+
+    def _roll(self, now: float):
+        """跨过自然分钟/10秒窗口时清零本地计数（与交易所窗口对齐）"""
+        minute = int(now // 60)
+        if minute != self._minute:
+            self._minute = minute
+            self.used_weight = 0
+            self.order_count_1m = 0
+        ten_sec = int(now // 10)
+        if ten_sec != self._ten_sec:
+            self._ten_sec = ten_sec
+            self.order_count_10s = 0
+
+    def _weight_budget(self, priority: int) -> float:
+        if priority <= PRIORITY_EMERGENCY:
+            return self.weight_limit
+        if priority == PRIORITY_QUOTE:
+            return self.weight_limit * self.headroom
+        return self.weight_limit * self.shed_ratio
+
+    def _delay(self, priority: int, weight: int, orders: int, now: float) -> float:
+        """距离该请求可以发送还需等待的秒数，0 表示可立即发送"""
+        if now < self.banned_until:
+            return self.banned_until - now
+        if priority > PRIORITY_EMERGENCY and now < self.backoff_until:
+            return self.backoff_until - now
+        if self.used_weight + weight > self._weight_budget(priority):
+            return 60 - now % 60
+        if orders:
+            ratio = 1.0 if priority <= PRIORITY_EMERGENCY else self.headroom
+            if self.order_count_10s + orders > self.order_limit_10s * ratio:
+                return 10 - now % 10
+            if self.order_count_1m + orders > self.order_limit_1m * ratio:
+                return 60 - now % 60
+        return 0.0
+
+    async def acquire(self, priority: int, weight: int, orders: int = 0) -> int:
+        """排队获取发送名额，返回本次请求所在的分钟窗口（用于响应头校正）"""
+        now = self.clock()
+        self._roll(now)
+        if priority >= PRIORITY_METRICS and self._delay(priority, weight, orders, now) > 0:
+            self.shed_count += 1
+            raise RequestShedError(f"权重预算紧张，丢弃低优先级请求（已用 {self.used_weight}/{self.weight_limit}）")
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), weight, orders, fut))
+        self._dispatch()
+        try:
+            return await fut
+        except asyncio.CancelledError:
+            # 已分配名额但调用方被取消，归还名额；未分配的在出队时跳过
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.inflight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """按优先级放行排队请求，队首需要等待时设置定时器到期后再调度"""
+        now = self.clock()
+        self._roll(now)
+        while self._waiters:
+            priority, _, weight, orders, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if priority > PRIORITY_EMERGENCY and self.inflight >= self.max_inflight:
+                break
+            delay = self._delay(priority, weight, orders, now)
+            if delay > 0:
+                if priority >= PRIORITY_METRICS:
+                    heapq.heappop(self._waiters)
+                    self.shed_count += 1
+                    fut.set_exception(RequestShedError(f"权重预算紧张，丢弃排队中的低优先级请求（已用 {self.used_weight}/{self.weight_limit}）"))
+                    continue
+                self.throttled_count += 1
+                self._schedule(delay)
+                break
+            heapq.heappop(self._waiters)
+            self.inflight += 1
+            self.used_weight += weight
+            self.order_count_10s += orders
+            self.order_count_1m += orders
+            fut.set_result(self._minute)
+
+    def _schedule(self, delay: float):
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay + 0.05
+        if self._timer is not None:
+            if self._timer.when() <= when:
+                return
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def on_response(self, status: int, headers, window: int):
+        """用响应头校正本地计数；429/418 时进入退避或封禁"""
+        now = self.clock()
+        self._roll(now)
+        if window == self._minute:
+            for key, value in headers.items():
+                name = key.upper()
+                try:
+                    if name == "X-MBX-USED-WEIGHT-1M":
+                        self.used_weight = max(self.used_weight, int(value))
+                    elif name == "X-MBX-ORDER-COUNT-10S":
+                        self.order_count_10s = max(self.order_count_10s, int(value))
+                    elif name == "X-MBX-ORDER-COUNT-1M":
+                        self.order_count_1m = max(self.order_count_1m, int(value))
+                except ValueError:
+                    continue
+        if status in (418, 429):
+            self.rate_limited_count += 1
+            retry_after = self._retry_after(headers)
+            if status == 418:
+                wait = retry_after if retry_after is not None else 120.0
+                self.banned_until = max(self.banned_until, now + wait)
+                print(f"[RestScheduler] IP 已被封禁（418），暂停所有请求 {wait:.0f}s")
+            else:
+                self._backoff = min(max(self._backoff * 2, 1.0), 60.0)
+                wait = retry_after if retry_after is not None else self._backoff
+                self.backoff_until = max(self.backoff_until, now + wait)
+                print(f"[RestScheduler] 触发限频（429），非紧急请求退避 {wait:.1f}s（已用权重 {self.used_weight}/{self.weight_limit}）")
+        elif status < 400:
+            self._backoff = 0.0
+
+    @staticmethod
+    def _retry_after(headers) -> Optional[float]:
+        value = headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "used_weight": self.used_weight,
+            "weight_limit": self.weight_limit,
+            "order_count_10s": self.order_count_10s,
+            "order_count_1m": self.order_count_1m,
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "shed": self.shed_count,
+            "throttled": self.throttled_count,
+            "rate_limited": self.rate_limited_count,
+        }
@@ -0,0 +1,329 @@
+import bisect
+import glob
+import gzip
+import mmap
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅 RecordFile.to_numpy() 需要
+    np = None
+
+# 文件头：magic、版本、记录类型、记录长度
+HEADER = struct.Struct("<4sBBHI4x")
+MAGIC = b"PMMR"
+VERSION = 1
+
+# 定长记录（小端）：时间戳均为整数，exch_ts 为交易所毫秒时间，recv_ts 为本地接收微秒时间
+KIND_TICKER = 1
+KIND_DEPTH = 2
+KIND_TRADE = 3
+RECORD_STRUCTS = {
+    # exch_ts, recv_ts, update_id, bid, bid_qty, ask, ask_qty
+    KIND_TICKER: struct.Struct("<qqqdddd"),
+    # exch_ts, recv_ts, first_id(U), final_id(u), prev_final_id(pu), price, qty, side(0=买 1=卖 2=空事件)
+    KIND_DEPTH: struct.Struct("<qqqqqddB7x"),
+    # exch_ts, recv_ts, trade_id, price, qty, buyer_is_maker
+    KIND_TRADE: struct.Struct("<qqqddB7x"),
+}
+RECORD_FIELDS = {
+    KIND_TICKER: ("exch_ts", "recv_ts", "update_id", "bid", "bid_qty", "ask", "ask_qty"),
+    KIND_DEPTH: ("exch_ts", "recv_ts", "first_id", "final_id", "prev_final_id", "price", "qty", "side"),
+    KIND_TRADE: ("exch_ts", "recv_ts", "trade_id", "price", "qty", "buyer_is_maker"),
+}
+KIND_NAMES = {KIND_TICKER: "ticker", KIND_DEPTH: "depth", KIND_TRADE: "trade"}
+DEPTH_BID, DEPTH_ASK, DEPTH_EMPTY = 0, 1, 2
+
+def _numpy_dtype(kind: int):
+    fmt = {"q": "<i8", "d": "<f8", "B": "u1"}
+    fields, offset = [], 0
+    s = RECORD_STRUCTS[kind]
+    names = iter(RECORD_FIELDS[kind])
+    for ch in s.format.lstrip("<"):
+        if ch == "x":
+            offset += 1
+            continue
+        if ch.isdigit():
+            continue
+        fields.append((next(names), fmt[ch], offset))
+        offset += struct.calcsize("<" + ch)
+    return np.dtype({"names": [f[0] for f in fields], "formats": [f[1] for f in fields], "offsets": [f[2] for f in fields], "itemsize": s.size})
+
+def hour_path(directory: str, symbol: str, kind: int, ts: float) -> str:
+    """录制文件路径：{directory}/{SYMBOL}/{YYYYMMDD}/{HH}.{kind}.bin（UTC 小时）"""
+    t = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return os.path.join(directory, symbol.upper(), t.strftime("%Y%m%d"), f"{t:%H}.{KIND_NAMES[kind]}.bin")
+
+class _HourFile:
+    """当前小时的追加写入文件，记录先进内存缓冲，按大小或时间成块写盘"""
+    def __init__(self, path: str, kind: int, hour: int):
+        self.path = path
+        self.kind = kind
+        self.hour = hour
+        self.buffer = bytearray()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new_file:
+            self.file.write(HEADER.pack(MAGIC, VERSION, kind, 0, RECORD_STRUCTS[kind].size))
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class MarketDataRecorder:
+    """
+    行情录制器，作为 BinanceWebSocket.listen() 的旁路：
+    - bookTicker / depthUpdate / aggTrade 分别写入定长二进制记录，同时保存交易所时间与本地接收时间
+    - 每个交易对、每种记录、每个 UTC 小时一个文件，只追加写；记录先进内存缓冲，满 buffer_bytes 或
+      超过 flush_interval 秒成块写盘，单条消息的开销只有一次 struct.pack
+    - 跨小时自动切换文件，已结束的小时文件在后台线程中 gzip 压缩（不阻塞事件循环）
+    - 进程崩溃时文件末尾最多残留半条记录，读取时自动忽略
+    """
+    def __init__(self, directory: str = "./data", compress: bool = True, flush_interval: float = 1.0, buffer_bytes: int = 1 << 20, clock=time.time):
+        self.directory = directory
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.buffer_bytes = buffer_bytes
+        self.clock = clock
+        self.files: Dict[Tuple[str, int], _HourFile] = {}
+        self.records = 0
+        self.errors = 0
+        self._last_flush = clock()
+        self._compress_queue: Optional[queue.Queue] = None
+        self._compress_thread: Optional[threading.Thread] = None
+
+    def on_message(self, msg: Dict[str, Any]):
+        """记录一条 WebSocket 消息；非行情消息（如订阅回执）直接忽略"""
+        now = self.clock()
+        try:
+            event = msg.get("e")
+            if event == "bookTicker" or (event is None and "b" in msg and "a" in msg and "s" in msg):
+                self._write(msg["s"], KIND_TICKER, now, RECORD_STRUCTS[KIND_TICKER].pack(
+                    msg.get("T") or msg.get("E") or 0, int(now * 1e6), msg.get("u", 0),
+                    float(msg["b"]), float(msg["B"]), float(msg["a"]), float(msg["A"]),
+                ))
+            elif event == "depthUpdate":
+                self._write_depth(msg, now)
+            elif event in ("aggTrade", "trade"):
+                self._write(msg["s"], KIND_TRADE, now, RECORD_STRUCTS[KIND_TRADE].pack(
+                    msg.get("T") or msg.get("E") or 0, int(now * 1e6), msg.get("a", msg.get("t", 0)),
+                    float(msg["p"]), float(msg["q"]), 1 if msg.get("m") else 0,
+                ))
+            else:
+                return
+        except Exception as e:
+            self.errors += 1
+            if self.errors <= 10:
+                print(f"[MarketDataRecorder] 记录消息失败: {e}, msg={msg}")
+            return
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _write_depth(self, msg: Dict[str, Any], now: float):
+        """depth 增量按价位拆成多条记录，同一事件的记录共享 U/u/pu；无变化的事件写一条空记录以保持序号连续"""
+        pack = RECORD_STRUCTS[KIND_DEPTH].pack
+        head = (msg.get("T") or msg.get("E") or 0, int(now * 1e6), msg.get("U", 0), msg.get("u", 0), msg.get("pu", 0))
+        chunk = bytearray()
+        for side, levels in ((DEPTH_BID, msg.get("b", [])), (DEPTH_ASK, msg.get("a", []))):
+            for price, qty in levels:
+                chunk += pack(*head, float(price), float(qty), side)
+        if not chunk:
+            chunk += pack(*head, 0.0, 0.0, DEPTH_EMPTY)
+        self._write(msg["s"], KIND_DEPTH, now, chunk)
+
+    def _write(self, symbol: str, kind: int, now: float, data: bytes):
+        hour = int(now // 3600)
+        key = (symbol, kind)
+        f = self.files.get(key)
+        if f is None or f.hour != hour:
+            if f is not None:
+                self._rotate(f)
+            f = self.files[key] = _HourFile(hour_path(self.directory, symbol, kind, now), kind, hour)
+        f.buffer += data
+        self.records += 1
+        if len(f.buffer) >= self.buffer_bytes:
+            f.flush()
+
+    def _rotate(self, f: _HourFile):
+        f.close()
+        if self.compress:
+            self._submit_compress(f.path)
+
+    def _submit_compress(self, path: str):
+        if self._compress_thread is None:
+            self._compress_queue = queue.Queue()
+            self._compress_thread = threading.Thread(target=self._compress_loop, name="recorder-compress", daemon=True)
+            self._compress_thread.start()
+        self._compress_queue.put(path)
+
+    def _compress_loop(self):
+        while True:
+            path = self._compress_queue.get()
+            if path is None:
+                return
+            try:
+                compress_file(path)
+            except Exception as e:
+                print(f"[MarketDataRecorder] 压缩 {path} 失败: {e}")
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+        self._last_flush = self.clock()
+
+    def close(self):
+        """写完缓冲并关闭所有文件；当前小时的文件保留未压缩，便于下次继续追加"""
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+        if self._compress_thread is not None:
+            self._compress_queue.put(None)
+            self._compress_thread.join()
+            self._compress_thread = None
+
+def compress_file(path: str, level: int = 6) -> str:
+    """把已结束的小时文件压缩为 .gz（先写临时文件再替换，中途失败不丢原文件）"""
+    gz_path = path + ".gz"
+    tmp_path = gz_path + ".tmp"
+    with open(path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=level) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp_path, gz_path)
+    os.remove(path)
+    return gz_path
+
+class _TimestampView:
+    """把 mmap 中的记录时间戳包装成序列，供 bisect 二分定位（不整体读入内存）"""
+    def __init__(self, buf, record_size: int, count: int):
+        self.buf = buf
+        self.record_size = record_size
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> int:
+        return struct.unpack_from("<q", self.buf, HEADER.size + i * self.record_size)[0]
+
+class RecordFile:
+    """
+    单个录制文件的只读视图：
+    - 未压缩的 .bin 用 mmap 打开，按时间二分定位区间后按需分页读取，不占用整文件内存
+    - 压缩的 .bin.gz 按块流式解压，时间区间过滤在解压时完成
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.compressed = path.endswith(".gz")
+        self._file = gzip.open(path, "rb") if self.compressed else open(path, "rb")
+        magic, version, kind, _, record_size = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不是有效的行情录制文件: {path}")
+        self.kind = kind
+        self.struct = RECORD_STRUCTS[kind]
+        if record_size != self.struct.size:
+            raise ValueError(f"记录长度不匹配 {record_size} != {self.struct.size}: {path}")
+        self._mmap = None
+        self.count: Optional[int] = None
+        if not self.compressed:
+            size = os.fstat(self._file.fileno()).st_size
+            # 末尾不完整的记录（写入中或崩溃残留）忽略
+            self.count = (size - HEADER.size) // record_size
+            if self.count > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        if self.count is None:
+            raise TypeError("压缩文件不支持随机访问，请使用 iter_records()")
+        return self.count
+
+    def _bounds(self, start_ms: Optional[int], end_ms: Optional[int]) -> Tuple[int, int]:
+        view = _TimestampView(self._mmap, self.struct.size, self.count)
+        lo = bisect.bisect_left(view, start_ms) if start_ms is not None else 0
+        hi = bisect.bisect_left(view, end_ms) if end_ms is not None else self.count
+        return lo, hi
+
+    def iter_records(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None, chunk_records: int = 8192) -> Iterator[tuple]:
+        """按交易所时间 [start_ms, end_ms) 迭代记录元组，字段顺序见 RECORD_FIELDS"""
+        size = self.struct.size
+        if not self.compressed:
+            if not self.count:
+                return
+            lo, hi = self._bounds(start_ms, end_ms)
+            for begin in range(lo, hi, chunk_records):
+                end = min(begin + chunk_records, hi)
+                yield from self.struct.iter_unpack(self._mmap[HEADER.size + begin * size:HEADER.size + end * size])
+            return
+        while True:
+            data = self._file.read(size * chunk_records)
+            data = data[:len(data) - len(data) % size]
+            if not data:
+                return
+            for record in self.struct.iter_unpack(data):
+                ts = record[0]
+                if start_ms is not None and ts < start_ms:
+                    continue
+                if end_ms is not None and ts >= end_ms:
+                    return
+                yield record
+
+    def to_numpy(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None):
+        """返回按时间区间切片的 numpy 结构化数组视图（零拷贝，需安装 numpy，仅支持未压缩文件）"""
+        if np is None:
+            raise RuntimeError("to_numpy() 需要安装 numpy")
+        if self.compressed:
+            raise TypeError("压缩文件不支持 mmap 视图，请使用 iter_records()")
+        arr = np.memmap(self.path, dtype=_numpy_dtype(self.kind), mode="r", offset=HEADER.size, shape=(self.count,))
+        lo, hi = self._bounds(start_ms, end_ms)
+        return arr[lo:hi]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def find_files(directory: str, symbol: str, kind: int, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[str]:
+    """列出时间区间内某交易对某类记录的小时文件（按时间排序，同一小时优先未压缩文件）"""
+    pattern = os.path.join(directory, symbol.upper(), "*", f"*.{KIND_NAMES[kind]}.bin*")
+    by_hour: Dict[int, str] = {}
+    for path in glob.glob(pattern):
+        if path.endswith(".tmp"):
+            continue
+        day = os.path.basename(os.path.dirname(path))
+        hour = os.path.basename(path).split(".", 1)[0]
+        try:
+            hour_start = int(datetime.strptime(day + hour, "%Y%m%d%H").replace(tzinfo=timezone.utc).timestamp())
+        except ValueError:
+            continue
+        if start_ms is not None and (hour_start + 3600) * 1000 <= start_ms:
+            continue
+        if end_ms is not None and hour_start * 1000 >= end_ms:
+            continue
+        # 压缩与未压缩并存时（压缩中途）取未压缩文件
+        if hour_start not in by_hour or not path.endswith(".gz"):
+            by_hour[hour_start] = path
+    return [by_hour[h] for h in sorted(by_hour)]
+
+def read_records(directory: str, symbol: str, kind: int, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Iterator[tuple]:
+    """跨小时文件流式读取记录（文件按本地接收小时切分，交易所时间可能略早于文件小时，边界处按时间过滤）"""
+    for path in find_files(directory, symbol, kind, start_ms - 3600 * 1000 if start_ms is not None else None, end_ms):
+        with RecordFile(path) as f:
+            yield from f.iter_records(start_ms, end_ms)
@@ -0,0 +1,131 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from utils.metrics import registry as metrics_registry
+from utils.rate_limit import current_priority
+
+SNAPSHOT_REQUESTS = metrics_registry.counter("pmm_snapshot_cache_requests_total", "账户/持仓快照缓存查询次数（hit 命中 / coalesced 合并到在途请求 / miss 发起请求 / error 请求失败）", ("resource", "result"))
+SNAPSHOT_AGE = metrics_registry.histogram("pmm_snapshot_cache_age_seconds", "命中缓存时返回数据的年龄", ("resource",))
+
+def _discard_result(task: asyncio.Task):
+    # 所有等待方都已取消时，避免出现 "Task exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+class _Flight:
+    __slots__ = ("started", "priority", "generation", "task")
+
+    def __init__(self, started: float, priority: int, generation: int, task: asyncio.Task):
+        self.started = started
+        self.priority = priority
+        self.generation = generation
+        self.task = task
+
+class SnapshotCache:
+    """
+    账户与持仓 REST 快照缓存，挡在 get_position_info / get_all_positions / get_account_info 之前：
+    - 每个调用方按自己的 max_age（秒）决定可接受的数据年龄，max_age <= 0 表示必须重新请求
+    - single-flight：同一资源已有请求在途且开始时间满足 max_age 时，后来者等待同一个请求而不是再发一次
+    - 在途请求按发起方的优先级调度；更紧急的调用方不会合并到低优先级请求（后者可能被预算丢弃）
+    - invalidate() 在自己下单/平仓后使缓存失效，失效前发出的在途请求结果不会写回缓存
+    - 返回的数据在调用方之间共享，只读使用
+    时间取事件循环时钟，回测虚拟时钟下同样适用。
+    """
+    def __init__(self, rest):
+        self.rest = rest
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, _Flight] = {}
+        self._generation = 0
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: str, result: str, age: Optional[float] = None):
+        resource = key.split(":", 1)[0]
+        counters = self._counters.setdefault(key, {"hit": 0, "coalesced": 0, "miss": 0, "error": 0})
+        counters[result] += 1
+        SNAPSHOT_REQUESTS.labels(resource, result).inc()
+        if age is not None:
+            SNAPSHOT_AGE.labels(resource).observe(age)
+
+    def age(self, key: str) -> Optional[float]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return asyncio.get_running_loop().time() - entry[0]
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Any]], max_age: float = 0.0) -> Any:
+        """按 key 读取快照：足够新则直接返回，否则合并到在途请求或发起新请求"""
+        now = asyncio.get_running_loop().time()
+        if max_age > 0:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= max_age:
+                self._count(key, "hit", now - entry[0])
+                return entry[1]
+        priority = current_priority()
+        flight = self._inflight.get(key)
+        # 在途请求开始于 max_age 之内即可接受（返回的数据不早于其开始时间）
+        if flight is not None and flight.generation == self._generation and now - flight.started <= max(max_age, 0.0) and flight.priority <= priority:
+            self._count(key, "coalesced", now - flight.started)
+            return await asyncio.shield(flight.task)
+        self._count(key, "miss")
+        # 新任务复制当前上下文，请求优先级与发起方一致
+        task = asyncio.ensure_future(self._fetch(key, fetch, now))
+        task.add_done_callback(_discard_result)
+        self._inflight[key] = _Flight(now, priority, self._generation, task)
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]], started: float) -> Any:
+        generation = self._generation
+        try:
+            value = await fetch()
+        except Exception:
+            self._count(key, "error")
+            raise
+        finally:
+            flight = self._inflight.get(key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._inflight[key]
+        # 以请求开始时间作为数据时间；失效后或已有更新的数据时不写回
+        current = self._entries.get(key)
+        if generation == self._generation and (current is None or current[0] <= started):
+            self._entries[key] = (started, value)
+        return value
+
+    def invalidate(self):
+        """持仓或余额已知发生变化（自己下单、平仓）：丢弃全部缓存，之后的查询重新请求"""
+        self._generation += 1
+        self._entries.clear()
+
+    async def get_position_info(self, symbol: str, max_age: float = 0.0) -> Any:
+        """单个交易对持仓；全量持仓快照足够新时直接从中取出"""
+        if max_age > 0:
+            entry = self._entries.get("positions")
+            now = asyncio.get_running_loop().time()
+            if entry is not None and now - entry[0] <= max_age:
+                for pos in entry[1]:
+                    if pos.get("symbol") == symbol and pos.get("positionSide", "BOTH") == "BOTH":
+                        self._count(f"position:{symbol}", "hit", now - entry[0])
+                        return pos
+        return await self.get(f"position:{symbol}", lambda: self.rest.get_position_info(symbol), max_age)
+
+    async def get_all_positions(self, max_age: float = 0.0) -> Any:
+        return await self.get("positions", self.rest.get_all_positions, max_age)
+
+    async def get_account_info(self, max_age: float = 0.0) -> Any:
+        return await self.get("account", self.rest.get_account_info, max_age)
+
+    def stats(self) -> Dict[str, Any]:
+        """各资源的命中/合并/请求/失败次数与当前缓存年龄（秒）"""
+        try:
+            now = asyncio.get_running_loop().time()
+        except RuntimeError:
+            now = None
+        result = {}
+        for key, counters in self._counters.items():
+            entry = self._entries.get(key)
+            total = counters["hit"] + counters["coalesced"] + counters["miss"]
+            result[key] = {
+                **counters,
+                "hit_ratio": (counters["hit"] + counters["coalesced"]) / total if total else 0.0,
+                "age": now - entry[0] if entry is not None and now is not None else None,
+                "inflight": key in self._inflight,
+            }
+        return result
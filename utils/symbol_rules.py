@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, fields
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+@dataclass(frozen=True)
+class SymbolRules:
+    """
+    单个交易对的下单规则，全部字段预先解析为 Decimal：
+    - PRICE_FILTER / LOT_SIZE / MARKET_LOT_SIZE：价格与数量精度、上下限
+    - MIN_NOTIONAL：最小名义价值
+    - PERCENT_PRICE：限价单相对标记价的允许范围
+    """
+    symbol: str
+    price_tick: Decimal
+    min_price: Decimal
+    max_price: Decimal
+    step_size: Decimal
+    min_qty: Decimal
+    max_qty: Decimal
+    market_step_size: Decimal
+    market_min_qty: Decimal
+    market_max_qty: Decimal
+    min_notional: Decimal
+    multiplier_up: Decimal
+    multiplier_down: Decimal
+
+    @classmethod
+    def from_exchange(cls, s: Dict[str, Any]) -> "SymbolRules":
+        """从 exchangeInfo 中单个 symbol 的原始结构解析"""
+        filters = {f["filterType"]: f for f in s.get("filters", [])}
+        price = filters.get("PRICE_FILTER", {})
+        lot = filters.get("LOT_SIZE", {})
+        market_lot = filters.get("MARKET_LOT_SIZE", lot)
+        notional = filters.get("MIN_NOTIONAL", {})
+        percent = filters.get("PERCENT_PRICE", {})
+        return cls(
+            symbol=s["symbol"],
+            price_tick=Decimal(price.get("tickSize", "0")),
+            min_price=Decimal(price.get("minPrice", "0")),
+            max_price=Decimal(price.get("maxPrice", "0")),
+            step_size=Decimal(lot.get("stepSize", "0")),
+            min_qty=Decimal(lot.get("minQty", "0")),
+            max_qty=Decimal(lot.get("maxQty", "0")),
+            market_step_size=Decimal(market_lot.get("stepSize", "0")),
+            market_min_qty=Decimal(market_lot.get("minQty", "0")),
+            market_max_qty=Decimal(market_lot.get("maxQty", "0")),
+            # 合约的 MIN_NOTIONAL 字段名为 notional，现货为 minNotional
+            min_notional=Decimal(notional.get("notional", notional.get("minNotional", "0"))),
+            multiplier_up=Decimal(percent.get("multiplierUp", "0")),
+            multiplier_down=Decimal(percent.get("multiplierDown", "0")),
+        )
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, str]) -> "SymbolRules":
+        return cls(**{f.name: (d[f.name] if f.name == "symbol" else Decimal(d[f.name])) for f in fields(cls)})
+
+    def to_dict(self) -> Dict[str, str]:
+        return {k: str(v) for k, v in asdict(self).items()}
+
+    def price_in_band(self, price: Decimal, mark_price: Decimal) -> bool:
+        """价格是否满足 PERCENT_PRICE 与 PRICE_FILTER 上下限"""
+        if self.multiplier_up > 0 and price > mark_price * self.multiplier_up:
+            return False
+        if self.multiplier_down > 0 and price < mark_price * self.multiplier_down:
+            return False
+        if self.min_price > 0 and price < self.min_price:
+            return False
+        if self.max_price > 0 and price > self.max_price:
+            return False
+        return True
+
+class SymbolRulesCache:
+    """
+    exchangeInfo 交易对规则缓存：
+    - 启动时加载一次，按 symbol 建索引，之后查询为 O(1) 字典读取
+    - 超过 ttl 后台重新拉取，拉取完成前继续使用已有规则；缓存中没有该交易对时才等待下载
+    - invalidate() 可显式失效（如下单返回精度错误时）
+    - 落盘到 cache_path，热重启时若磁盘缓存未过期则跳过下载；seed() 可从运行检查点预先填入规则
+    """
+    def __init__(self, rest, ttl: float = 3600, cache_path: Optional[str] = "./cache/exchange_info.json"):
+        self.rest = rest
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self.rules: Dict[str, SymbolRules] = {}
+        self.fetched_at = 0.0  # 墙钟时间，便于跨进程判断磁盘缓存是否过期
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_started = 0.0
+
+    def expired(self) -> bool:
+        return not self.rules or time.time() - self.fetched_at > self.ttl
+
+    async def load(self):
+        """优先读取未过期的磁盘缓存；已有（过期的）规则时先用着并后台刷新，否则从交易所拉取"""
+        from_disk = self._load_from_disk()
+        if not self.expired():
+            source = f"磁盘缓存 {self.cache_path}" if from_disk else "运行检查点中的规则"
+            print(f"[SymbolRulesCache] 使用{source}，共 {len(self.rules)} 个交易对")
+            return
+        if self.rules:
+            print(f"[SymbolRulesCache] 交易对规则已过期，先使用已有的 {len(self.rules)} 个交易对规则，后台刷新")
+            self._refresh_in_background()
+            return
+        await self.refresh()
+
+    def seed(self, rules: Dict[str, SymbolRules], fetched_at: float):
+        """填入外部保存的规则（如运行检查点），已有更新的规则时忽略"""
+        if fetched_at < self.fetched_at:
+            return
+        self.rules.update(rules)
+        self.fetched_at = fetched_at
+
+    async def refresh(self):
+        """从交易所拉取完整 exchangeInfo 并重建索引（并发调用只会触发一次下载）"""
+        async with self._lock:
+            if not self.expired():
+                return
+            data = await self.rest.get_exchange_info()
+            rules = {}
+            for s in data.get("symbols", []):
+                try:
+                    rules[s["symbol"]] = SymbolRules.from_exchange(s)
+                except Exception as e:
+                    print(f"[SymbolRulesCache] 解析 {s.get('symbol')} 规则失败: {e}")
+            self.rules = rules
+            self.fetched_at = time.time()
+            print(f"[SymbolRulesCache] 已拉取 exchangeInfo，共 {len(self.rules)} 个交易对")
+            self._save_to_disk()
+
+    async def get(self, symbol: str) -> SymbolRules:
+        rules = self.rules.get(symbol)
+        if rules is not None and self.expired():
+            # 交易规则极少变化，过期后先返回已有规则，不阻塞挂单
+            self._refresh_in_background()
+        elif rules is None:
+            await self.refresh()
+        rules = self.rules.get(symbol)
+        if rules is None:
+            raise ValueError(f"Symbol {symbol} not found in exchangeInfo")
+        return rules
+
+    def _refresh_in_background(self, retry_interval: float = 60.0):
+        # 刷新失败后至少间隔 retry_interval 秒再试，避免交易所不可用时每轮挂单都重新下载
+        if self._refresh_task is not None and (not self._refresh_task.done() or time.time() - self._refresh_started < retry_interval):
+            return
+        self._refresh_started = time.time()
+        self._refresh_task = asyncio.create_task(self.refresh())
+        self._refresh_task.add_done_callback(self._on_refreshed)
+
+    @staticmethod
+    def _on_refreshed(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[SymbolRulesCache] 后台刷新 exchangeInfo 失败: {task.exception()}")
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """使缓存失效，下次 get() 时重新拉取；指定 symbol 时先移除该交易对的旧规则"""
+        if symbol is not None:
+            self.rules.pop(symbol, None)
+        self.fetched_at = 0.0
+
+    def _load_from_disk(self) -> bool:
+        if not self.cache_path or not os.path.isfile(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            fetched_at = float(data["fetched_at"])
+            if fetched_at < self.fetched_at:
+                # 已从检查点填入更新的规则
+                return True
+            self.rules = {k: SymbolRules.from_dict(v) for k, v in data["rules"].items()}
+            self.fetched_at = fetched_at
+            return True
+        except Exception as e:
+            print(f"[SymbolRulesCache] 读取磁盘缓存失败，忽略: {e}")
+            return False
+
+    def _save_to_disk(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": self.fetched_at, "rules": {k: v.to_dict() for k, v in self.rules.items()}}, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"[SymbolRulesCache] 写入磁盘缓存失败: {e}")
@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Tuple, Union
+
+# Binance 价格与数量最多 8 位小数，内部统一换算为 1e-8 整数单位
+UNIT_SCALE = 10 ** 8
+
+def to_units(value: Union[str, float, int, Decimal]) -> int:
+    """
+    把交易所价格/数量（字符串、float 或 Decimal）换算为 1e-8 整数单位。
+    不超过 8 位小数且量级在 1e7 以内的值，float 乘法误差远小于 0.5 个单位，round 后结果精确
+    """
+    return round(float(value) * UNIT_SCALE)
+
+def _ratio(value: Decimal) -> Tuple[int, int]:
+    return value.as_integer_ratio()
+
+@dataclass(frozen=True)
+class TickGrid:
+    """
+    交易对的整数价格/数量网格：价格以 price_tick 的整数倍（ticks）、数量以 step_size 的整数倍（lots）表示，
+    挂单梯队的计算与比较全部是整数运算，只在提交 REST 请求时才转换为 Decimal
+    """
+    symbol: str
+    price_tick: Decimal
+    step_size: Decimal
+    tick_units: int
+    step_units: int
+    min_qty_units: int
+    min_notional: Tuple[int, int]
+    multiplier_up: Tuple[int, int]
+    multiplier_down: Tuple[int, int]
+    min_price_units: int
+    max_price_units: int
+    price_quantum: Decimal
+    mid_quantum_units: int
+
+    @classmethod
+    def from_rules(cls, rules) -> "TickGrid":
+        tick = rules.price_tick
+        # 价格按 tick 的有效位数输出（0.10 -> 0.1），tick 为整数时避免科学计数法
+        quantum = tick.normalize()
+        if quantum.as_tuple().exponent > 0:
+            quantum = tick.quantize(Decimal(1))
+        return cls(
+            symbol=rules.symbol,
+            price_tick=tick,
+            step_size=rules.step_size,
+            tick_units=to_units(tick),
+            step_units=to_units(rules.step_size),
+            min_qty_units=to_units(rules.min_qty),
+            min_notional=_ratio(rules.min_notional),
+            multiplier_up=_ratio(rules.multiplier_up),
+            multiplier_down=_ratio(rules.multiplier_down),
+            min_price_units=to_units(rules.min_price),
+            max_price_units=to_units(rules.max_price),
+            price_quantum=quantum,
+            # 中间价按 tickSize 字面的小数位截断（如 "0.10" 截断到 0.01），与 Decimal.quantize(price_tick) 一致
+            mid_quantum_units=10 ** max(0, 8 + tick.as_tuple().exponent),
+        )
+
+    def mid_units(self, value) -> int:
+        """挂单基准中间价（1e-8 整数单位，向下截断）"""
+        units = to_units(value)
+        return units - units % self.mid_quantum_units
+
+    def price_ticks(self, value) -> int:
+        """价格向下取整到 tick"""
+        return to_units(value) // self.tick_units
+
+    def qty_lots(self, value) -> int:
+        """数量向下取整到 step_size"""
+        return to_units(value) // self.step_units
+
+    def price(self, ticks: int) -> Decimal:
+        return self.price_quantum * ticks
+
+    def quantity(self, lots: int) -> Decimal:
+        return self.step_size * lots
+
+    def lots_for_notional(self, notional: Decimal, mark_units: int) -> int:
+        """按名义价值（USDT）与标记价换算下单数量，向下取整到 lots"""
+        num, den = _ratio(notional)
+        return (num * UNIT_SCALE * UNIT_SCALE) // (den * mark_units * self.step_units)
+
+    def max_lots(self, max_notional: Decimal, mark_units: int, position_units: int) -> int:
+        """最大持仓（名义价值/标记价）扣除当前持仓绝对值后的剩余可挂数量，向零取整到 lots"""
+        num, den = _ratio(max_notional)
+        remaining = num * UNIT_SCALE * UNIT_SCALE - abs(position_units) * den * mark_units
+        scale = den * mark_units * self.step_units
+        return remaining // scale if remaining >= 0 else -((-remaining) // scale)
+
+    def qty_ok(self, lots: int) -> bool:
+        return lots * self.step_units >= self.min_qty_units
+
+    def notional_ok(self, ticks: int, lots: int) -> bool:
+        """名义价值是否达到 MIN_NOTIONAL（两侧都乘到 1e-16 单位，整数比较）"""
+        num, den = self.min_notional
+        return ticks * self.tick_units * lots * self.step_units * den >= num * UNIT_SCALE * UNIT_SCALE
+
+    def price_in_band(self, ticks: int, mark_units: int) -> bool:
+        """价格是否满足 PERCENT_PRICE 与 PRICE_FILTER 上下限（与 SymbolRules.price_in_band 等价）"""
+        units = ticks * self.tick_units
+        up_num, up_den = self.multiplier_up
+        if up_num > 0 and units * up_den > mark_units * up_num:
+            return False
+        down_num, down_den = self.multiplier_down
+        if down_num > 0 and units * down_den < mark_units * down_num:
+            return False
+        if self.min_price_units > 0 and units < self.min_price_units:
+            return False
+        if self.max_price_units > 0 and units > self.max_price_units:
+            return False
+        return True
+
+def ladder_ticks(mid_units: int, levels: int, offset_percent: Decimal, tick_units: int) -> List[Tuple[int, int, int]]:
+    """
+    一次生成整条梯队两侧的价格：第 n 档买价 floor(mid * (1 - n * offset%))、卖价 floor(mid * (1 + n * offset%))，
+    按 tick 向下取整；偏移比例转为整数分数后全程整数运算，结果与逐档 Decimal quantize(ROUND_DOWN) 一致
+    返回 [(level, buy_ticks, sell_ticks), ...]
+    """
+    num, den = _ratio(offset_percent)
+    base = 100 * den
+    scale = base * tick_units
+    return [
+        (level, mid_units * (base - num * level) // scale, mid_units * (base + num * level) // scale)
+        for level in range(1, levels + 1)
+    ]
@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 行情触发信息：(交易所事件时间 E 毫秒, 收包时刻, 解码完成时刻, 中间价写入完成时刻)，时刻均为 time.perf_counter()
+TickMarks = Tuple[Optional[int], float, float, float]
+
+# 报告中的阶段顺序与说明（单位均为微秒）
+STAGES = (
+    ("feed", "交易所事件时间 → 本地收包（含两端时钟偏差）"),
+    ("decode", "收包 → 解码完成"),
+    ("state", "解码完成 → 中间价写入 state"),
+    ("wakeup", "state 更新 → OrderManager 被唤醒（含防抖等待）"),
+    ("build", "唤醒 → 目标梯队计算与对账完成"),
+    ("queue", "对账完成 → 首个请求拿到发送名额"),
+    ("sign", "请求签名耗时（所有请求合计）"),
+    ("http", "首个请求发出 → 最后一个响应返回"),
+    ("total", "本地收包 → 最后一个响应返回"),
+    ("tick_ack", "交易所事件时间 → 订单 updateTime（同为交易所时钟）"),
+)
+
+# 当前挂单决策的追踪对象，随 asyncio 任务上下文传递到 REST 请求（与 request_priority 相同机制）
+current_trace: contextvars.ContextVar[Optional["QuoteTrace"]] = contextvars.ContextVar("current_trace", default=None)
+
+def _us(start: Optional[float], end: Optional[float]) -> Optional[int]:
+    if start is None or end is None:
+        return None
+    return int((end - start) * 1e6)
+
+class QuoteTrace:
+    """
+    一次挂单决策的追踪记录：从触发它的行情（bookTicker 事件时间）开始，
+    经唤醒、计算梯队、签名、HTTP 往返，到交易所返回的订单 updateTime 结束
+    """
+    __slots__ = (
+        "symbol", "trigger", "tick", "t_wakeup", "t_targets", "t_request", "t_response",
+        "sign_seconds", "requests", "errors", "ack_ms", "orders", "outcome", "finished_ms",
+    )
+
+    def __init__(self, symbol: str, tick: Optional[TickMarks], trigger: str, t_wakeup: float):
+        self.symbol = symbol
+        self.tick = tick
+        self.trigger = trigger
+        self.t_wakeup = t_wakeup
+        self.t_targets: Optional[float] = None
+        self.t_request: Optional[float] = None
+        self.t_response: Optional[float] = None
+        self.sign_seconds = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ack_ms: Optional[int] = None
+        self.orders = 0
+        self.outcome = "sent"
+        self.finished_ms = 0
+
+    def mark_targets(self, orders: int):
+        """对账完成：记录本轮需要发送的撤/改/新单数，之后的 REST 请求计入本次追踪"""
+        self.t_targets = time.perf_counter()
+        self.orders = orders
+        if orders == 0:
+            self.outcome = "unchanged"
+
+    def on_request(self, now: float, sign_seconds: float):
+        # 对账前的读请求（持仓、挂单同步）属于 build 阶段，不计入
+        if self.t_targets is None:
+            return
+        self.requests += 1
+        self.sign_seconds += sign_seconds
+        if self.t_request is None:
+            self.t_request = now
+
+    def on_response(self, now: float, status: int, data: Any):
+        if self.t_targets is None:
+            return
+        self.t_response = now
+        if status >= 400:
+            self.errors += 1
+        items = data if isinstance(data, list) else (data,)
+        for item in items:
+            if isinstance(item, dict):
+                update_time = item.get("updateTime")
+                if update_time and (self.ack_ms is None or update_time > self.ack_ms):
+                    self.ack_ms = int(update_time)
+
+    def to_record(self, wall_offset: float) -> Dict[str, Any]:
+        """转换为紧凑的 JSONL 记录：阶段耗时为整数微秒，缺失的阶段不输出"""
+        event_ms = recv = decoded = state = None
+        if self.tick is not None:
+            event_ms, recv, decoded, state = self.tick
+        stages = {
+            "feed": int(((recv + wall_offset) * 1000 - event_ms) * 1000) if event_ms and recv is not None else None,
+            "decode": _us(recv, decoded),
+            "state": _us(decoded, state),
+            "wakeup": _us(state, self.t_wakeup),
+            "build": _us(self.t_wakeup, self.t_targets),
+            "queue": _us(self.t_targets, self.t_request),
+            "sign": int(self.sign_seconds * 1e6) if self.requests else None,
+            "http": _us(self.t_request, self.t_response),
+            "total": _us(recv, self.t_response),
+            "tick_ack": (self.ack_ms - event_ms) * 1000 if event_ms and self.ack_ms else None,
+        }
+        record = {"ts": self.finished_ms, "s": self.symbol, "trg": self.trigger, "out": self.outcome, "ord": self.orders, "req": self.requests}
+        if self.errors:
+            record["err"] = self.errors
+        if event_ms:
+            record["E"] = event_ms
+        if self.ack_ms:
+            record["ack"] = self.ack_ms
+        record.update((k, v) for k, v in stages.items() if v is not None)
+        return record
+
+class Tracer:
+    """
+    进程级追踪器：
+    - 未启用时 start() 直接返回 None，各埋点只多一次属性判断
+    - 完成的追踪放入定长环形缓冲，最旧的记录被覆盖
+    - dump() 把上次导出之后的新记录追加到 {directory}/traces-{YYYYMMDD}.jsonl，run_dumper() 定时在线程中导出
+    """
+    def __init__(self, capacity: int = 4096):
+        self.enabled = False
+        self.capacity = capacity
+        self.directory = "./logs"
+        self.dump_interval = 10.0
+        self.buffer: deque = deque(maxlen=capacity)
+        self.finished = 0
+        self.dumped = 0
+        self.lost = 0
+        self._last_ticks: Dict[str, Optional[TickMarks]] = {}
+        # perf_counter 与墙上时钟的差值，用于把本地收包时刻换算成毫秒时间戳
+        self.wall_offset = time.time() - time.perf_counter()
+
+    def configure(self, enabled: bool = True, capacity: Optional[int] = None, directory: Optional[str] = None, dump_interval: Optional[float] = None):
+        self.enabled = enabled
+        if capacity is not None and capacity != self.capacity:
+            self.capacity = capacity
+            self.buffer = deque(self.buffer, maxlen=capacity)
+        if directory is not None:
+            self.directory = directory
+        if dump_interval is not None:
+            self.dump_interval = dump_interval
+
+    def start(self, symbol: str, tick: Optional[TickMarks]) -> Optional[QuoteTrace]:
+        """开始一次挂单决策的追踪；触发行情与上一次相同时（兜底刷新、成交补挂）记为 other，不含行情阶段"""
+        if not self.enabled:
+            return None
+        now = time.perf_counter()
+        if tick is not None and tick is not self._last_ticks.get(symbol):
+            self._last_ticks[symbol] = tick
+            return QuoteTrace(symbol, tick, "tick", now)
+        return QuoteTrace(symbol, None, "other", now)
+
+    def finish(self, trace: Optional[QuoteTrace], outcome: Optional[str] = None):
+        if trace is None:
+            return
+        if outcome is not None:
+            trace.outcome = outcome
+        trace.finished_ms = int(time.time() * 1000)
+        self.finished += 1
+        self.buffer.append((self.finished, trace))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """环形缓冲中全部记录（最旧在前）"""
+        return [trace.to_record(self.wall_offset) for _, trace in list(self.buffer)]
+
+    def _pending(self) -> List[Dict[str, Any]]:
+        items = [(seq, trace) for seq, trace in list(self.buffer) if seq > self.dumped]
+        if items:
+            # 两次导出之间超出缓冲容量的记录已被覆盖
+            self.lost += items[0][0] - self.dumped - 1
+            self.dumped = items[-1][0]
+        return [trace.to_record(self.wall_offset) for _, trace in items]
+
+    def dump(self, records: Optional[List[Dict[str, Any]]] = None) -> int:
+        """把新记录追加写入当日文件，返回写入条数"""
+        records = self._pending() if records is None else records
+        if not records:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"traces-{datetime.now().strftime('%Y%m%d')}.jsonl")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+        return len(records)
+
+    async def run_dumper(self):
+        """定时导出：在事件循环中取出新记录，文件写入放到线程中执行"""
+        try:
+            while True:
+                await asyncio.sleep(self.dump_interval)
+                records = self._pending()
+                if records:
+                    try:
+                        await asyncio.to_thread(self.dump, records)
+                    except OSError as e:
+                        print(f"[Tracer] 追踪记录导出失败: {e}")
+        finally:
+            # 退出时同步导出剩余记录
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"[Tracer] 追踪记录导出失败: {e}")
+
+# 进程级默认追踪器
+tracer = Tracer()
+
+# ---------------- 报告 ----------------
+
+def load_records(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+    return records
+
+def percentile(sorted_values: Sequence[int], q: float) -> int:
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def stage_report(records: List[Dict[str, Any]], quantiles: Sequence[float] = (0.5, 0.9, 0.99, 0.999)) -> List[tuple]:
+    """各阶段的样本数与分位数（微秒）：[(阶段, 样本数, p..., 最大值)]"""
+    rows = []
+    for stage, _ in STAGES:
+        values = sorted(r[stage] for r in records if stage in r)
+        rows.append((stage, len(values), *(percentile(values, q) for q in quantiles), values[-1] if values else 0))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="挂单链路延迟追踪报告：按阶段输出分位数（微秒）")
+    parser.add_argument("files", nargs="+", help="追踪记录文件（traces-*.jsonl）")
+    parser.add_argument("--symbol", help="只统计指定交易对")
+    parser.add_argument("--trigger", choices=("tick", "other", "all"), default="tick", help="触发类型：行情触发（默认）/兜底刷新与成交补挂/全部")
+    parser.add_argument("--outcome", help="只统计指定结果，如 sent / unchanged / error")
+    args = parser.parse_args(argv)
+    records = load_records(args.files)
+    if args.symbol:
+        records = [r for r in records if r.get("s") == args.symbol.upper()]
+    if args.trigger != "all":
+        records = [r for r in records if r.get("trg") == args.trigger]
+    if args.outcome:
+        records = [r for r in records if r.get("out") == args.outcome]
+    outcomes: Dict[str, int] = {}
+    for r in records:
+        outcomes[r.get("out", "")] = outcomes.get(r.get("out", ""), 0) + 1
+    print(f"追踪记录 {len(records)} 条，结果分布: {outcomes}")
+    columns = ("stage", "count", "p50", "p90", "p99", "p99.9", "max")
+    cells = [list(columns)] + [[str(v) for v in row] for row in stage_report(records)]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(columns))]
+    descriptions = dict(STAGES)
+    for i, r in enumerate(cells):
+        line = "  ".join(v.rjust(w) for v, w in zip(r, widths))
+        print(line + ("" if i == 0 else "  " + descriptions[r[0]]))
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import asyncio
+import functools
+import random
+import time
 import websockets
 import json
-from typing import Optional, Any
+from typing import Any, List, Optional, Union
+from utils.decode import BookTickerFilter, MessageDecoder, get_decoder
+from utils.metrics import registry as metrics_registry
 
 # Binance Future Testnet与实盘WebSocket地址
 BINANCE_WS_URLS = {
@@ -9,27 +14,47 @@ BINANCE_WS_URLS = {
     # "mainnet": "wss://fstream.binance.com/ws",    # 实盘，后续支持
 }
 
+WS_RECONNECTS = metrics_registry.counter("pmm_ws_reconnects_total", "行情连接重建次数（disconnect 断线 / stale 无数据超时 / rollover 到期轮换）", ("reason",))
+
 class BinanceWebSocket:
     """
     Binance Future WebSocket 封装，支持 testnet，预留 mainnet 切换接口。
+    symbol 可传入列表，多个交易对复用同一条连接，消息按 "s" 字段区分交易对。
     用法：
         ws = BinanceWebSocket(symbol="btcusdt", env="testnet")
         await ws.connect()
         await ws.subscribe_bookticker()
         async for msg in ws.listen():
             ...
+    recorder 为可选的 MarketDataRecorder，listen() 收到的每条消息都会交给它落盘。
+    decoder 默认按已安装依赖选择 msgspec/orjson/json；skip_unchanged_ticker=True 时
+    买一/卖一价未变的 bookTicker 在解码前丢弃（录制时仍完整落盘）。
+    last_recv 为最近一条消息的收包时刻（time.perf_counter()，被过滤的消息同样更新），交付消息时即该消息的收包时刻，
+    供下游统计收包到处理完成的延迟，也作为连接是否仍有数据的心跳依据（与 last_frame 相同）。
+    ping_interval / ping_timeout 为协议层心跳（秒），None 表示关闭。
     """
-    def __init__(self, symbol: str, env: str = "testnet"):
-        self.symbol = symbol.lower()
+    def __init__(self, symbol: Union[str, List[str]], env: str = "testnet", recorder: Optional[Any] = None, decoder: Optional[MessageDecoder] = None, skip_unchanged_ticker: bool = False,
+                 ping_interval: Optional[float] = 20, ping_timeout: Optional[float] = 20):
+        self.symbols = [s.lower() for s in ([symbol] if isinstance(symbol, str) else symbol)]
+        self.symbol = self.symbols[0]
         self.env = env
         self.url = BINANCE_WS_URLS.get(env, BINANCE_WS_URLS["testnet"])
         self.ws: Optional[Any] = None  # 类型注解更宽松，兼容不同实现
+        self.recorder = recorder
+        self.decoder = decoder or get_decoder("market")
+        self.ticker_filter = BookTickerFilter() if skip_unchanged_ticker else None
+        self.last_recv = 0.0
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
         self._connected = False
 
     async def connect(self):
         """建立WebSocket连接"""
-        self.ws = await websockets.connect(self.url)
+        self.ws = await websockets.connect(self.url, ping_interval=self.ping_interval, ping_timeout=self.ping_timeout)
+        self.last_recv = time.perf_counter()
         self._connected = True
+        if self.ticker_filter is not None:
+            self.ticker_filter.reset()
 
     async def subscribe_bookticker(self):
         """订阅 bookTicker 行情"""
@@ -37,18 +62,39 @@ class BinanceWebSocket:
             raise RuntimeError("WebSocket 未连接，无法订阅 bookTicker")
         params = {
             "method": "SUBSCRIBE",
-            "params": [f"{self.symbol}@bookTicker"],
+            "params": [f"{s}@bookTicker" for s in self.symbols],
             "id": 1
         }
         await self.ws.send(json.dumps(params))
 
+    async def subscribe_depth(self, speed: str = "100ms"):
+        """订阅 depth 增量行情（需配合 REST 快照维护本地订单簿）"""
+        if not self._connected or self.ws is None:
+            raise RuntimeError("WebSocket 未连接，无法订阅 depth")
+        params = {
+            "method": "SUBSCRIBE",
+            "params": [f"{s}@depth@{speed}" for s in self.symbols],
+            "id": 2
+        }
+        await self.ws.send(json.dumps(params))
+
     async def listen(self):
         """异步生成器，持续接收消息"""
         if not self._connected or self.ws is None:
             raise RuntimeError("WebSocket 未连接，无法监听消息")
         try:
+            decode = self.decoder.decode
+            ticker_filter = self.ticker_filter
             async for msg in self.ws:
-                yield json.loads(msg)
+                self.last_recv = time.perf_counter()
+                unchanged = ticker_filter is not None and ticker_filter.is_unchanged(msg)
+                if unchanged and self.recorder is None:
+                    continue
+                data = decode(msg)
+                if self.recorder is not None:
+                    self.recorder.on_message(data)
+                if not unchanged:
+                    yield data
         except Exception as e:
             self._connected = False
             raise RuntimeError(f"WebSocket 监听异常: {e}")
@@ -59,6 +105,348 @@ class BinanceWebSocket:
             await self.ws.close()
             self._connected = False
 
+    @property
+    def last_frame(self) -> float:
+        return self.last_recv
+
+    @property
+    def connected(self):
+        return self._connected
+
+
+class _Leg:
+    """ResilientMarketStream 中的单条底层连接"""
+    __slots__ = ("index", "ws", "opened", "close_reason")
+
+    def __init__(self, index: int, ws: Any):
+        self.index = index
+        self.ws = ws
+        self.opened = time.monotonic()
+        # 由管理器主动断开时的原因（stale / rollover），用于重连统计
+        self.close_reason: Optional[str] = None
+
+    def reconnect_attempt(self, attempt: int) -> int:
+        """连接稳定运行过一段时间则退避从头计算，否则继续加倍"""
+        return 0 if time.monotonic() - self.opened > 10 else attempt + 1
+
+class ResilientMarketStream:
+    """
+    行情连接管理器，接口与 BinanceWebSocket 一致（可直接作为 MarketDataWorker 的 ws_factory）：
+    - 心跳：协议层 ping/pong 由底层连接处理；超过 stale_timeout 秒未收到任何消息（含被过滤的 bookTicker）视为假死，主动断开重连
+    - 断线或异常后按指数退避（带随机抖动）重连，并重新订阅之前订阅过的全部流
+    - 连接存活超过 max_age 秒（Binance 24 小时强制断开）时先建立新连接再切换，切换过程不丢消息
+    - connections >= 2 时并行保持多条连接，每条消息取最先到达的一份，其余按 (事件, 交易对, 更新ID u) 去重；
+      可降低尾延迟，单条连接重连期间行情不中断（多一次队列转发）
+    - 去重后 u 单调递增，depth 增量不会重复应用；断线造成的序号断档由 MarketDataWorker 照常检测并重同步订单簿
+    录制在去重后进行；多连接模式下若同时录制，底层连接不过滤未变化的 bookTicker，保证录制完整。
+    last_recv 为最近一条交付消息的收包时刻（供下游统计延迟）；判断行情连接是否存活应读 last_frame，
+    它包含被过滤的 bookTicker 与重复消息，盘口价格长时间不变时也会持续更新。
+    """
+    def __init__(self, symbol: Union[str, List[str]], env: str = "testnet", recorder: Optional[Any] = None, decoder: Optional[MessageDecoder] = None,
+                 skip_unchanged_ticker: bool = False, connections: int = 1, stale_timeout: float = 30.0, max_age: float = 23.5 * 3600,
+                 backoff_initial: float = 0.5, backoff_max: float = 30.0, ping_interval: Optional[float] = 20, ping_timeout: Optional[float] = 20, leg_factory=None):
+        self.symbols = [s.lower() for s in ([symbol] if isinstance(symbol, str) else symbol)]
+        self.symbol = self.symbols[0]
+        self.env = env
+        self.connections = max(1, int(connections))
+        self.stale_timeout = stale_timeout
+        self.max_age = max_age
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        # 单连接模式由底层连接直接录制；多连接模式在去重后录制
+        self.recorder = recorder if self.connections > 1 else None
+        if leg_factory is None:
+            leg_factory = functools.partial(
+                BinanceWebSocket, decoder=decoder,
+                recorder=recorder if self.connections == 1 else None,
+                skip_unchanged_ticker=skip_unchanged_ticker and (self.connections == 1 or recorder is None),
+                ping_interval=ping_interval, ping_timeout=ping_timeout,
+            )
+        # leg_factory(symbols, env) 创建底层连接，可替换（如测试用的模拟连接）
+        self.leg_factory = leg_factory
+        self.streams: List[str] = []
+        self._depth_speed = "100ms"
+        self.last_recv = 0.0
+        self._last_frame = 0.0  # 已关闭连接的最后收包时刻
+        self._legs: List[_Leg] = []
+        self._pending: Optional[_Leg] = None
+        self._last_ids: dict = {}
+        self._running = False
+        self._tasks: List[asyncio.Task] = []
+        self._queue: Optional[asyncio.Queue] = None
+        # 统计
+        self.reconnects = 0
+        self.duplicates = 0
+        self.wins = [0] * self.connections
+
+    async def connect(self):
+        """底层连接在 listen() 开始时建立（之后的断线重连也在其中完成），这里只标记启动"""
+        self._running = True
+
+    async def subscribe_bookticker(self):
+        if "bookTicker" not in self.streams:
+            self.streams.append("bookTicker")
+        for leg in self._legs:
+            await leg.ws.subscribe_bookticker()
+
+    async def subscribe_depth(self, speed: str = "100ms"):
+        if "depth" not in self.streams:
+            self.streams.append("depth")
+            self._depth_speed = speed
+        for leg in self._legs:
+            await leg.ws.subscribe_depth(speed)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** attempt)
+        # 等比抖动：多条连接（或多个进程）不会在同一时刻集中重连
+        return random.uniform(delay / 2, delay)
+
+    async def _open_leg(self, index: int) -> Optional[_Leg]:
+        """建立一条底层连接并订阅全部流，失败时退避重试，直到成功或管理器关闭"""
+        attempt = 0
+        while self._running:
+            ws = self.leg_factory(self.symbols, self.env)
+            try:
+                await ws.connect()
+                if "bookTicker" in self.streams:
+                    await ws.subscribe_bookticker()
+                if "depth" in self.streams:
+                    await ws.subscribe_depth(self._depth_speed)
+                return _Leg(index, ws)
+            except asyncio.CancelledError:
+                await self._close_ws(ws)
+                raise
+            except Exception as e:
+                await self._close_ws(ws)
+                delay = self._backoff(attempt)
+                attempt += 1
+                print(f"[MarketStream] 连接#{index} 建立失败: {e}，{delay:.1f}s 后重试")
+                await asyncio.sleep(delay)
+        return None
+
+    @staticmethod
+    async def _close_ws(ws):
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+    def _accept(self, msg) -> bool:
+        """按 (事件, 交易对) 记录已交付的最大更新ID，重复或更旧的消息丢弃；订阅应答不向下游交付"""
+        u = msg.get("u")
+        if u is None:
+            return "result" not in msg
+        key = (msg.get("e"), msg.get("s"))
+        last = self._last_ids.get(key)
+        if last is not None and u <= last:
+            self.duplicates += 1
+            return False
+        self._last_ids[key] = u
+        return True
+
+    def listen(self):
+        """异步生成器，持续交付行情；连接断开时在内部重连，不向调用方抛出"""
+        self._running = True
+        return self._listen_single() if self.connections == 1 else self._listen_merged()
+
+    async def _listen_single(self):
+        watchdog = asyncio.create_task(self._watch())
+        attempt = -1
+        try:
+            while self._running:
+                leg, self._pending = self._pending, None
+                if leg is None:
+                    leg = await self._open_leg(0)
+                    if leg is None:
+                        return
+                self._legs = [leg]
+                print(f"[MarketStream] 连接#0 已建立，订阅 {'/'.join(self.streams)}")
+                ws = leg.ws
+                accept = self._accept
+                try:
+                    async for msg in ws.listen():
+                        if accept(msg):
+                            self.last_recv = ws.last_recv
+                            yield msg
+                        if self._pending is not None:
+                            # 新连接已就绪（到期轮换），从下一条消息起改读新连接
+                            break
+                    else:
+                        if self._running and leg.close_reason is None:
+                            print("[MarketStream] 连接#0 被服务端关闭")
+                except Exception as e:
+                    if self._running:
+                        print(f"[MarketStream] 连接#0 断开: {e}")
+                finally:
+                    self._legs = []
+                    self._last_frame = max(self._last_frame, ws.last_recv)
+                    await self._close_ws(ws)
+                if self._running:
+                    self.reconnects += 1
+                    WS_RECONNECTS.labels(leg.close_reason or ("rollover" if self._pending is not None else "disconnect")).inc()
+                    if self._pending is None:
+                        attempt = leg.reconnect_attempt(attempt)
+                        await asyncio.sleep(self._backoff(attempt))
+        finally:
+            watchdog.cancel()
+            if self._pending is not None:
+                await self._close_ws(self._pending.ws)
+                self._pending = None
+
+    async def _run_leg(self, index: int):
+        attempt = -1
+        while self._running:
+            leg = await self._open_leg(index)
+            if leg is None:
+                return
+            self._legs.append(leg)
+            print(f"[MarketStream] 连接#{index} 已建立，订阅 {'/'.join(self.streams)}")
+            ws = leg.ws
+            put = self._queue.put_nowait
+            try:
+                async for msg in ws.listen():
+                    put((msg, ws.last_recv, index))
+                if self._running and leg.close_reason is None:
+                    print(f"[MarketStream] 连接#{index} 被服务端关闭")
+            except Exception as e:
+                if self._running:
+                    print(f"[MarketStream] 连接#{index} 断开: {e}")
+            finally:
+                self._legs.remove(leg)
+                self._last_frame = max(self._last_frame, ws.last_recv)
+                await self._close_ws(ws)
+            if self._running:
+                self.reconnects += 1
+                WS_RECONNECTS.labels(leg.close_reason or "disconnect").inc()
+                attempt = leg.reconnect_attempt(attempt)
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def _listen_merged(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._run_leg(i)) for i in range(self.connections)]
+        self._tasks.append(asyncio.create_task(self._watch()))
+        get = self._queue.get
+        accept = self._accept
+        wins = self.wins
+        recorder = self.recorder
+        try:
+            while self._running:
+                item = await get()
+                if item is None:
+                    return
+                msg, recv, index = item
+                if accept(msg):
+                    wins[index] += 1
+                    self.last_recv = recv
+                    if recorder is not None:
+                        recorder.on_message(msg)
+                    yield msg
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            self._tasks = []
+
+    async def _watch(self):
+        """每秒检查：长时间无消息的连接主动断开；接近 24 小时的连接轮换"""
+        while self._running:
+            await asyncio.sleep(1)
+            now = time.perf_counter()
+            for leg in list(self._legs):
+                idle = now - leg.ws.last_recv
+                if self.stale_timeout > 0 and idle > self.stale_timeout:
+                    print(f"[MarketStream] 连接#{leg.index} 已 {idle:.0f}s 未收到消息，断开重连")
+                    leg.close_reason = "stale"
+                    await self._close_ws(leg.ws)
+                elif time.monotonic() - leg.opened > self.max_age:
+                    await self._rollover(leg)
+
+    async def _rollover(self, leg: _Leg):
+        if self.connections == 1:
+            if self._pending is not None:
+                return
+            print(f"[MarketStream] 连接#0 已运行 {(time.monotonic() - leg.opened) / 3600:.1f} 小时，建立新连接后切换")
+            new_leg = await self._open_leg(0)
+            if new_leg is not None and self._running:
+                self._pending = new_leg
+            return
+        # 多连接：其他连接仍在收数据时才断开这一条，由其重连逻辑建立新连接
+        others = [l for l in self._legs if l is not leg and time.perf_counter() - l.ws.last_recv < self.stale_timeout]
+        if others:
+            print(f"[MarketStream] 连接#{leg.index} 已运行 {(time.monotonic() - leg.opened) / 3600:.1f} 小时，断开轮换")
+            leg.close_reason = "rollover"
+            await self._close_ws(leg.ws)
+
+    async def close(self):
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        for leg in list(self._legs):
+            await self._close_ws(leg.ws)
+        if self._pending is not None:
+            await self._close_ws(self._pending.ws)
+            self._pending = None
+        if self._queue is not None:
+            self._queue.put_nowait(None)
+
+    @property
+    def last_frame(self) -> float:
+        """任一连接最近一次收包的时刻（time.perf_counter()，含被过滤与去重丢弃的消息），尚未收到数据时为 0"""
+        return max([self._last_frame, self.last_recv] + [leg.ws.last_recv for leg in self._legs])
+
+    @property
+    def connected(self):
+        return bool(self._legs)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._legs),
+            "reconnects": self.reconnects,
+            "duplicates": self.duplicates,
+            "wins": list(self.wins),
+            "subscriptions": list(self.streams),
+        }
+
+
+class BinanceUserDataWebSocket:
+    """
+    Binance Future 用户数据流 WebSocket（ORDER_TRADE_UPDATE / ACCOUNT_UPDATE 等）。
+    用法：
+        ws = BinanceUserDataWebSocket(listen_key, env="testnet")
+        await ws.connect()
+        async for event in ws.listen():
+            ...
+    """
+    def __init__(self, listen_key: str, env: str = "testnet", decoder: Optional[MessageDecoder] = None):
+        self.listen_key = listen_key
+        self.env = env
+        self.url = f"{BINANCE_WS_URLS.get(env, BINANCE_WS_URLS['testnet'])}/{listen_key}"
+        self.ws: Optional[Any] = None
+        self.decoder = decoder or get_decoder("user")
+        self._connected = False
+
+    async def connect(self):
+        """建立WebSocket连接"""
+        self.ws = await websockets.connect(self.url)
+        self._connected = True
+
+    async def listen(self):
+        """异步生成器，持续接收用户数据事件"""
+        if not self._connected or self.ws is None:
+            raise RuntimeError("用户数据流未连接，无法监听消息")
+        try:
+            async for msg in self.ws:
+                yield self.decoder.decode(msg)
+        except Exception as e:
+            self._connected = False
+            raise RuntimeError(f"用户数据流监听异常: {e}")
+        self._connected = False
+
+    async def close(self):
+        """关闭WebSocket连接"""
+        if self.ws:
+            await self.ws.close()
+            self._connected = False
+
     @property
     def connected(self):
         return self._connected